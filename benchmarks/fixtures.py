@@ -0,0 +1,124 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+try:
+    from pillow_heif import register_heif_opener
+except Exception:
+    register_heif_opener = None
+
+from model.config import IMAGE_SIZE
+from model.train import _build_augmentation, build_model
+
+CLASS_NAMES = [
+    "bacterial_leaf_blight",
+    "brown_spot",
+    "healthy",
+    "leaf_blast",
+    "leaf_scald",
+    "narrow_brown_spot",
+]
+
+# Typical phone camera outputs plus a small web upload.
+RESOLUTIONS = {
+    "12mp": (4032, 3024),
+    "8mp": (3264, 2448),
+    "portrait_fhd": (1080, 1920),
+    "web": (640, 480),
+}
+FORMATS = ("JPEG", "PNG", "HEIF")
+_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "HEIF": ".heic"}
+
+
+def _build_small_model(num_classes: int) -> tf.keras.Model:
+    """Same input, layer chain and head as ``build_model`` around a tiny
+    convolutional backbone, so it loads and trains in seconds."""
+    backbone_inputs = tf.keras.Input(shape=(*IMAGE_SIZE, 3))
+    y = tf.keras.layers.Rescaling(1.0 / 255.0)(backbone_inputs)
+    y = tf.keras.layers.Conv2D(16, 3, strides=2, activation="relu")(y)
+    y = tf.keras.layers.Conv2D(32, 3, strides=2, activation="relu")(y)
+    y = tf.keras.layers.Conv2D(64, 3, strides=2, activation="relu")(y)
+    backbone = tf.keras.Model(backbone_inputs, y, name="small_backbone")
+
+    inputs = tf.keras.Input(shape=(*IMAGE_SIZE, 3))
+    x = _build_augmentation()(inputs)
+    x = backbone(x, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    x = tf.keras.layers.BatchNormalization()(x)
+    x = tf.keras.layers.Dropout(0.4)(x)
+    x = tf.keras.layers.Dense(256, activation="relu")(x)
+    x = tf.keras.layers.Dropout(0.3)(x)
+    outputs = tf.keras.layers.Dense(num_classes, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def build_artifacts(artifacts_dir: Path, model_kind: str, seed: int) -> None:
+    """Write a randomly initialized model and class names into ``artifacts_dir``.
+
+    ``small`` is a tiny backbone for fast runs; ``full`` is the real
+    EfficientNetV2S architecture from ``build_model`` without pretrained weights.
+    """
+    tf.keras.utils.set_random_seed(seed)
+    if model_kind == "full":
+        model, _ = build_model(len(CLASS_NAMES), weights=None)
+    else:
+        model = _build_small_model(len(CLASS_NAMES))
+
+    artifacts_dir.mkdir(parents=True, exist_ok=True)
+    model.save(artifacts_dir / "rice_disease_model.keras")
+    with (artifacts_dir / "class_names.json").open("w", encoding="utf-8") as f:
+        json.dump(CLASS_NAMES, f)
+
+
+def synthetic_leaf(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """Smooth green field with darker blotches and mild sensor noise.
+
+    Low-frequency content keeps encoded sizes close to real photos; pure
+    noise would make every format unrealistically large and slow to decode.
+    """
+    coarse = rng.random((max(2, height // 64), max(2, width // 64), 3))
+    base = np.asarray(
+        Image.fromarray((coarse * 255).astype(np.uint8)).resize((width, height), Image.Resampling.BICUBIC),
+        dtype=np.float32,
+    )
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[..., 0] = 40 + 0.3 * base[..., 0]
+    pixels[..., 1] = 90 + 0.5 * base[..., 1]
+    pixels[..., 2] = 30 + 0.2 * base[..., 2]
+    pixels += rng.normal(0.0, 4.0, size=(height, width, 1)).astype(np.float32)
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+
+def build_image_corpus(images_dir: Path, seed: int) -> list[dict]:
+    """Encode one synthetic image per resolution and format.
+
+    HEIF images are skipped when pillow_heif is not installed.
+    """
+    if register_heif_opener is not None:
+        register_heif_opener()
+
+    rng = np.random.default_rng(seed)
+    images_dir.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    for name, (width, height) in RESOLUTIONS.items():
+        pixels = Image.fromarray(synthetic_leaf(width, height, rng))
+        for image_format in FORMATS:
+            if image_format == "HEIF" and register_heif_opener is None:
+                continue
+            path = images_dir / f"{name}{_SUFFIXES[image_format]}"
+            pixels.save(path, format=image_format, **({"quality": 90} if image_format != "PNG" else {}))
+            corpus.append(
+                {
+                    "name": path.name,
+                    "resolution": name,
+                    "format": image_format,
+                    "width": width,
+                    "height": height,
+                    "bytes": path.stat().st_size,
+                    "path": path,
+                }
+            )
+    return corpus
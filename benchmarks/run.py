@@ -0,0 +1,299 @@
+"""Offline benchmarks for single-image inference and the worker protocol.
+
+Builds a randomly initialized model and a synthetic image corpus in a work
+directory, then measures predict_image latency, views per request, worker
+throughput at several concurrency levels, cold start and peak RSS. No dataset
+or trained artifacts are needed; results are written as JSON so two runs can
+be diffed:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+
+# Keep worker and TensorFlow logging off stdout.
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline inference benchmarks")
+    parser.add_argument("--output", type=Path, required=True, help="Where to write the JSON results")
+    parser.add_argument(
+        "--model",
+        choices=("small", "full"),
+        default="small",
+        help="Tiny random backbone, or the real EfficientNetV2S architecture with random weights",
+    )
+    parser.add_argument("--work-dir", type=Path, help="Keep generated artifacts and images here")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=5, help="predict_image runs per corpus image")
+    parser.add_argument(
+        "--concurrency",
+        default="1,2,4,8",
+        help="Comma-separated numbers of in-flight worker requests",
+    )
+    parser.add_argument("--requests", type=int, default=32, help="Worker requests per concurrency level")
+    parser.add_argument("--cold-starts", type=int, default=3, help="Worker launches timed to ready")
+    return parser.parse_args()
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, (50, 95, 99))
+    return {
+        "count": int(len(arr)),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "min": round(float(arr.min()), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round((peak if sys.platform == "darwin" else peak * 1024) / 2**20, 1)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# predict_image
+# ---------------------------------------------------------------------------
+
+def bench_single_request(corpus: list[dict], repeats: int) -> dict:
+    from PIL import Image
+
+    from model.inference import TTA_POLICIES, predict_image, warmup_inference_assets
+
+    warmup_inference_assets()
+    results = {}
+    for policy in TTA_POLICIES:
+        latencies: list[float] = []
+        by_format: dict[str, list[float]] = {}
+        by_resolution: dict[str, list[float]] = {}
+        stages: dict[str, list[float]] = {}
+        views: list[int] = []
+        for entry in corpus:
+            image_bytes = entry["path"].read_bytes()
+            for _ in range(repeats):
+                started = time.perf_counter()
+                with Image.open(BytesIO(image_bytes)) as image:
+                    result = predict_image(image, tta_policy=policy, include_timings=True)
+                elapsed = (time.perf_counter() - started) * 1000.0
+                latencies.append(elapsed)
+                by_format.setdefault(entry["format"], []).append(elapsed)
+                by_resolution.setdefault(entry["resolution"], []).append(elapsed)
+                views.append(result["tta_views"])
+                for stage, ms in result["timings_ms"].items():
+                    stages.setdefault(stage, []).append(ms)
+
+        results[policy] = {
+            "latency_ms": _summary(latencies),
+            "latency_ms_by_format": {name: _summary(v) for name, v in sorted(by_format.items())},
+            "latency_ms_by_resolution": {name: _summary(v) for name, v in sorted(by_resolution.items())},
+            "stage_ms": {name: _summary(v) for name, v in sorted(stages.items())},
+            "views_per_request": _summary(views),
+        }
+    results["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# predict_worker protocol
+# ---------------------------------------------------------------------------
+
+class _WorkerClient:
+    """Drives ``python -m model.predict_worker`` over stdin/stdout."""
+
+    def __init__(self, artifacts_dir: Path, worker_args: list[str]):
+        env = {**os.environ, "RICE_ARTIFACTS_DIR": str(artifacts_dir)}
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "model.predict_worker", *worker_args],
+            cwd=PROJECT_ROOT,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        ready = json.loads(self.process.stdout.readline())
+        self.ready_ms = (time.perf_counter() - self.started) * 1000.0
+        if not ready.get("ready"):
+            self.close()
+            raise RuntimeError(f"Worker failed to start: {ready.get('error')}")
+        self.startup_ms = ready.get("startup_ms", {})
+
+    def send(self, message: dict, payload: bytes | None = None) -> None:
+        if payload is not None:
+            message = {**message, "image_length": len(payload)}
+        self.process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+        if payload is not None:
+            self.process.stdin.write(payload)
+        self.process.stdin.flush()
+
+    def receive(self) -> dict:
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError("Worker exited unexpectedly.")
+        return json.loads(line)
+
+    def call(self, message: dict) -> dict:
+        self.send(message)
+        return self.receive()
+
+    def close(self) -> None:
+        try:
+            self.send({"command": "shutdown"})
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait(timeout=60)
+
+
+def _drive(client: _WorkerClient, payloads: list[bytes], concurrency: int, total: int) -> dict:
+    """Keep ``concurrency`` requests in flight until ``total`` have completed."""
+    slots = threading.Semaphore(concurrency)
+    sent_at: dict[int, float] = {}
+    latencies: list[float] = []
+    errors = 0
+
+    def read_responses() -> None:
+        nonlocal errors
+        for _ in range(total):
+            response = client.receive()
+            latencies.append((time.perf_counter() - sent_at.pop(response["id"])) * 1000.0)
+            if not response.get("ok"):
+                errors += 1
+            slots.release()
+
+    reader = threading.Thread(target=read_responses)
+    started = time.perf_counter()
+    reader.start()
+    for request_id in range(total):
+        slots.acquire()
+        sent_at[request_id] = time.perf_counter()
+        client.send({"id": request_id, "top_k": 3}, payloads[request_id % len(payloads)])
+    reader.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 3),
+        "latency_ms": _summary(latencies),
+    }
+
+
+def bench_worker(artifacts_dir: Path, corpus: list[dict], levels: list[int], total: int) -> dict:
+    payloads = [entry["path"].read_bytes() for entry in corpus]
+    results = {}
+    # The cache is disabled so repeated corpus images are scored every time.
+    for mode, worker_args in (
+        ("sequential", ["--cache-size", "0"]),
+        ("batching", ["--cache-size", "0", "--batching"]),
+    ):
+        client = _WorkerClient(artifacts_dir, worker_args)
+        try:
+            # One untimed pass so first-use costs do not land in level 1.
+            _drive(client, payloads, 1, len(payloads))
+            by_level = {str(level): _drive(client, payloads, level, total) for level in levels}
+            stats = client.call({"command": "stats"})["stats"]
+        finally:
+            client.close()
+        results[mode] = {
+            "concurrency": by_level,
+            "views_per_request": stats["views_per_request"],
+            "peak_rss_mb": stats["peak_rss_mb"],
+        }
+    return results
+
+
+def bench_cold_start(artifacts_dir: Path, runs: int) -> dict:
+    ready_ms: list[float] = []
+    phases: dict[str, list[float]] = {}
+    for _ in range(runs):
+        client = _WorkerClient(artifacts_dir, ["--cache-size", "0"])
+        client.close()
+        ready_ms.append(client.ready_ms)
+        for phase, ms in client.startup_ms.items():
+            phases.setdefault(phase, []).append(ms)
+    return {
+        "spawn_to_ready_ms": _summary(ready_ms),
+        "startup_ms": {phase: _summary(values) for phase, values in phases.items()},
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    with tempfile.TemporaryDirectory(prefix="rice-bench-") as tmp:
+        work_dir = args.work_dir or Path(tmp)
+        artifacts_dir = work_dir / "artifacts"
+        # Must be set before anything imports model.config, both here and in
+        # the worker subprocesses.
+        os.environ["RICE_ARTIFACTS_DIR"] = str(artifacts_dir)
+
+        import tensorflow as tf
+
+        from benchmarks.fixtures import build_artifacts, build_image_corpus
+
+        build_artifacts(artifacts_dir, args.model, args.seed)
+        corpus = build_image_corpus(work_dir / "images", args.seed)
+
+        results = {
+            "meta": {
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "tensorflow": tf.__version__,
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "model": args.model,
+                "seed": args.seed,
+                "repeats": args.repeats,
+            },
+            "corpus": [{k: v for k, v in entry.items() if k != "path"} for entry in corpus],
+            "cold_start": bench_cold_start(artifacts_dir, args.cold_starts),
+            "single_request": bench_single_request(corpus, args.repeats),
+            "worker": bench_worker(artifacts_dir, corpus, levels, args.requests),
+        }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Saved benchmark results to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+from model.inference import ServedModel, StagedPrediction
+from model.load_shedding import deadline_expired
+
+_STOP = object()
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before its views were scored."""
+
+
+class BatchItem:
+    """One in-flight request: its staged prediction state plus caller context.
+
+    ``deadline_ms`` is an optional Unix epoch time in milliseconds after which
+    the request is dropped instead of scored.
+    """
+
+    def __init__(self, prediction: StagedPrediction, context: object = None, deadline_ms: float | None = None):
+        self.prediction = prediction
+        self.context = context
+        self.deadline_ms = deadline_ms
+
+
+class MicroBatcher:
+    """Dynamic batcher that shares forward passes across concurrent requests.
+
+    Pending TTA views from several requests are stacked until either
+    ``max_batch_size`` views are queued or ``max_wait_ms`` has passed since
+    the batch was opened, then scored in one call to ``score_fn``. Requests
+    whose adaptive TTA escalates stay queued for the next batch; finished
+    ones are handed to ``on_done(item, error)`` on the batcher thread.
+
+    A batch only stacks requests pinned to the same model, so requests that
+    straddle a hot reload are never scored by the other model. Requests
+    whose deadline has passed are finished with ``DeadlineExceeded`` before
+    each batch instead of being scored.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[np.ndarray, ServedModel], np.ndarray],
+        on_done: Callable[[BatchItem, Exception | None], None],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ):
+        self.score_fn = score_fn
+        self.on_done = on_done
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._outstanding = 0
+        self._outstanding_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def submit(self, item: BatchItem) -> None:
+        with self._outstanding_lock:
+            self._outstanding += 1
+        self._queue.put(item)
+
+    @property
+    def backlog(self) -> int:
+        """Requests submitted but not finished yet."""
+        with self._outstanding_lock:
+            return self._outstanding
+
+    def _finish(self, item: BatchItem, error: Exception | None) -> None:
+        with self._outstanding_lock:
+            self._outstanding -= 1
+        self.on_done(item, error)
+
+    def close(self) -> None:
+        """Finish every submitted request, then stop the batcher thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        active: list[BatchItem] = []
+        stopping = False
+
+        while active or not stopping:
+            if not active:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                active.append(item)
+
+            deadline = time.monotonic() + self.max_wait
+            while not stopping and self._queued_views(active) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    active.append(item)
+
+            active = self._run_batch(active)
+
+    @staticmethod
+    def _queued_views(items: list[BatchItem]) -> int:
+        return sum(item.prediction.pending_views for item in items)
+
+    def _run_batch(self, active: list[BatchItem]) -> list[BatchItem]:
+        live = []
+        for item in active:
+            if deadline_expired(item.deadline_ms):
+                self._finish(item, DeadlineExceeded("Deadline exceeded."))
+            else:
+                live.append(item)
+        if not live:
+            return live
+        active = live
+
+        # Take whole requests in arrival order; a single oversized request
+        # still goes alone and the engine splits it into bucket-sized chunks.
+        selected: list[BatchItem] = []
+        total = 0
+        model = active[0].prediction.model
+        for item in active:
+            views = item.prediction.pending_views
+            if selected and (total + views > self.max_batch_size or item.prediction.model is not model):
+                break
+            selected.append(item)
+            total += views
+        remaining = active[len(selected) :]
+
+        try:
+            batch = np.concatenate([item.prediction.pending_batch() for item in selected], axis=0)
+            started = time.perf_counter_ns()
+            probs = self.score_fn(batch, model)
+            elapsed = time.perf_counter_ns() - started
+        except Exception as exc:
+            for item in selected:
+                self._finish(item, exc)
+            return remaining
+
+        offset = 0
+        still_active: list[BatchItem] = []
+        for item in selected:
+            views = item.prediction.pending_views
+            # Every request in the batch waited for the whole shared pass.
+            item.prediction.add_timing("forward", elapsed)
+            try:
+                item.prediction.submit(probs[offset : offset + views])
+            except Exception as exc:
+                self._finish(item, exc)
+            else:
+                if item.prediction.done:
+                    self._finish(item, None)
+                else:
+                    still_active.append(item)
+            offset += views
+
+        # Escalated requests keep their place ahead of later arrivals.
+        return still_active + remaining
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -5,16 +6,51 @@ DATASET_DIR = PROJECT_ROOT / "dataset"
 TRAIN_DIR = DATASET_DIR / "train"
 VALIDATION_DIR = DATASET_DIR / "validation"
 
-ARTIFACTS_DIR = PROJECT_ROOT / "artifacts"
+# RICE_ARTIFACTS_DIR points inference at another artifact set (e.g. benchmarks).
+ARTIFACTS_DIR = Path(os.environ.get("RICE_ARTIFACTS_DIR", PROJECT_ROOT / "artifacts"))
 MODEL_PATH = ARTIFACTS_DIR / "rice_disease_model.keras"
 CLASS_NAMES_PATH = ARTIFACTS_DIR / "class_names.json"
+SERVING_MODEL_DIR = ARTIFACTS_DIR / "rice_disease_model_serving"
+TFLITE_FLOAT16_MODEL_PATH = ARTIFACTS_DIR / "rice_disease_model_float16.tflite"
+TFLITE_INT8_MODEL_PATH = ARTIFACTS_DIR / "rice_disease_model_int8.tflite"
+STUDENT_MODEL_PATH = ARTIFACTS_DIR / "rice_disease_student.keras"
+# Escalation thresholds for cascade inference, written by python -m model.tune_cascade.
+CASCADE_THRESHOLDS_PATH = ARTIFACTS_DIR / "cascade_thresholds.json"
+# Named model versions for hot reload: each subdirectory mirrors the file
+# layout above (model, optional serving/TFLite exports, class_names.json).
+MODEL_VERSIONS_DIR = ARTIFACTS_DIR / "versions"
+INFERENCE_BACKEND = "keras"
+# Per-host CPU execution profiles written by python -m model.tune_runtime.
+RUNTIME_PROFILE_DIR = ARTIFACTS_DIR / "runtime_profiles"
+PREDICTION_CACHE_DIR = ARTIFACTS_DIR / "prediction_cache"
+PREDICTION_CACHE_SIZE = 256
+# Least recently used disk cache files are evicted above this size.
+PREDICTION_CACHE_DISK_MB = 256
+# Worker load shedding: degradation level 1 (base TTA stage only) and 2
+# (single view) start at these queued requests / smoothed request latencies.
+DEGRADE_QUEUE_DEPTHS = (8, 32)
+DEGRADE_LATENCY_MS = (5000.0, 15000.0)
 
 IMAGE_SIZE = (260, 260)
 BATCH_SIZE = 16
 EPOCHS = 50
 SEED = 42
+# Training and evaluation read images decoded once into uint8 shards here
+# (python -m model.image_cache); False decodes the JPEGs every epoch instead.
+USE_IMAGE_CACHE = True
+IMAGE_CACHE_DIR = ARTIFACTS_DIR / "image_cache"
 
 LEARNING_RATE = 1e-3
 FINE_TUNE_LR = 1e-5
 LABEL_SMOOTHING = 0.1
 MIXUP_ALPHA = 0.2
+
+# Distillation (python -m model.distill): the student takes the usual
+# IMAGE_SIZE input and resizes to STUDENT_IMAGE_SIZE inside the model, so it
+# drops into the existing inference pipeline. Targets blend the teacher's
+# temperature-softened TTA probabilities with the hard labels.
+STUDENT_IMAGE_SIZE = (192, 192)
+DISTILL_EPOCHS = 30
+DISTILL_TEMPERATURE = 2.0
+DISTILL_SOFT_WEIGHT = 0.7
+SOFT_LABELS_PATH = ARTIFACTS_DIR / "distill_soft_labels.npz"
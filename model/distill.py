@@ -0,0 +1,269 @@
+import argparse
+import time
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from model.config import (
+    ARTIFACTS_DIR,
+    BATCH_SIZE,
+    DISTILL_EPOCHS,
+    DISTILL_SOFT_WEIGHT,
+    DISTILL_TEMPERATURE,
+    FINE_TUNE_LR,
+    IMAGE_SIZE,
+    LEARNING_RATE,
+    MIXUP_ALPHA,
+    SEED,
+    SOFT_LABELS_PATH,
+    STUDENT_IMAGE_SIZE,
+    STUDENT_MODEL_PATH,
+    TRAIN_DIR,
+    VALIDATION_DIR,
+)
+from model.evaluate import compare_student_teacher
+from model.inference import ServedModel, TTAPrediction
+from model.schedules import WarmupCosineDecay
+from model.train import (
+    _build_augmentation,
+    _build_class_weights,
+    _image_dataset,
+    _list_image_files,
+    _mixup_batch,
+    _open_image_cache,
+)
+
+STUDENT_ARCHITECTURES = ("mobilenet_v3_small", "efficientnet_b0")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Distill the trained model into a lightweight student")
+    parser.add_argument(
+        "--student",
+        choices=STUDENT_ARCHITECTURES,
+        default=STUDENT_ARCHITECTURES[0],
+        help="Student backbone",
+    )
+    parser.add_argument("--epochs", type=int, default=DISTILL_EPOCHS, help="Total training epochs")
+    parser.add_argument(
+        "--recompute-soft-labels",
+        action="store_true",
+        help=f"Ignore the teacher probabilities cached in {SOFT_LABELS_PATH.name}",
+    )
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Student model
+# ---------------------------------------------------------------------------
+
+def build_student_model(
+    num_classes: int, architecture: str = STUDENT_ARCHITECTURES[0], weights: str | None = "imagenet"
+) -> tuple[tf.keras.Model, tf.keras.Model]:
+    """Build a small backbone with the same input contract as ``build_model``.
+
+    The model takes raw [0, 255] images at ``IMAGE_SIZE`` and resizes them to
+    ``STUDENT_IMAGE_SIZE`` internally, so the inference pipeline, engines and
+    exports work on it unchanged while the backbone runs at lower resolution.
+    """
+    inputs = tf.keras.Input(shape=(*IMAGE_SIZE, 3))
+    x = _build_augmentation()(inputs)
+    x = tf.keras.layers.Resizing(*STUDENT_IMAGE_SIZE, name="student_resize")(x)
+
+    input_shape = (*STUDENT_IMAGE_SIZE, 3)
+    if architecture == "efficientnet_b0":
+        backbone = tf.keras.applications.EfficientNetB0(include_top=False, weights=weights, input_shape=input_shape)
+    else:
+        backbone = tf.keras.applications.MobileNetV3Small(
+            include_top=False, weights=weights, input_shape=input_shape, include_preprocessing=True
+        )
+    backbone.trainable = False
+
+    x = backbone(x, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    x = tf.keras.layers.BatchNormalization()(x)
+    x = tf.keras.layers.Dropout(0.3)(x)
+    x = tf.keras.layers.Dense(128, activation="relu", kernel_regularizer=tf.keras.regularizers.l2(1e-4))(x)
+    x = tf.keras.layers.Dropout(0.2)(x)
+    outputs = tf.keras.layers.Dense(num_classes, activation="softmax")(x)
+
+    model = tf.keras.Model(inputs, outputs, name=f"rice_disease_student_{architecture}")
+    return model, backbone
+
+
+# ---------------------------------------------------------------------------
+# Teacher targets
+# ---------------------------------------------------------------------------
+
+def _teacher_probabilities(teacher: ServedModel, paths: list[str]) -> np.ndarray:
+    """Full-TTA averaged teacher probabilities for every training image."""
+    probs = np.empty((len(paths), len(teacher.class_names)), dtype=np.float32)
+    started = time.perf_counter()
+    for i, path in enumerate(paths):
+        with Image.open(path) as image:
+            prediction = TTAPrediction(image, tta_policy="full", model=teacher)
+        while not prediction.done:
+            prediction.submit(teacher.engine.predict(prediction.pending_batch()))
+        probs[i] = prediction.probabilities()
+        if (i + 1) % 200 == 0 or i + 1 == len(paths):
+            print(f"  teacher TTA: {i + 1}/{len(paths)} images ({time.perf_counter() - started:.0f}s)")
+    return probs
+
+
+def _load_soft_labels(teacher: ServedModel, paths: list[str], recompute: bool) -> np.ndarray:
+    """Teacher probabilities, reused from ``SOFT_LABELS_PATH`` when the file
+    list and teacher artifact are unchanged."""
+    if not recompute and SOFT_LABELS_PATH.exists():
+        cached = np.load(SOFT_LABELS_PATH)
+        if str(cached["fingerprint"]) == teacher.fingerprint and cached["paths"].tolist() == paths:
+            print(f"Reusing teacher probabilities from: {SOFT_LABELS_PATH}")
+            return cached["probs"]
+
+    print(f"Scoring {len(paths)} training images with the teacher (full TTA)...")
+    probs = _teacher_probabilities(teacher, paths)
+    np.savez(SOFT_LABELS_PATH, paths=np.asarray(paths), probs=probs, fingerprint=np.asarray(teacher.fingerprint))
+    print(f"Saved teacher probabilities to: {SOFT_LABELS_PATH}")
+    return probs
+
+
+def _soften(probs: np.ndarray, temperature: float) -> np.ndarray:
+    """Re-apply softmax at ``temperature`` to probabilities (teacher outputs are
+    post-softmax, so ``log(p)`` stands in for the logits)."""
+    logits = np.log(np.clip(probs, 1e-7, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Distillation entrypoint
+# ---------------------------------------------------------------------------
+
+def distill(
+    architecture: str = STUDENT_ARCHITECTURES[0],
+    epochs: int = DISTILL_EPOCHS,
+    recompute_soft_labels: bool = False,
+    weights: str | None = "imagenet",
+) -> None:
+    if not TRAIN_DIR.exists() or not VALIDATION_DIR.exists():
+        raise FileNotFoundError(
+            f"Expected dataset folders at '{TRAIN_DIR}' and '{VALIDATION_DIR}'."
+        )
+
+    tf.keras.utils.set_random_seed(SEED)
+    ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    # ---- File listing: paths, hard labels and class names without decoding ----
+    paths, train_labels, class_names = _list_image_files(TRAIN_DIR)
+    val_paths, val_labels, _ = _list_image_files(VALIDATION_DIR, class_names)
+
+    # The teacher never cascades; loading the previous student would only
+    # cost time and change nothing.
+    teacher = ServedModel("keras", cascade=False)
+    if teacher.class_names != class_names:
+        raise ValueError(
+            f"Teacher classes {teacher.class_names} do not match the training folders {class_names}."
+        )
+
+    # ---- Targets: softened teacher TTA probabilities blended with hard labels ----
+    soft = _soften(_load_soft_labels(teacher, paths, recompute_soft_labels), DISTILL_TEMPERATURE)
+    hard = np.eye(len(class_names), dtype=np.float32)[train_labels]
+    targets = tf.constant(DISTILL_SOFT_WEIGHT * soft + (1.0 - DISTILL_SOFT_WEIGHT) * hard)
+    teacher_agreement = float((np.argmax(soft, axis=1) == train_labels).mean())
+    print(f"Teacher TTA accuracy on the training set: {teacher_agreement:.4f}")
+    del teacher
+
+    # Each image's label is its index in the listing above, so shuffling and
+    # decoding stay in the shared pipeline and targets are gathered after.
+    cache = _open_image_cache(paths, val_paths)
+    indices = np.arange(len(paths), dtype=np.int32)
+    train_ds = _image_dataset(paths, indices, shuffle=True, cache=cache)
+    val_ds = _image_dataset(val_paths, val_labels, len(class_names), cache=cache)
+
+    autotune = tf.data.AUTOTUNE
+
+    def with_targets_and_mixup(images, indices):
+        return _mixup_batch(images, tf.gather(targets, indices), alpha=MIXUP_ALPHA)
+
+    train_ds = train_ds.map(with_targets_and_mixup, num_parallel_calls=autotune).prefetch(autotune)
+    val_ds = val_ds.prefetch(autotune)
+
+    # ---- Build student ----
+    model, backbone = build_student_model(len(class_names), architecture, weights)
+    class_weights = _build_class_weights(train_labels)
+    steps_per_epoch = max(1, len(paths) // BATCH_SIZE)
+
+    callbacks = [
+        tf.keras.callbacks.EarlyStopping(
+            monitor="val_accuracy", mode="max", patience=8, restore_best_weights=True
+        ),
+        tf.keras.callbacks.ModelCheckpoint(
+            filepath=str(STUDENT_MODEL_PATH),
+            monitor="val_accuracy",
+            mode="max",
+            save_best_only=True,
+        ),
+    ]
+
+    def compile_with(schedule: WarmupCosineDecay) -> None:
+        # Targets are already soft, so no extra label smoothing.
+        model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=schedule),
+            loss=tf.keras.losses.CategoricalCrossentropy(),
+            metrics=["accuracy"],
+        )
+
+    # ---- Phase 1: head warm-up (frozen backbone) ----
+    warmup_epochs = min(epochs, max(2, epochs // 6))
+    compile_with(
+        WarmupCosineDecay(
+            base_lr=LEARNING_RATE,
+            total_steps=steps_per_epoch * warmup_epochs,
+            warmup_steps=steps_per_epoch,
+        )
+    )
+    print(f"\nPhase 1: Head warm-up for {warmup_epochs} epochs (frozen {architecture})...")
+    model.fit(train_ds, validation_data=val_ds, epochs=warmup_epochs, class_weight=class_weights, callbacks=callbacks)
+
+    # ---- Phase 2: full fine-tuning; the student is small enough to unfreeze entirely ----
+    fine_tune_epochs = epochs - warmup_epochs
+    if fine_tune_epochs > 0:
+        backbone.trainable = True
+        for layer in backbone.layers:
+            if isinstance(layer, tf.keras.layers.BatchNormalization):
+                layer.trainable = False
+
+        # Small backbones tolerate a larger fine-tuning rate than the teacher's.
+        compile_with(
+            WarmupCosineDecay(
+                base_lr=max(FINE_TUNE_LR, LEARNING_RATE / 10),
+                total_steps=steps_per_epoch * fine_tune_epochs,
+                warmup_steps=steps_per_epoch,
+            )
+        )
+        print(f"\nPhase 2: Fine-tuning the whole student for {fine_tune_epochs} epochs...")
+        model.fit(
+            train_ds,
+            validation_data=val_ds,
+            epochs=epochs,
+            initial_epoch=warmup_epochs,
+            class_weight=class_weights,
+            callbacks=callbacks,
+        )
+
+    model.save(STUDENT_MODEL_PATH)
+    print(f"Saved student model to: {STUDENT_MODEL_PATH}")
+
+    report = compare_student_teacher(class_names)
+    print(f"Student is {report['latency_speedup']:.1f}x faster per image than the teacher.")
+
+
+def main() -> int:
+    args = parse_args()
+    distill(args.student, args.epochs, args.recompute_soft_labels)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
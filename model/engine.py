@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except Exception:
+    Interpreter = tf.lite.Interpreter
+
+from model.config import IMAGE_SIZE
+
+# Padded batch sizes the serving graph is pretraced and warmed for. The largest
+# bucket covers the full TTA view set; bigger batches are split into chunks.
+BATCH_BUCKETS = (1, 8, 16, 24)
+
+
+def _bucket_for(size: int) -> int:
+    for bucket in BATCH_BUCKETS:
+        if size <= bucket:
+            return bucket
+    return BATCH_BUCKETS[-1]
+
+
+# Written into an exported model directory: identity of the .keras file it
+# was exported from, so a retrained model is never shadowed by a stale export.
+EXPORT_SOURCE_FILE = "export_source.json"
+
+
+def _source_identity(source_path: Path, digest: bool = True) -> dict:
+    stat = source_path.stat()
+    identity = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if digest:
+        with source_path.open("rb") as f:
+            identity["sha256"] = hashlib.file_digest(f, "sha256").hexdigest()
+    return identity
+
+
+def _export_source_record(export_path: Path) -> Path:
+    """Inside an export directory, next to a single-file export."""
+    if export_path.is_dir():
+        return export_path / EXPORT_SOURCE_FILE
+    return export_path.with_name(f"{export_path.name}.{EXPORT_SOURCE_FILE}")
+
+
+def record_export_source(export_path: Path, source_path: Path) -> None:
+    with _export_source_record(export_path).open("w", encoding="utf-8") as f:
+        json.dump({"source": source_path.name, **_source_identity(source_path)}, f, indent=2)
+
+
+def export_matches_source(export_path: Path, source_path: Path) -> bool:
+    """Whether ``export_path`` (a SavedModel directory or a ``.tflite``
+    file) was exported from the current ``source_path``.
+
+    Size and mtime are checked first; the file is only hashed when they
+    differ, e.g. after copying the same model onto another machine.
+    """
+    try:
+        with _export_source_record(export_path).open("r", encoding="utf-8") as f:
+            recorded = json.load(f)
+        current = _source_identity(source_path, digest=False)
+    except (OSError, ValueError):
+        return False
+    if recorded.get("size") == current["size"] and recorded.get("mtime_ns") == current["mtime_ns"]:
+        return True
+    return recorded.get("size") == current["size"] and recorded.get("sha256") == _source_identity(source_path)["sha256"]
+
+
+def _available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class _BucketedEngine:
+    """Shared batching logic: pad every chunk to a bucket and run it."""
+
+    num_classes: int
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pad_buffers = {
+            bucket: np.zeros((bucket, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+            for bucket in BATCH_BUCKETS
+        }
+
+    def _forward_bucket(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def warmup(self) -> None:
+        """Run one synthetic batch at every bucket size."""
+        for bucket in BATCH_BUCKETS:
+            self.predict(self._pad_buffers[bucket][:bucket])
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Return per-image probabilities for a float32 ``(N, H, W, 3)`` batch."""
+        total = len(batch)
+        probs = np.empty((total, self.num_classes), dtype=np.float32)
+        largest = BATCH_BUCKETS[-1]
+
+        with self._lock:
+            for start in range(0, total, largest):
+                chunk = batch[start : start + largest]
+                size = len(chunk)
+                bucket = _bucket_for(size)
+                if size < bucket:
+                    # Rows past ``size`` hold stale data; inference mode has no
+                    # cross-sample ops, so they never affect the real rows.
+                    padded = self._pad_buffers[bucket]
+                    padded[:size] = chunk
+                    chunk = padded
+                probs[start : start + size] = self._forward_bucket(chunk)[:size]
+
+        return probs
+
+
+class InferenceEngine(_BucketedEngine):
+    """Compiled forward pass around a loaded Keras model.
+
+    The model is traced once into a ``tf.function`` with a fixed input
+    signature, and every batch is zero-padded to one of ``BATCH_BUCKETS`` so
+    requests never trigger a trace or see a new input shape after warmup.
+    """
+
+    def __init__(self, model: tf.keras.Model):
+        super().__init__()
+        self.model = model
+        self.num_classes = int(model.output_shape[-1])
+        self._function = tf.function(
+            self._call,
+            input_signature=[
+                tf.TensorSpec(shape=(None, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=tf.float32)
+            ],
+        )
+        self._forward = self._function.get_concrete_function()
+
+    def _call(self, images: tf.Tensor) -> tf.Tensor:
+        return self.model(images, training=False)
+
+    @property
+    def trace_count(self) -> int:
+        return int(self._function.experimental_get_tracing_count())
+
+    def _forward_bucket(self, batch: np.ndarray) -> np.ndarray:
+        return self._forward(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
+
+class TFLiteEngine(_BucketedEngine):
+    """Same interface as ``InferenceEngine``, served from a TFLite model.
+
+    One interpreter is allocated per bucket so no request ever resizes
+    tensors; they all memory-map the same model file.
+    """
+
+    def __init__(self, model_path: Path, num_threads: int | None = None):
+        super().__init__()
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"TFLite model not found at '{model_path}'. Export it with: python -m model.export --format tflite --quantize {{float16,int8}}"
+            )
+
+        threads = num_threads or _available_cores()
+        self._interpreters: dict[int, tuple[Interpreter, int, int]] = {}
+        for bucket in BATCH_BUCKETS:
+            interpreter = Interpreter(model_path=str(model_path), num_threads=threads)
+            input_index = interpreter.get_input_details()[0]["index"]
+            interpreter.resize_tensor_input(input_index, (bucket, IMAGE_SIZE[1], IMAGE_SIZE[0], 3))
+            interpreter.allocate_tensors()
+            output_details = interpreter.get_output_details()[0]
+            self._interpreters[bucket] = (interpreter, input_index, output_details["index"])
+        self.num_classes = int(output_details["shape"][-1])
+
+    def _forward_bucket(self, batch: np.ndarray) -> np.ndarray:
+        interpreter, input_index, output_index = self._interpreters[len(batch)]
+        interpreter.set_tensor(input_index, batch)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)
+
+
+class SavedModelEngine(_BucketedEngine):
+    """Same interface as ``InferenceEngine``, served from the lean SavedModel
+    written by ``python -m model.export --format savedmodel``.
+
+    The exported ``serve`` function already has a fixed input signature and
+    constant weights, so it is called directly without another trace.
+    """
+
+    def __init__(self, model_dir: Path):
+        super().__init__()
+        if not model_dir.exists():
+            raise FileNotFoundError(
+                f"Serving model not found at '{model_dir}'. Export it with: python -m model.export --format savedmodel"
+            )
+        self._module = tf.saved_model.load(str(model_dir))
+        self._forward = self._module.serve
+        self.num_classes = int(self._forward.get_concrete_function().structured_outputs.shape[-1])
+
+    def _forward_bucket(self, batch: np.ndarray) -> np.ndarray:
+        return self._forward(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
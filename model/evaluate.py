@@ -1,4 +1,5 @@
 import json
+import time
 from pathlib import Path
 
 import matplotlib.pyplot as plt
@@ -6,8 +7,17 @@ import numpy as np
 import tensorflow as tf
 from sklearn.metrics import classification_report, confusion_matrix
 
-from model.config import ARTIFACTS_DIR, CLASS_NAMES_PATH, IMAGE_SIZE, MODEL_PATH, VALIDATION_DIR
-from model.train import WarmupCosineDecay  # noqa: F401 — needed for Keras deserialization
+from model.config import (
+    ARTIFACTS_DIR,
+    CLASS_NAMES_PATH,
+    IMAGE_SIZE,
+    MODEL_PATH,
+    STUDENT_MODEL_PATH,
+    VALIDATION_DIR,
+)
+from model.engine import InferenceEngine
+from model.schedules import WarmupCosineDecay  # noqa: F401 — needed for Keras deserialization
+from model.train import _image_dataset, _list_image_files, _open_image_cache
 
 
 def _load_class_names(path: Path) -> list[str]:
@@ -20,6 +30,65 @@ def _load_class_names(path: Path) -> list[str]:
     return names
 
 
+def _validation_dataset(class_names: list[str]) -> tuple[tf.data.Dataset, np.ndarray]:
+    """Validation images in listing order (from the image cache when enabled)
+    and their integer labels."""
+    paths, labels, _ = _list_image_files(VALIDATION_DIR, class_names)
+    cache = _open_image_cache(paths)
+    return _image_dataset(paths, labels, cache=cache, batch_size=32), labels
+
+
+def _single_image_latency_ms(model: tf.keras.Model, runs: int = 50) -> float:
+    """Median batch-1 forward time through the serving engine."""
+    engine = InferenceEngine(model)
+    engine.warmup()
+    batch = np.zeros((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        engine.predict(batch)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(samples))
+
+
+def compare_student_teacher(class_names: list[str]) -> dict:
+    """Single-view accuracy and latency of the distilled student against the
+    teacher, written to ``student_vs_teacher.json``."""
+    val_ds, y_true = _validation_dataset(class_names)
+
+    report: dict = {"classes": class_names, "validation_images": int(len(y_true))}
+    predictions = {}
+    for name, path in (("teacher", MODEL_PATH), ("student", STUDENT_MODEL_PATH)):
+        model = tf.keras.models.load_model(path, compile=False)
+        y_pred = np.argmax(model.predict(val_ds, verbose=0), axis=1).astype(np.int32)
+        predictions[name] = y_pred
+        report[name] = {
+            "artifact": path.name,
+            "parameters": int(model.count_params()),
+            "accuracy": float((y_true == y_pred).mean()),
+            "latency_ms_p50": round(_single_image_latency_ms(model), 3),
+        }
+
+    report["top1_agreement"] = float((predictions["teacher"] == predictions["student"]).mean())
+    report["latency_speedup"] = report["teacher"]["latency_ms_p50"] / max(report["student"]["latency_ms_p50"], 1e-6)
+
+    print("\nStudent vs teacher (single view, batch-1 latency):")
+    for name in ("teacher", "student"):
+        entry = report[name]
+        print(
+            f"  {name:8s} accuracy={entry['accuracy']:.4f} latency={entry['latency_ms_p50']:.1f}ms "
+            f"params={entry['parameters']:,}"
+        )
+    print(f"  top-1 agreement: {report['top1_agreement']:.4f}")
+
+    ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+    report_path = ARTIFACTS_DIR / "student_vs_teacher.json"
+    with report_path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved student comparison to: {report_path}")
+    return report
+
+
 def evaluate() -> None:
     if not MODEL_PATH.exists():
         raise FileNotFoundError(f"Model not found: {MODEL_PATH}. Train first with: python -m model.train")
@@ -29,20 +98,7 @@ def evaluate() -> None:
     class_names = _load_class_names(CLASS_NAMES_PATH)
     model = tf.keras.models.load_model(MODEL_PATH)
 
-    val_ds = tf.keras.utils.image_dataset_from_directory(
-        VALIDATION_DIR,
-        labels="inferred",
-        label_mode="int",
-        color_mode="rgb",
-        batch_size=32,
-        image_size=IMAGE_SIZE,
-        shuffle=False,
-    )
-
-    y_true: list[int] = []
-    for _, labels in val_ds:
-        y_true.extend(labels.numpy().tolist())
-    y_true_np = np.array(y_true, dtype=np.int32)
+    val_ds, y_true_np = _validation_dataset(class_names)
 
     # No manual preprocessing needed — model includes preprocessing internally
     probs = model.predict(val_ds, verbose=0)
@@ -96,6 +152,9 @@ def evaluate() -> None:
     plt.close(fig)
     print(f"Saved confusion matrix figure to: {cm_png}")
 
+    if STUDENT_MODEL_PATH.exists():
+        compare_student_teacher(class_names)
+
 
 if __name__ == "__main__":
     evaluate()
@@ -0,0 +1,339 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+from model.config import (
+    ARTIFACTS_DIR,
+    IMAGE_SIZE,
+    MODEL_PATH,
+    SEED,
+    SERVING_MODEL_DIR,
+    TFLITE_FLOAT16_MODEL_PATH,
+    TFLITE_INT8_MODEL_PATH,
+    VALIDATION_DIR,
+)
+from model.engine import BATCH_BUCKETS, InferenceEngine, SavedModelEngine, TFLiteEngine, record_export_source
+from model.schedules import WarmupCosineDecay  # noqa: F401 — needed for Keras deserialization
+
+QUANTIZATION_MODES = ("float16", "int8")
+CALIBRATION_SAMPLES = 200
+LATENCY_REPEATS = 20
+# Largest probability difference the lean SavedModel may show against the
+# full Keras model before the export is rejected.
+EQUIVALENCE_TOLERANCE = 1e-4
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export the trained model for deployment")
+    parser.add_argument(
+        "--format",
+        choices=("savedmodel", "tflite"),
+        default="tflite",
+        help="Lean inference SavedModel, or a quantized TFLite model",
+    )
+    parser.add_argument(
+        "--quantize",
+        choices=QUANTIZATION_MODES,
+        help="TFLite only: float16 weights, or int8 weights/activations calibrated on validation images",
+    )
+    parser.add_argument(
+        "--calibration-samples",
+        type=int,
+        default=CALIBRATION_SAMPLES,
+        help="Validation images used to calibrate int8 activation ranges",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Compare accuracy and latency of the export against the Keras model",
+    )
+    args = parser.parse_args()
+    if args.format == "tflite" and args.quantize is None:
+        parser.error("--format tflite requires --quantize")
+    return args
+
+
+def _tflite_path(quantize: str) -> Path:
+    return TFLITE_INT8_MODEL_PATH if quantize == "int8" else TFLITE_FLOAT16_MODEL_PATH
+
+
+def _load_keras_model() -> tf.keras.Model:
+    if not MODEL_PATH.exists():
+        raise FileNotFoundError(f"Model not found: {MODEL_PATH}. Train first with: python -m model.train")
+    return tf.keras.models.load_model(MODEL_PATH)
+
+
+def _validation_dataset(batch_size: int, shuffle: bool) -> tf.data.Dataset:
+    if not VALIDATION_DIR.exists():
+        raise FileNotFoundError(f"Validation directory not found: {VALIDATION_DIR}")
+    return tf.keras.utils.image_dataset_from_directory(
+        VALIDATION_DIR,
+        labels="inferred",
+        label_mode="int",
+        color_mode="rgb",
+        batch_size=batch_size,
+        image_size=IMAGE_SIZE,
+        shuffle=shuffle,
+        seed=SEED,
+    )
+
+
+def _fold_batch_norm(bn: tf.keras.layers.BatchNormalization, dense: tf.keras.layers.Dense) -> tf.keras.layers.Dense:
+    """Return a Dense equivalent to ``dense(bn(x))`` with BN in inference mode.
+
+    BN computes ``x * s + t`` with ``s = gamma / sqrt(var + eps)`` and
+    ``t = beta - mean * s``, so the Dense kernel becomes ``s[:, None] * W``
+    and its bias ``t @ W + b``.
+    """
+    mean = np.asarray(bn.moving_mean, dtype=np.float64)
+    variance = np.asarray(bn.moving_variance, dtype=np.float64)
+    gamma = np.asarray(bn.gamma, dtype=np.float64) if bn.scale else np.ones_like(mean)
+    beta = np.asarray(bn.beta, dtype=np.float64) if bn.center else np.zeros_like(mean)
+    scale = gamma / np.sqrt(variance + bn.epsilon)
+    shift = beta - mean * scale
+
+    kernel = np.asarray(dense.kernel, dtype=np.float64)
+    bias = np.asarray(dense.bias, dtype=np.float64) if dense.use_bias else np.zeros(kernel.shape[1])
+
+    folded = tf.keras.layers.Dense(dense.units, activation=dense.activation, name=f"{dense.name}_folded")
+    folded.build((None, kernel.shape[0]))
+    folded.set_weights([(scale[:, None] * kernel).astype(np.float32), (shift @ kernel + bias).astype(np.float32)])
+    return folded
+
+
+def build_inference_model(model: tf.keras.Model) -> tf.keras.Model:
+    """Rebuild the ``build_model`` chain with only backbone, pooling and head.
+
+    The augmentation block and Dropout layers are identities at inference and
+    are dropped; a BatchNormalization directly feeding a Dense (optionally
+    through Dropout) is folded into that Dense. Other layers are reused as-is.
+    """
+    inputs = tf.keras.Input(shape=model.input_shape[1:])
+    x = inputs
+    pending_bn = None
+    for layer in model.layers:
+        if isinstance(layer, (tf.keras.layers.InputLayer, tf.keras.layers.Dropout)):
+            continue
+        if layer.name == "augmentation":
+            continue
+        if isinstance(layer, tf.keras.layers.BatchNormalization) and pending_bn is None:
+            pending_bn = layer
+            continue
+        if pending_bn is not None:
+            if isinstance(layer, tf.keras.layers.Dense):
+                layer = _fold_batch_norm(pending_bn, layer)
+            else:
+                x = pending_bn(x, training=False)
+            pending_bn = None
+        x = layer(x, training=False) if isinstance(layer, tf.keras.Model) else layer(x)
+    if pending_bn is not None:
+        x = pending_bn(x, training=False)
+    return tf.keras.Model(inputs, x, name="rice_disease_inference")
+
+
+def _equivalence_batch(batch_size: int) -> np.ndarray:
+    if VALIDATION_DIR.exists():
+        for images, _ in _validation_dataset(batch_size=batch_size, shuffle=True).take(1):
+            return images.numpy().astype(np.float32)
+    rng = np.random.default_rng(SEED)
+    return rng.uniform(0.0, 255.0, size=(batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3)).astype(np.float32)
+
+
+def export_savedmodel(
+    model: tf.keras.Model, output_dir: Path = SERVING_MODEL_DIR, source_path: Path = MODEL_PATH
+) -> tuple[Path, float]:
+    """Save the lean graph with weights frozen into constants, so Grappler can
+    constant-fold it, and check it against the full model before keeping it.
+    The export records ``source_path`` so serving ignores it once that file
+    changes.
+
+    Returns the artifact path and the largest probability difference seen.
+    """
+    lean = build_inference_model(model)
+    spec = tf.TensorSpec(shape=(None, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=tf.float32, name="images")
+
+    @tf.function(input_signature=[spec])
+    def forward(images):
+        return lean(images, training=False)
+
+    frozen = convert_variables_to_constants_v2(forward.get_concrete_function())
+
+    module = tf.Module()
+
+    @tf.function(input_signature=[spec])
+    def serve(images):
+        return frozen(images)[0]
+
+    module.serve = serve
+
+    staging_dir = output_dir.with_name(f"{output_dir.name}.tmp")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    tf.saved_model.save(module, str(staging_dir), signatures={"serving_default": module.serve})
+
+    batch = _equivalence_batch(BATCH_BUCKETS[-1])
+    expected = InferenceEngine(model).predict(batch)
+    actual = SavedModelEngine(staging_dir).predict(batch)
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    if max_abs_diff > EQUIVALENCE_TOLERANCE:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise ValueError(
+            f"Lean model differs from the full model by {max_abs_diff:.2e} (tolerance {EQUIVALENCE_TOLERANCE:.0e}); export discarded."
+        )
+
+    record_export_source(staging_dir, source_path)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    staging_dir.rename(output_dir)
+    return output_dir, max_abs_diff
+
+
+def export_tflite(
+    model: tf.keras.Model,
+    quantize: str,
+    calibration_samples: int,
+    output_path: Path | None = None,
+    source_path: Path = MODEL_PATH,
+) -> Path:
+    """Convert ``model`` to a float16 or int8 TFLite flatbuffer. Like the
+    SavedModel export, it records ``source_path`` so serving ignores it once
+    that file changes."""
+    # Trace the inference-mode forward pass: augmentation and dropout layers
+    # become identities and are not part of the exported graph.
+    forward = tf.function(lambda images: model(images, training=False))
+    concrete = forward.get_concrete_function(
+        tf.TensorSpec(shape=(None, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=tf.float32)
+    )
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        calibration_ds = _validation_dataset(batch_size=1, shuffle=True).take(max(1, calibration_samples))
+
+        def representative_dataset():
+            for images, _ in calibration_ds:
+                yield [tf.cast(images, tf.float32)]
+
+        # Input and output stay float32 so the serving code does not change;
+        # ops without an int8 kernel fall back to float.
+        converter.representative_dataset = representative_dataset
+
+    output_path = output_path or _tflite_path(quantize)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_bytes(converter.convert())
+    record_export_source(output_path, source_path)
+    return output_path
+
+
+def _latency_ms(engine, batch: np.ndarray) -> dict:
+    engine.predict(batch)
+    timings = []
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        engine.predict(batch)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return {
+        "p50": float(np.percentile(timings, 50)),
+        "p95": float(np.percentile(timings, 95)),
+    }
+
+
+def _artifact_bytes(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def compare_backends(model: tf.keras.Model, name: str, engine, artifact_path: Path) -> dict:
+    """Accuracy, top-1 agreement and latency of an export against Keras."""
+    keras_engine = InferenceEngine(model)
+
+    y_true: list[np.ndarray] = []
+    keras_pred: list[np.ndarray] = []
+    export_pred: list[np.ndarray] = []
+    max_abs_diff = 0.0
+    sample_batch = None
+    for images, labels in _validation_dataset(batch_size=BATCH_BUCKETS[-1], shuffle=False):
+        batch = images.numpy().astype(np.float32)
+        if sample_batch is None:
+            sample_batch = batch
+        keras_probs = keras_engine.predict(batch)
+        export_probs = engine.predict(batch)
+        max_abs_diff = max(max_abs_diff, float(np.max(np.abs(keras_probs - export_probs))))
+        y_true.append(labels.numpy())
+        keras_pred.append(np.argmax(keras_probs, axis=1))
+        export_pred.append(np.argmax(export_probs, axis=1))
+
+    if sample_batch is None:
+        raise ValueError(f"No validation images found in {VALIDATION_DIR}")
+
+    y_true_np = np.concatenate(y_true)
+    keras_pred_np = np.concatenate(keras_pred)
+    export_pred_np = np.concatenate(export_pred)
+
+    backends = {}
+    for backend_name, backend_engine, preds in (
+        ("keras", keras_engine, keras_pred_np),
+        (name, engine, export_pred_np),
+    ):
+        backends[backend_name] = {
+            "accuracy": float((preds == y_true_np).mean()),
+            "latency_ms_single": _latency_ms(backend_engine, sample_batch[:1]),
+            "latency_ms_batch": _latency_ms(backend_engine, sample_batch),
+        }
+
+    return {
+        "samples": int(len(y_true_np)),
+        "latency_batch_size": int(len(sample_batch)),
+        "model_bytes": {
+            "keras": _artifact_bytes(MODEL_PATH),
+            name: _artifact_bytes(artifact_path),
+        },
+        "top1_agreement": float((keras_pred_np == export_pred_np).mean()),
+        "max_abs_probability_diff": max_abs_diff,
+        "backends": backends,
+    }
+
+
+def main() -> int:
+    args = parse_args()
+
+    try:
+        model = _load_keras_model()
+        if args.format == "savedmodel":
+            output_path, max_abs_diff = export_savedmodel(model)
+            print(f"Saved lean inference SavedModel to: {output_path} (max probability diff {max_abs_diff:.2e})")
+            name = "savedmodel"
+            engine = SavedModelEngine(output_path) if args.report else None
+        else:
+            output_path = export_tflite(model, args.quantize, args.calibration_samples)
+            print(f"Saved {args.quantize} TFLite model to: {output_path}")
+            name = f"tflite-{args.quantize}"
+            engine = TFLiteEngine(output_path) if args.report else None
+
+        if args.report:
+            report = compare_backends(model, name, engine, output_path)
+            ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+            report_path = ARTIFACTS_DIR / f"export_report_{name.replace('-', '_')}.json"
+            with report_path.open("w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(json.dumps(report, indent=2))
+            print(f"Saved export report to: {report_path}")
+    except Exception as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+"""Persistent cache of decoded training and validation images.
+
+Without it every epoch of ``model.fit`` (and every evaluation) decodes and
+resizes each JPEG again. The cache keeps every image once, resized to
+``IMAGE_SIZE`` as uint8, in NumPy shards that are memory-mapped when read, so
+an epoch copies pixels out of the page cache instead of decoding.
+
+Source files are identified by path, size and modification time. A refresh
+decodes only new or changed files, into new shards named by the hash of the
+identities they hold; shards left without a live image are deleted. Build or
+refresh the cache ahead of training with:
+
+    python -m model.image_cache
+    python -m model.image_cache --rebuild
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from model.config import IMAGE_CACHE_DIR, IMAGE_SIZE, TRAIN_DIR, VALIDATION_DIR
+
+CACHE_FORMAT = 1
+# 256 images at 260x260x3 is about 52 MB per shard.
+SHARD_SIZE = 256
+
+
+def decode_resized(path: tf.Tensor) -> tf.Tensor:
+    """Decode and resize one file exactly like image_dataset_from_directory."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMAGE_SIZE, method="bilinear")
+    image.set_shape((*IMAGE_SIZE, 3))
+    return image
+
+
+def manifest_hash(identities: list[tuple[str, int, int]]) -> str:
+    """Hash of ``(path, size, mtime_ns)`` entries; names the shard holding them."""
+    digest = hashlib.sha256()
+    for path, size, mtime_ns in identities:
+        digest.update(f"{path}\0{size}\0{mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ImageCache:
+    """Memory-mapped uint8 image shards keyed by source file identity.
+
+    ``refresh()`` brings the cache up to date for a list of files;
+    ``locate()`` turns those files into slots and ``read()`` gathers a batch of
+    slots inside a tf.data pipeline.
+    """
+
+    def __init__(self, cache_dir: Path = IMAGE_CACHE_DIR):
+        self.root = cache_dir / f"v{CACHE_FORMAT}_{IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}"
+        self.manifest_path = self.root / "manifest.json"
+        # path -> [shard, row, size, mtime_ns]
+        self._entries: dict[str, list] = self._read_manifest()
+        # Slots index shards in the order they were opened: slot = index * SHARD_SIZE + row.
+        self._shard_index: dict[str, int] = {}
+        self._arrays: list[np.ndarray] = []
+
+    # -- building ----------------------------------------------------------
+
+    def refresh(self, paths: list[str]) -> dict:
+        """Cache every file in ``paths``, decoding only new or changed ones."""
+        paths = list(dict.fromkeys(paths))
+        self.root.mkdir(parents=True, exist_ok=True)
+        present = {p.stem for p in self.root.glob("*.npy")}
+        stale = []
+        for path in paths:
+            stat = os.stat(path)
+            identity = (path, stat.st_size, stat.st_mtime_ns)
+            entry = self._entries.get(path)
+            if entry is None or entry[0] not in present or tuple(entry[2:]) != identity[1:]:
+                stale.append(identity)
+
+        for start in range(0, len(stale), SHARD_SIZE):
+            self._write_shard(stale[start:start + SHARD_SIZE])
+            print(f"  cached {min(start + SHARD_SIZE, len(stale))}/{len(stale)} new or changed images")
+        removed = self._prune()
+        self._write_manifest()
+        return {"images": len(paths), "reused": len(paths) - len(stale), "decoded": len(stale), "removed": removed}
+
+    def _write_shard(self, identities: list[tuple[str, int, int]]) -> None:
+        name = manifest_hash(identities)
+        ds = tf.data.Dataset.from_tensor_slices([path for path, _, _ in identities])
+        ds = ds.map(
+            lambda path: tf.saturate_cast(tf.round(decode_resized(path)), tf.uint8),
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=True,
+        )
+        images = next(iter(ds.batch(len(identities)))).numpy()
+
+        path = self.root / f"{name}.npy"
+        tmp_path = self.root / f"{name}.{os.getpid()}.tmp"
+        with tmp_path.open("wb") as f:
+            np.save(f, images)
+        os.replace(tmp_path, path)
+        for row, (source, size, mtime_ns) in enumerate(identities):
+            self._entries[source] = [name, row, size, mtime_ns]
+
+    def _prune(self) -> int:
+        """Forget deleted files and delete shards nothing points to any more."""
+        gone = [path for path in self._entries if not os.path.exists(path)]
+        for path in gone:
+            del self._entries[path]
+        live = {entry[0] for entry in self._entries.values()}
+        for shard in self.root.iterdir():
+            if shard.name.endswith(".tmp") or (shard.suffix == ".npy" and shard.stem not in live):
+                shard.unlink(missing_ok=True)
+        return len(gone)
+
+    def _read_manifest(self) -> dict[str, list]:
+        try:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get("format") != CACHE_FORMAT:
+            return {}
+        entries = manifest.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def _write_manifest(self) -> None:
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump({"format": CACHE_FORMAT, "image_size": list(IMAGE_SIZE), "entries": self._entries}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    # -- reading -----------------------------------------------------------
+
+    def locate(self, paths: list[str]) -> np.ndarray:
+        """Slot of each file, memory-mapping the shards involved.
+
+        Raises ``KeyError`` for a file ``refresh()`` has not cached.
+        """
+        slots = np.empty(len(paths), dtype=np.int64)
+        for i, path in enumerate(paths):
+            shard, row = self._entries[path][:2]
+            index = self._shard_index.get(shard)
+            if index is None:
+                index = self._shard_index[shard] = len(self._arrays)
+                self._arrays.append(np.load(self.root / f"{shard}.npy", mmap_mode="r"))
+            slots[i] = index * SHARD_SIZE + row
+        return slots
+
+    def _gather(self, slots: np.ndarray) -> np.ndarray:
+        images = np.empty((len(slots), *IMAGE_SIZE, 3), dtype=np.uint8)
+        for i, slot in enumerate(slots):
+            # Reads the memory-mapped rows; nothing is decoded.
+            images[i] = self._arrays[slot // SHARD_SIZE][slot % SHARD_SIZE]
+        return images
+
+    def read(self, slots: tf.Tensor) -> tf.Tensor:
+        """Float32 images for a batch of slots, as ``decode_resized`` would return
+        them but rounded to whole pixel values."""
+        images = tf.numpy_function(self._gather, [slots], tf.uint8, stateful=False)
+        images.set_shape((None, *IMAGE_SIZE, 3))
+        return tf.cast(images, tf.float32)
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.root.glob("*.npy"))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build or refresh the decoded image cache for training")
+    parser.add_argument("--rebuild", action="store_true", help="Delete the cache and decode every image again")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    # Imported here: model.train imports this module.
+    from model.train import _list_image_files
+
+    if args.rebuild:
+        shutil.rmtree(ImageCache().root, ignore_errors=True)
+    paths: list[str] = []
+    for directory in (TRAIN_DIR, VALIDATION_DIR):
+        if directory.exists():
+            paths.extend(_list_image_files(directory)[0])
+    if not paths:
+        raise FileNotFoundError(f"Expected dataset folders at '{TRAIN_DIR}' and '{VALIDATION_DIR}'.")
+
+    cache = ImageCache()
+    stats = cache.refresh(paths)
+    print(
+        f"Image cache: {stats['images']} images ({stats['reused']} reused, {stats['decoded']} decoded, "
+        f"{stats['removed']} removed), {cache.size_bytes() / 1e6:.0f} MB in {cache.root}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
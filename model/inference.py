@@ -1,23 +1,77 @@
+import hashlib
 import json
-import zlib
-from functools import lru_cache
+import math
+import sys
+import threading
+import time
 from pathlib import Path
 
 import numpy as np
 import tensorflow as tf
-from PIL import Image, ImageOps
-
-from model.config import CLASS_NAMES_PATH, IMAGE_SIZE, MODEL_PATH
-from model.train import WarmupCosineDecay  # noqa: F401 — needed for Keras deserialization
+from PIL import Image
+
+from model.config import (
+    ARTIFACTS_DIR,
+    CASCADE_THRESHOLDS_PATH,
+    CLASS_NAMES_PATH,
+    IMAGE_SIZE,
+    INFERENCE_BACKEND,
+    MODEL_PATH,
+    MODEL_VERSIONS_DIR,
+    SERVING_MODEL_DIR,
+    STUDENT_MODEL_PATH,
+    TFLITE_FLOAT16_MODEL_PATH,
+    TFLITE_INT8_MODEL_PATH,
+)
+from model.engine import BATCH_BUCKETS, InferenceEngine, SavedModelEngine, TFLiteEngine, export_matches_source
+from model.schedules import WarmupCosineDecay  # noqa: F401 — needed for Keras deserialization
 
 UNCERTAIN_CONFIDENCE_THRESHOLD = 0.50
 UNCERTAIN_MARGIN_THRESHOLD = 0.10
 UNCERTAIN_TTA_DISAGREEMENT_THRESHOLD = 0.25
 UNCERTAIN_DARK_BACKGROUND_THRESHOLD = 0.35
-_RESAMPLING = getattr(Image, "Resampling", Image)
+
+# Cascade escalation uses the uncertainty rule above unless
+# ``python -m model.tune_cascade`` wrote tuned values next to the model.
+DEFAULT_CASCADE_THRESHOLDS = {
+    "confidence": UNCERTAIN_CONFIDENCE_THRESHOLD,
+    "margin": UNCERTAIN_MARGIN_THRESHOLD,
+    "disagreement": UNCERTAIN_TTA_DISAGREEMENT_THRESHOLD,
+    "dark_background": UNCERTAIN_DARK_BACKGROUND_THRESHOLD,
+}
+
+# "adaptive" scores a cheap base stage first and only escalates to the full
+# spatial/flip/scale view set when the base stage is not confident. "cascade"
+# does the same with the distilled student answering the base stage, when one
+# exists. "tiled" scores overlapping tiles instead, for high-resolution canopy
+# photos.
+TTA_POLICIES = ("adaptive", "full", "cascade", "tiled")
+DEFAULT_TTA_POLICY = "adaptive"
+
+# Reduced-effort levels the worker falls back to under backlog, whatever the
+# requested policy: 1 scores only the base stage, 2 only the fit-to-square view.
+MAX_DEGRADATION_LEVEL = 2
+
+# Tiling: model-input-sized tiles taken at these fractions of the original
+# resolution, overlapping by TILE_OVERLAP. Tiles whose vegetation fraction or
+# texture falls below the thresholds are skipped without running the model.
+TILE_SCALES = (0.5, 0.25)
+TILE_OVERLAP = 0.25
+TILE_MIN_VEGETATION = 0.20
+TILE_MIN_TEXTURE = 4.0
+# Tiles whose top class is a disease at this confidence or more are lesion
+# tiles. When any exist the image result pools only those, so a lesion on a
+# few tiles is not outvoted by the healthy canopy around it.
+TILE_LESION_CONFIDENCE = 0.60
+HEALTHY_CLASS = "healthy"
+
+# Serving backends and the artifact each one loads. The TFLite variants and the
+# lean SavedModel (preferred over the .keras file when present) are produced by
+# ``python -m model.export``; the student by ``python -m model.distill``.
+INFERENCE_BACKENDS = ("keras", "student", "tflite-float16", "tflite-int8")
+_backend = INFERENCE_BACKEND
 
 
-@lru_cache(maxsize=1)
 def _load_class_names(path: Path) -> list[str]:
     if not path.exists():
         raise FileNotFoundError(f"Class names not found: {path}")
@@ -28,82 +82,144 @@ def _load_class_names(path: Path) -> list[str]:
     return names
 
 
-def _center_crop_to_square(image: Image.Image) -> Image.Image:
-    rgb = image.convert("RGB")
-    w, h = rgb.size
-    side = min(w, h)
-    left = (w - side) // 2
-    top = (h - side) // 2
-    return rgb.crop((left, top, left + side, top + side))
+# Scales of the center crops taken inside every spatial square.
+_CENTER_CROP_SCALES = (0.95, 0.85)
+# Shortest decoded side at which even the smallest center crop still
+# downsamples to the model input; larger uploads are reduced on load.
+_MIN_DECODE_SIDE = math.ceil(max(IMAGE_SIZE) / min(_CENTER_CROP_SCALES))
 
+# A view is a square crop box (left, top, right, bottom) in source pixels plus
+# a horizontal-flip flag. Views are deduplicated geometrically and rendered
+# from the decoded image in one batched crop-and-resize.
+ViewSpec = tuple[tuple[int, int, int, int], bool]
 
-def _center_crop(image: Image.Image, scale: float) -> Image.Image:
-    w, h = image.size
-    crop_w = max(1, int(w * scale))
-    crop_h = max(1, int(h * scale))
-    left = (w - crop_w) // 2
-    top = (h - crop_h) // 2
-    return image.crop((left, top, left + crop_w, top + crop_h))
 
+def _decode_rgb(image: Image.Image) -> np.ndarray:
+    """Decode once into an ``(H, W, 3)`` uint8 array shared by every view.
 
-def _fit_to_square(image: Image.Image) -> Image.Image:
-    return ImageOps.fit(
-        image.convert("RGB"),
-        IMAGE_SIZE,
-        method=_RESAMPLING.BILINEAR,
-        centering=(0.5, 0.5),
-    )
+    Only JPEG is decoded at reduced resolution, through the DCT scaling of
+    ``draft()``. PNG and HEIF (pillow_heif) have no scaled decode, so they are
+    decoded in full and then box-``reduce()``d; that keeps the per-view work
+    small but not the decode itself. HEIF's embedded thumbnails are too small
+    to use instead. The short side never drops below ``_MIN_DECODE_SIDE``, so
+    every view is still a downsample.
+    """
+    width, height = image.size
+    short_side = min(width, height)
+    if image.format == "JPEG" and short_side >= 2 * _MIN_DECODE_SIDE:
+        scale = _MIN_DECODE_SIDE / short_side
+        image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
 
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    factor = min(image.size) // _MIN_DECODE_SIDE
+    if factor >= 2:
+        image = image.reduce(factor)
+    return np.asarray(image, dtype=np.uint8)
 
-def _spatial_square_crops(image: Image.Image) -> list[Image.Image]:
-    """Sample multiple regions so lesions near edges/tips are not discarded."""
-    rgb = image.convert("RGB")
-    w, h = rgb.size
-    side = min(w, h)
-    max_x = max(0, w - side)
-    max_y = max(0, h - side)
-
-    positions = {
-        (0, 0),
-        (max_x, 0),
-        (0, max_y),
-        (max_x, max_y),
-        (max_x // 2, max_y // 2),
-    }
 
-    crops: list[Image.Image] = []
-    for left, top in positions:
-        crops.append(rgb.crop((left, top, left + side, top + side)))
-    return crops
+def _center_square_box(width: int, height: int) -> tuple[int, int, int, int]:
+    side = min(width, height)
+    left = (width - side) // 2
+    top = (height - side) // 2
+    return (left, top, left + side, top + side)
 
 
-def _prepare_image(image: Image.Image) -> np.ndarray:
-    """Resize to model input size. No manual preprocessing needed — the model
-    includes preprocessing internally (include_preprocessing=True)."""
-    image = image.convert("RGB").resize(IMAGE_SIZE, _RESAMPLING.BILINEAR)
-    arr = np.asarray(image, dtype=np.float32)
-    return np.expand_dims(arr, axis=0)
+def _spatial_square_boxes(width: int, height: int) -> list[tuple[int, int, int, int]]:
+    """Sample multiple regions so lesions near edges/tips are not discarded."""
+    side = min(width, height)
+    max_x = max(0, width - side)
+    max_y = max(0, height - side)
+
+    positions = dict.fromkeys(
+        [
+            (0, 0),
+            (max_x, 0),
+            (0, max_y),
+            (max_x, max_y),
+            (max_x // 2, max_y // 2),
+        ]
+    )
+    return [(left, top, left + side, top + side) for left, top in positions]
+
+
+def _center_crop_box(box: tuple[int, int, int, int], scale: float) -> tuple[int, int, int, int]:
+    left, top, right, bottom = box
+    crop_w = max(1, int((right - left) * scale))
+    crop_h = max(1, int((bottom - top) * scale))
+    left += (right - left - crop_w) // 2
+    top += (bottom - top - crop_h) // 2
+    return (left, top, left + crop_w, top + crop_h)
+
+
+def _base_view_specs(width: int, height: int, mirror: bool = True) -> list[ViewSpec]:
+    """Cheap first TTA stage: the full-image fit plus its mirror."""
+    base = _center_square_box(width, height)
+    return [(base, False), (base, True)] if mirror else [(base, False)]
+
+
+def _tta_view_specs(width: int, height: int) -> list[ViewSpec]:
+    specs: list[ViewSpec] = [(_center_square_box(width, height), False)]
+
+    for square in _spatial_square_boxes(width, height):
+        specs.append((square, False))
+        specs.append((square, True))
+        for scale in _CENTER_CROP_SCALES:
+            specs.append((_center_crop_box(square, scale), False))
+
+    # Deduplicate geometrically before any pixels are touched
+    return list(dict.fromkeys(specs))
+
+
+def _normalized_boxes(
+    boxes: list[tuple[int, int, int, int]], width: int, height: int
+) -> np.ndarray:
+    """Convert pixel boxes to ``crop_and_resize`` coordinates.
+
+    Sample positions follow the half-pixel-center convention of
+    ``tf.image.resize``, which is what the training pipeline used.
+    """
+    out_w, out_h = IMAGE_SIZE
+    arr = np.asarray(boxes, dtype=np.float64)
+    crop_w = arr[:, 2] - arr[:, 0]
+    crop_h = arr[:, 3] - arr[:, 1]
+    x1 = arr[:, 0] + 0.5 * crop_w / out_w - 0.5
+    y1 = arr[:, 1] + 0.5 * crop_h / out_h - 0.5
+    x2 = x1 + (out_w - 1) * crop_w / out_w
+    y2 = y1 + (out_h - 1) * crop_h / out_h
+    normalized = np.stack(
+        [y1 / max(1, height - 1), x1 / max(1, width - 1), y2 / max(1, height - 1), x2 / max(1, width - 1)],
+        axis=1,
+    )
+    return np.clip(normalized, 0.0, 1.0).astype(np.float32)
 
 
-def _tta_views(image: Image.Image) -> list[Image.Image]:
-    base = image.convert("RGB")
-    views: list[Image.Image] = [_fit_to_square(base)]
+def _render_views(pixels: tf.Tensor, specs: list[ViewSpec]) -> np.ndarray:
+    """Crop and resize every distinct box in one batched op.
 
-    for square in _spatial_square_crops(base):
-        views.append(square)
-        views.append(square.transpose(Image.FLIP_LEFT_RIGHT))
-        for scale in (0.95, 0.85):
-            crop = _center_crop(square, scale)
-            views.append(crop)
+    Returns a float32 ``(N, H, W, 3)`` batch in ``specs`` order; flipped views
+    are mirrored copies of their box's crop. No manual preprocessing needed —
+    the model includes preprocessing internally (include_preprocessing=True).
+    """
+    height, width = int(pixels.shape[1]), int(pixels.shape[2])
+    boxes = list(dict.fromkeys(box for box, _ in specs))
+    crops = tf.image.crop_and_resize(
+        pixels,
+        _normalized_boxes(boxes, width, height),
+        tf.zeros(len(boxes), dtype=tf.int32),
+        (IMAGE_SIZE[1], IMAGE_SIZE[0]),
+        method="bilinear",
+    ).numpy()
 
-    # Deduplicate by content hash to avoid repeated identical views
-    unique: dict[int, Image.Image] = {}
-    for view in views:
-        arr = np.asarray(view.resize((32, 32), _RESAMPLING.BILINEAR), dtype=np.uint8)
-        key = zlib.crc32(arr.tobytes())
-        unique[key] = view
+    if len(boxes) == len(specs) and not any(flipped for _, flipped in specs):
+        return crops
 
-    return list(unique.values())
+    box_index = {box: i for i, box in enumerate(boxes)}
+    batch = np.empty((len(specs), IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    for i, (box, flipped) in enumerate(specs):
+        crop = crops[box_index[box]]
+        batch[i] = crop[:, ::-1] if flipped else crop
+    return batch
 
 
 def _tta_disagreement(per_view_probs: np.ndarray) -> float:
@@ -114,38 +230,255 @@ def _tta_disagreement(per_view_probs: np.ndarray) -> float:
     return 1.0 - (majority / max(1, len(per_view_top)))
 
 
-def _dark_background_ratio(image: Image.Image) -> float:
+def _passes_thresholds(per_view_probs: np.ndarray, dark_ratio: float, thresholds: dict[str, float]) -> bool:
+    """Cascade exit check: the early-exit rule plus the dark-background limit."""
+    return dark_ratio <= thresholds["dark_background"] and _is_confident(per_view_probs, thresholds)
+
+
+def _is_confident(per_view_probs: np.ndarray, thresholds: dict[str, float] | None = None) -> bool:
+    """Early-exit check: confidence, margin and view agreement all pass."""
+    thresholds = thresholds or DEFAULT_CASCADE_THRESHOLDS
+    probs = np.mean(per_view_probs, axis=0)
+    ranked = np.sort(probs)[::-1]
+    best_conf = float(ranked[0])
+    margin = best_conf - (float(ranked[1]) if len(ranked) > 1 else 0.0)
+    return (
+        best_conf >= thresholds["confidence"]
+        and margin >= thresholds["margin"]
+        and _tta_disagreement(per_view_probs) <= thresholds["disagreement"]
+    )
+
+
+def _dark_background_ratio(arr: np.ndarray) -> float:
     """Heuristic for studio/isolated backgrounds (often out-of-distribution for field data)."""
-    arr = np.asarray(image.convert("RGB"), dtype=np.uint8)
     is_dark = np.all(arr <= 20, axis=-1)
     return float(np.mean(is_dark))
 
 
-@lru_cache(maxsize=1)
 def _load_model(path: Path) -> tf.keras.Model:
     if not path.exists():
         raise FileNotFoundError(
             f"Model not found at '{path}'. Train first with: python -m model.train"
         )
-    return tf.keras.models.load_model(path)
-
-
-def warmup_inference_assets() -> None:
-    """Load artifacts eagerly so long-lived workers pay the startup cost once."""
-    _load_class_names(CLASS_NAMES_PATH)
-    _load_model(MODEL_PATH)
-
+    # Serving never trains, so skip restoring the optimizer and compile state.
+    return tf.keras.models.load_model(path, compile=False)
+
+
+def _artifact_fingerprint(*paths: Path) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        if path.is_dir():
+            # SavedModel artifacts are directories: hash every file in a stable order.
+            files = sorted(p for p in path.rglob("*") if p.is_file())
+        else:
+            files = [path]
+        for file in files:
+            with file.open("rb") as f:
+                digest.update(hashlib.file_digest(f, "sha256").digest())
+    return digest.hexdigest()
+
+
+def set_inference_backend(backend: str) -> None:
+    """Select the backend used by ``score_views``; call before warmup."""
+    global _backend, _served
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Expected one of: {', '.join(INFERENCE_BACKENDS)}")
+    with _load_lock:
+        if backend != _backend:
+            _served = None
+        _backend = backend
+
+
+def _artifacts_root(version: str | None) -> Path:
+    """Directory holding the artifacts for ``version``.
+
+    ``None`` is the unversioned layout directly under ``ARTIFACTS_DIR``;
+    named versions live in ``MODEL_VERSIONS_DIR/<version>/`` with the same
+    file names.
+    """
+    if version is None:
+        return ARTIFACTS_DIR
+    root = MODEL_VERSIONS_DIR / version
+    if Path(version).name != version or not root.is_dir():
+        raise FileNotFoundError(f"Model version '{version}' not found under {MODEL_VERSIONS_DIR}")
+    return root
+
+
+def _backend_model_path(backend: str, root: Path) -> Path:
+    """Artifact to serve for ``backend``. Exports that were not made from the
+    current ``.keras`` file are skipped in favour of the Keras model."""
+    if backend == "student":
+        return root / STUDENT_MODEL_PATH.name
+    keras_path = root / MODEL_PATH.name
+    if backend in ("tflite-float16", "tflite-int8"):
+        tflite_path = root / (TFLITE_INT8_MODEL_PATH if backend == "tflite-int8" else TFLITE_FLOAT16_MODEL_PATH).name
+        if tflite_path.exists() and keras_path.exists() and not export_matches_source(tflite_path, keras_path):
+            print(
+                f"Ignoring {tflite_path.name}: it was not exported from the current {keras_path.name}. "
+                f"Re-run python -m model.export --format tflite --quantize {backend.removeprefix('tflite-')}.",
+                file=sys.stderr,
+            )
+            return _backend_model_path("keras", root)
+        return tflite_path
+    serving_dir = root / SERVING_MODEL_DIR.name
+    if not serving_dir.exists():
+        return keras_path
+    if keras_path.exists() and not export_matches_source(serving_dir, keras_path):
+        print(
+            f"Ignoring {serving_dir.name}: it was not exported from the current {keras_path.name}. "
+            "Re-run python -m model.export --format savedmodel.",
+            file=sys.stderr,
+        )
+        return keras_path
+    return serving_dir
 
-def predict_image(image: Image.Image, top_k: int = 3) -> dict:
-    model = _load_model(MODEL_PATH)
-    class_names = _load_class_names(CLASS_NAMES_PATH)
 
-    views = _tta_views(image)
-    probs_stack = []
-    for view in views:
-        input_tensor = _prepare_image(view)
-        probs_stack.append(model.predict(input_tensor, verbose=0)[0])
-    per_view_probs = np.stack(probs_stack, axis=0)
+def _load_cascade_thresholds(path: Path) -> dict[str, float]:
+    if not path.exists():
+        return dict(DEFAULT_CASCADE_THRESHOLDS)
+    with path.open("r", encoding="utf-8") as f:
+        tuned = json.load(f)
+    return {name: float(tuned.get(name, default)) for name, default in DEFAULT_CASCADE_THRESHOLDS.items()}
+
+
+def _load_engine(backend: str, path: Path) -> InferenceEngine | SavedModelEngine | TFLiteEngine:
+    if path.suffix == ".tflite":
+        return TFLiteEngine(path)
+    if path.name == SERVING_MODEL_DIR.name:
+        return SavedModelEngine(path)
+    if backend == "student" and not path.exists():
+        raise FileNotFoundError(f"Student model not found at '{path}'. Distill one with: python -m model.distill")
+    return InferenceEngine(_load_model(path))
+
+
+class ServedModel:
+    """A loaded model with the class names and identity that go with it.
+
+    Predictions hold on to the instance they were opened with, so a reload
+    never mixes two models' outputs or labels within one request.
+
+    ``fingerprint`` identifies the model and class names alone;
+    ``cascade_fingerprint`` adds the student and cascade thresholds that
+    cascade results also depend on. ``cascade=False`` skips loading the
+    student, e.g. when the model is only used as a distillation teacher.
+
+    Construction does not trace anything; long-lived servers call
+    ``warmup()`` (through ``reload_model``) so requests never wait on a
+    trace, while one-shot scripts only trace the buckets they use.
+    """
+
+    def __init__(self, backend: str, version: str | None = None, cascade: bool = True):
+        root = _artifacts_root(version)
+        self.backend = backend
+        self.model_path = _backend_model_path(backend, root)
+        self.class_names_path = root / CLASS_NAMES_PATH.name
+        # Time spent in each load phase, in milliseconds.
+        self.load_ms: dict[str, float] = {}
+
+        start = time.perf_counter()
+        self.class_names = _load_class_names(self.class_names_path)
+        self.load_ms["load_class_names"] = (time.perf_counter() - start) * 1000.0
+
+        start = time.perf_counter()
+        self.engine = _load_engine(backend, self.model_path)
+        self.load_ms["load_model"] = (time.perf_counter() - start) * 1000.0
+        if self.engine.num_classes != len(self.class_names):
+            raise ValueError(
+                f"Model outputs {self.engine.num_classes} classes but "
+                f"{self.class_names_path} lists {len(self.class_names)}."
+            )
+
+        # Cascade inference: the distilled student answers first when it is
+        # shipped alongside this model.
+        self.student: ServedModel | None = None
+        student_path = root / STUDENT_MODEL_PATH.name
+        thresholds_path = root / CASCADE_THRESHOLDS_PATH.name
+        if cascade and backend != "student" and student_path.exists():
+            start = time.perf_counter()
+            self.student = ServedModel("student", version)
+            self.load_ms["load_student"] = (time.perf_counter() - start) * 1000.0
+        self.cascade_thresholds = _load_cascade_thresholds(thresholds_path)
+
+        start = time.perf_counter()
+        self.fingerprint = _artifact_fingerprint(self.model_path, self.class_names_path)
+        self.cascade_fingerprint = self.fingerprint
+        if self.student is not None:
+            extras = [path for path in (student_path, thresholds_path) if path.exists()]
+            digest = hashlib.sha256(self.fingerprint.encode())
+            digest.update(_artifact_fingerprint(*extras).encode())
+            self.cascade_fingerprint = digest.hexdigest()
+        self.load_ms["fingerprint"] = (time.perf_counter() - start) * 1000.0
+
+        # Unversioned artifacts are identified by content instead of a name.
+        self.version = version if version is not None else f"sha256:{self.fingerprint[:12]}"
+        self.requested_version = version
+
+    def warmup(self) -> None:
+        """Pretrace every batch bucket of this model and its cascade student."""
+        start = time.perf_counter()
+        self.engine.warmup()
+        if self.student is not None:
+            self.student.engine.warmup()
+        self.load_ms["warmup"] = (time.perf_counter() - start) * 1000.0
+
+
+_served: ServedModel | None = None
+# Serializes loads; serving reads ``_served`` without taking it.
+_load_lock = threading.Lock()
+
+
+def served_model() -> ServedModel:
+    """The model currently being served, loading the default one on first use."""
+    global _served
+    served = _served
+    if served is None:
+        with _load_lock:
+            if _served is None:
+                _served = ServedModel(_backend)
+            served = _served
+    return served
+
+
+def reload_model(version: str | None = None, warm: bool = True) -> ServedModel:
+    """Load and warm ``version`` with the current backend, then swap it in.
+
+    Requests keep being served by the previous model while this runs; the
+    swap is a single reference assignment. Without a version, the currently
+    served version is re-read from disk. On failure the old model stays.
+    ``warm=False`` skips the pretrace for one-shot callers.
+    """
+    global _served
+    with _load_lock:
+        if version is None and _served is not None:
+            version = _served.requested_version
+        replacement = ServedModel(_backend, version)
+        if warm:
+            replacement.warmup()
+        _served = replacement
+    return replacement
+
+
+def warmup_inference_assets(version: str | None = None) -> dict[str, float]:
+    """Load artifacts and pretrace every batch bucket so long-lived workers
+    pay the startup cost once and requests never trigger a retrace.
+
+    Returns the time spent in each phase, in milliseconds.
+    """
+    return dict(reload_model(version).load_ms)
+
+
+def score_views(batch: np.ndarray, model: ServedModel | None = None) -> np.ndarray:
+    """Run a prepared ``(N, H, W, 3)`` view batch through ``model`` (by
+    default the one currently served)."""
+    return (model or served_model()).engine.predict(batch)
+
+
+def _summarize(
+    per_view_probs: np.ndarray,
+    dark_background_ratio: float,
+    top_k: int,
+    class_names: list[str],
+) -> dict:
     probs = np.mean(per_view_probs, axis=0)
 
     best_idx = int(np.argmax(probs))
@@ -159,7 +492,6 @@ def predict_image(image: Image.Image, top_k: int = 3) -> dict:
     second_conf = float(probs[int(sorted_idx[1])]) if len(sorted_idx) > 1 else 0.0
     margin = best_conf - second_conf
     tta_disagreement = _tta_disagreement(per_view_probs)
-    dark_background_ratio = _dark_background_ratio(_center_crop_to_square(image))
     is_uncertain = (
         best_conf < UNCERTAIN_CONFIDENCE_THRESHOLD
         or margin < UNCERTAIN_MARGIN_THRESHOLD
@@ -177,3 +509,431 @@ def predict_image(image: Image.Image, top_k: int = 3) -> dict:
         "tta_disagreement": float(tta_disagreement),
         "dark_background_ratio": float(dark_background_ratio),
     }
+
+
+class TTAPrediction:
+    """Staged TTA state for one image.
+
+    Callers pull each stage's prepared views with ``pending_batch()``, score
+    them (possibly stacked with other images' views into one forward pass)
+    and hand the probabilities back through ``submit()`` until ``done``.
+
+    ``served`` is the model the result is reported against; ``model`` is the
+    one that must score the pending batch. They differ only while a cascade
+    prediction is in its student stage.
+    """
+
+    def __init__(
+        self,
+        image: Image.Image,
+        top_k: int = 3,
+        tta_policy: str = DEFAULT_TTA_POLICY,
+        model: ServedModel | None = None,
+        degradation_level: int = 0,
+    ):
+        if tta_policy not in ("adaptive", "full", "cascade"):
+            raise ValueError(f"Unknown TTA policy: {tta_policy}")
+        if not 0 <= degradation_level <= MAX_DEGRADATION_LEVEL:
+            raise ValueError(f"Degradation level must be between 0 and {MAX_DEGRADATION_LEVEL}.")
+        self.served = model or served_model()
+        self.model = self.served
+        if tta_policy == "cascade" and self.served.student is not None:
+            self.model = self.served.student
+        self.degradation_level = degradation_level
+
+        # Per-stage wall time in nanoseconds. Callers add "forward" themselves
+        # since the forward pass may be shared with other requests.
+        self.timings_ns: dict[str, int] = {}
+        started = time.perf_counter_ns()
+
+        # Decode once; the caller may close the source file right away.
+        pixels = _decode_rgb(image)
+        self.height, self.width = pixels.shape[:2]
+        self.top_k = top_k
+        self.tta_policy = tta_policy
+        left, top, right, bottom = _center_square_box(self.width, self.height)
+        self.dark_background_ratio = _dark_background_ratio(pixels[top:bottom, left:right])
+        self._pixels = tf.convert_to_tensor(pixels[np.newaxis])
+        self._seen: set[ViewSpec] = set()
+        self._scored: list[np.ndarray] = []
+        self.add_timing("decode", time.perf_counter_ns() - started)
+
+        if degradation_level > 0:
+            # Degraded requests never escalate past the base stage.
+            self.tta_stage = "base"
+            self._pending = self._render(_base_view_specs(self.width, self.height, mirror=degradation_level < 2))
+        elif tta_policy in ("adaptive", "cascade"):
+            self.tta_stage = "base"
+            self._pending = self._render(_base_view_specs(self.width, self.height))
+        else:
+            self.tta_stage = "full"
+            self._pending = self._render(_tta_view_specs(self.width, self.height))
+
+    def add_timing(self, stage: str, elapsed_ns: int) -> None:
+        self.timings_ns[stage] = self.timings_ns.get(stage, 0) + elapsed_ns
+
+    def _render(self, specs: list[ViewSpec]) -> np.ndarray | None:
+        new_specs = [spec for spec in specs if spec not in self._seen]
+        if not new_specs:
+            return None
+        started = time.perf_counter_ns()
+        self._seen.update(new_specs)
+        views = _render_views(self._pixels, new_specs)
+        self.add_timing("views", time.perf_counter_ns() - started)
+        return views
+
+    @property
+    def done(self) -> bool:
+        return self._pending is None
+
+    @property
+    def pending_views(self) -> int:
+        return 0 if self._pending is None else len(self._pending)
+
+    def pending_batch(self) -> np.ndarray | None:
+        return self._pending
+
+    def submit(self, probs: np.ndarray) -> None:
+        self._scored.append(probs)
+        self._pending = None
+
+        if self.tta_stage == "base" and self.degradation_level == 0 and not self._confident(probs):
+            self.tta_stage = "full"
+            if self.model is not self.served:
+                # Escalate to the heavy model; student and teacher
+                # probabilities are never averaged together.
+                self.model = self.served
+                self._scored.clear()
+                self._seen.clear()
+            self._pending = self._render(_tta_view_specs(self.width, self.height))
+        if self._pending is None:
+            self._pixels = None
+
+    def _confident(self, probs: np.ndarray) -> bool:
+        if self.tta_policy == "cascade":
+            return _passes_thresholds(probs, self.dark_background_ratio, self.served.cascade_thresholds)
+        return _is_confident(probs)
+
+    @property
+    def cascade_tier(self) -> str:
+        """"fast" when the answer came from the base stage, else "full"."""
+        return "fast" if self.tta_stage == "base" else "full"
+
+    def view_probabilities(self) -> np.ndarray:
+        """Per-view probabilities of every scored view."""
+        if not self.done:
+            raise RuntimeError("TTA prediction still has views to score.")
+        return np.concatenate(self._scored, axis=0)
+
+    def probabilities(self) -> np.ndarray:
+        """Class probabilities averaged over every scored view."""
+        return np.mean(self.view_probabilities(), axis=0)
+
+    def result(self) -> dict:
+        if not self.done:
+            raise RuntimeError("TTA prediction still has views to score.")
+        started = time.perf_counter_ns()
+        per_view_probs = np.concatenate(self._scored, axis=0)
+        class_names = self.served.class_names
+        result = _summarize(per_view_probs, self.dark_background_ratio, self.top_k, class_names)
+        result["tta_stage"] = self.tta_stage
+        result["tta_views"] = int(len(per_view_probs))
+        if self.tta_policy == "cascade":
+            result["cascade_tier"] = self.cascade_tier
+        result["model_version"] = self.served.version
+        result["degradation_level"] = self.degradation_level
+        self.add_timing("postprocess", time.perf_counter_ns() - started)
+        return result
+
+
+def _decode_rgb_at(image: Image.Image, scale: float) -> np.ndarray:
+    """Decode to at least ``scale`` times the original resolution.
+
+    JPEG ``draft()`` only picks DCT scales that stay at or above the requested
+    size; other formats are fully decoded, then box-reduced by whole factors.
+    """
+    width, height = image.size
+    target = (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+    if image.format == "JPEG":
+        image.draft("RGB", target)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    factor = min(image.size[0] // target[0], image.size[1] // target[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    return np.asarray(image, dtype=np.uint8)
+
+
+def _tile_starts(length: int, side: int, overlap: float) -> list[int]:
+    if length <= side:
+        return [0]
+    stride = max(1, int(side * (1.0 - overlap)))
+    count = math.ceil((length - side) / stride) + 1
+    return sorted({int(round(v)) for v in np.linspace(0, length - side, count)})
+
+
+def _tile_grid(width: int, height: int, side: int, overlap: float) -> list[list[tuple[int, int, int, int]]]:
+    """Rows of square tile boxes covering the image edge to edge."""
+    side = min(side, width, height)
+    return [
+        [(left, top, left + side, top + side) for left in _tile_starts(width, side, overlap)]
+        for top in _tile_starts(height, side, overlap)
+    ]
+
+
+def _integral(values: np.ndarray) -> np.ndarray:
+    return np.pad(values.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+
+
+class _TileFilter:
+    """Cheap leaf-content check for tile boxes.
+
+    Vegetation is green (excess-green index) or yellow/brown leaf tissue, so
+    lesion-heavy tiles are not mistaken for background; texture is the
+    luminance standard deviation. Both are read from integral images of a
+    strided thumbnail, so every tile costs four lookups per statistic.
+    """
+
+    def __init__(self, pixels: np.ndarray, step: int):
+        self.step = max(1, step)
+        thumb = pixels[:: self.step, :: self.step].astype(np.float32)
+        r, g, b = thumb[..., 0], thumb[..., 1], thumb[..., 2]
+        luminance = 0.299 * r + 0.587 * g + 0.114 * b
+        vegetation = ((2 * g - r - b > 20) | ((r + g) / 2 - b > 40)) & (luminance > 30)
+        self._vegetation = _integral(vegetation.astype(np.float64))
+        self._luminance = _integral(luminance.astype(np.float64))
+        self._luminance_sq = _integral(luminance.astype(np.float64) ** 2)
+
+    def _mean(self, table: np.ndarray, box: tuple[int, int, int, int]) -> float:
+        left, top, right, bottom = box
+        l, t = left // self.step, top // self.step
+        r = max(l + 1, min(table.shape[1] - 1, right // self.step))
+        b = max(t + 1, min(table.shape[0] - 1, bottom // self.step))
+        total = table[b, r] - table[t, r] - table[b, l] + table[t, l]
+        return float(total) / ((r - l) * (b - t))
+
+    def keep(self, box: tuple[int, int, int, int]) -> bool:
+        if self._mean(self._vegetation, box) < TILE_MIN_VEGETATION:
+            return False
+        mean = self._mean(self._luminance, box)
+        variance = self._mean(self._luminance_sq, box) - mean * mean
+        return math.sqrt(max(0.0, variance)) >= TILE_MIN_TEXTURE
+
+
+def _lesion_tiles(per_tile_probs: np.ndarray, class_names: list[str]) -> np.ndarray:
+    """Mask of tiles confidently classified as any class but ``HEALTHY_CLASS``."""
+    if HEALTHY_CLASS not in class_names:
+        return np.zeros(len(per_tile_probs), dtype=bool)
+    top = np.argmax(per_tile_probs, axis=1)
+    confident = per_tile_probs[np.arange(len(top)), top] >= TILE_LESION_CONFIDENCE
+    return confident & (top != class_names.index(HEALTHY_CLASS))
+
+
+class TiledPrediction:
+    """Tiled inference state for one high-resolution image.
+
+    Same protocol as ``TTAPrediction`` (``pending_batch``/``submit`` until
+    ``done``), so it can share forward passes through the micro-batcher.
+    Surviving tiles are rendered in chunks to bound memory on very large
+    photos. The result averages the lesion tiles' probabilities (all tiles
+    when none is a confident disease call) and adds a per-tile grid.
+    """
+
+    _CHUNK = 2 * BATCH_BUCKETS[-1]
+
+    def __init__(
+        self,
+        image: Image.Image,
+        top_k: int = 3,
+        scales: tuple[float, ...] = TILE_SCALES,
+        model: ServedModel | None = None,
+    ):
+        self.model = model or served_model()
+        self.timings_ns: dict[str, int] = {}
+        started = time.perf_counter_ns()
+
+        original_width, original_height = image.size
+        pixels = _decode_rgb_at(image, max(scales))
+        self.height, self.width = pixels.shape[:2]
+        self.top_k = top_k
+        self.tta_policy = "tiled"
+        self.tta_stage = "tiled"
+        to_original = original_width / self.width
+        left, top, right, bottom = _center_square_box(self.width, self.height)
+        self.dark_background_ratio = _dark_background_ratio(pixels[top:bottom, left:right])
+        self.add_timing("decode", time.perf_counter_ns() - started)
+
+        started = time.perf_counter_ns()
+        tile_side = max(IMAGE_SIZE)
+        grids = []
+        for scale in sorted(scales, reverse=True):
+            rows = _tile_grid(self.width, self.height, round(tile_side / scale / to_original), TILE_OVERLAP)
+            # Small images clamp every scale to the same whole-image grid.
+            if all(rows != previous for _, previous in grids):
+                grids.append((scale, rows))
+        smallest_side = min(rows[0][0][2] - rows[0][0][0] for _, rows in grids)
+        tile_filter = _TileFilter(pixels, smallest_side // 16)
+
+        self._grids: list[dict] = []
+        self._boxes: list[tuple[int, int, int, int]] = []
+        for scale, rows in grids:
+            cells = []
+            for row in rows:
+                cells.append([])
+                for box in row:
+                    if tile_filter.keep(box):
+                        cells[-1].append(len(self._boxes))
+                        self._boxes.append(box)
+                    else:
+                        cells[-1].append(None)
+            side = rows[0][0][2] - rows[0][0][0]
+            self._grids.append({"scale": scale, "tile_size": round(side * to_original), "cells": cells})
+
+        self.tiles_total = sum(len(row) for _, rows in grids for row in rows)
+        self.prefilter_fallback = not self._boxes
+        if self.prefilter_fallback:
+            # Nothing looked like leaf tissue: score the coarsest grid anyway
+            # rather than returning no prediction.
+            _, rows = grids[-1]
+            cells = []
+            for row in rows:
+                cells.append(list(range(len(self._boxes), len(self._boxes) + len(row))))
+                self._boxes.extend(row)
+            self._grids[-1]["cells"] = cells
+        self.add_timing("tile_filter", time.perf_counter_ns() - started)
+
+        self._pixels = tf.convert_to_tensor(pixels[np.newaxis])
+        self._scored: list[np.ndarray] = []
+        self._next = 0
+        self._pending = self._render_next()
+
+    def add_timing(self, stage: str, elapsed_ns: int) -> None:
+        self.timings_ns[stage] = self.timings_ns.get(stage, 0) + elapsed_ns
+
+    def _render_next(self) -> np.ndarray | None:
+        if self._next >= len(self._boxes):
+            self._pixels = None
+            return None
+        started = time.perf_counter_ns()
+        boxes = self._boxes[self._next : self._next + self._CHUNK]
+        self._next += len(boxes)
+        views = _render_views(self._pixels, [(box, False) for box in boxes])
+        self.add_timing("views", time.perf_counter_ns() - started)
+        return views
+
+    @property
+    def done(self) -> bool:
+        return self._pending is None
+
+    @property
+    def pending_views(self) -> int:
+        return 0 if self._pending is None else len(self._pending)
+
+    def pending_batch(self) -> np.ndarray | None:
+        return self._pending
+
+    def submit(self, probs: np.ndarray) -> None:
+        self._scored.append(probs)
+        self._pending = self._render_next()
+
+    def result(self) -> dict:
+        if not self.done:
+            raise RuntimeError("Tiled prediction still has tiles to score.")
+        started = time.perf_counter_ns()
+        per_tile_probs = np.concatenate(self._scored, axis=0)
+        class_names = self.model.class_names
+        lesion = _lesion_tiles(per_tile_probs, class_names)
+        pooled = per_tile_probs[lesion] if lesion.any() else per_tile_probs
+        result = _summarize(pooled, self.dark_background_ratio, self.top_k, class_names)
+        result["tta_stage"] = self.tta_stage
+        result["tta_views"] = int(len(per_tile_probs))
+        result["model_version"] = self.model.version
+        result["degradation_level"] = 0
+
+        tile_classes = np.argmax(per_tile_probs, axis=1)
+        grids = []
+        for grid in self._grids:
+            cells = [
+                [
+                    None
+                    if index is None
+                    else {
+                        "class": class_names[int(tile_classes[index])],
+                        "confidence": float(per_tile_probs[index, tile_classes[index]]),
+                    }
+                    for index in row
+                ]
+                for row in grid["cells"]
+            ]
+            grids.append(
+                {
+                    "scale": grid["scale"],
+                    "tile_size": grid["tile_size"],
+                    "rows": len(cells),
+                    "cols": len(cells[0]),
+                    "grid": cells,
+                }
+            )
+        result["tiles"] = {
+            "total": self.tiles_total,
+            "scored": int(len(per_tile_probs)),
+            "skipped": self.tiles_total - int(len(per_tile_probs)),
+            "lesion": int(lesion.sum()),
+            "prefilter_fallback": self.prefilter_fallback,
+            "grids": grids,
+        }
+        self.add_timing("postprocess", time.perf_counter_ns() - started)
+        return result
+
+
+# Anything that follows the pending_batch()/submit() protocol.
+StagedPrediction = TTAPrediction | TiledPrediction
+
+
+def open_prediction(
+    image: Image.Image,
+    top_k: int = 3,
+    tta_policy: str = DEFAULT_TTA_POLICY,
+    model: ServedModel | None = None,
+    degradation_level: int = 0,
+) -> StagedPrediction:
+    """Decode ``image`` and prepare the staged prediction for ``tta_policy``.
+
+    The prediction is pinned to ``model`` (by default the one served right
+    now) until it completes, even if a reload swaps in another. Any
+    ``degradation_level`` above 0 overrides the policy with a reduced view set.
+    """
+    if tta_policy not in TTA_POLICIES:
+        raise ValueError(f"Unknown TTA policy: {tta_policy}")
+    if tta_policy == "tiled" and degradation_level == 0:
+        return TiledPrediction(image, top_k=top_k, model=model)
+    if tta_policy == "tiled":
+        tta_policy = DEFAULT_TTA_POLICY
+    return TTAPrediction(
+        image, top_k=top_k, tta_policy=tta_policy, model=model, degradation_level=degradation_level
+    )
+
+
+def timings_ms(timings_ns: dict[str, int]) -> dict[str, float]:
+    return {stage: round(ns / 1e6, 3) for stage, ns in timings_ns.items()}
+
+
+def predict_image(
+    image: Image.Image,
+    top_k: int = 3,
+    tta_policy: str = DEFAULT_TTA_POLICY,
+    include_timings: bool = False,
+) -> dict:
+    started = time.perf_counter_ns()
+    prediction = open_prediction(image, top_k=top_k, tta_policy=tta_policy)
+    # Each stage's views go through the network in a single forward pass.
+    while not prediction.done:
+        forward_started = time.perf_counter_ns()
+        probs = score_views(prediction.pending_batch(), prediction.model)
+        prediction.add_timing("forward", time.perf_counter_ns() - forward_started)
+        prediction.submit(probs)
+    result = prediction.result()
+    if include_timings:
+        prediction.add_timing("total", time.perf_counter_ns() - started)
+        result["timings_ms"] = timings_ms(prediction.timings_ns)
+    return result
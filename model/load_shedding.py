@@ -0,0 +1,88 @@
+import threading
+import time
+
+from model.config import DEGRADE_LATENCY_MS, DEGRADE_QUEUE_DEPTHS
+
+# A level is only left once every signal is below this fraction of the
+# threshold that triggered it, so the worker does not flap between levels.
+RECOVERY_RATIO = 0.5
+# Weight of the newest sample in the smoothed latency.
+LATENCY_SMOOTHING = 0.2
+
+
+def deadline_expired(deadline_ms: float | None) -> bool:
+    """``deadline_ms`` is a Unix epoch time in milliseconds, as sent by clients."""
+    return deadline_ms is not None and time.time() * 1000.0 >= deadline_ms
+
+
+class LoadShedder:
+    """Chooses how much TTA effort new requests get from current load.
+
+    Level 0 is normal service; each threshold pair in ``queue_depths`` and
+    ``latency_ms`` raises the level by one when either signal reaches it.
+    Latency only counts while requests are queued: with no backlog a slow
+    request (a slow CPU, one serial client) has nobody to make wait, so it
+    must not degrade the next one. Levels rise immediately and fall one step
+    at a time with hysteresis.
+    """
+
+    def __init__(
+        self,
+        queue_depths: tuple[int, ...] = DEGRADE_QUEUE_DEPTHS,
+        latency_ms: tuple[float, ...] = DEGRADE_LATENCY_MS,
+        enabled: bool = True,
+    ):
+        self.queue_depths = queue_depths
+        self.latency_thresholds = latency_ms
+        self.enabled = enabled
+        self.level = 0
+        self.queue_depth = 0
+        self.latency_ms: float | None = None
+        self.transitions = 0
+        self._lock = threading.Lock()
+
+    def record_latency(self, elapsed_ns: int) -> None:
+        elapsed_ms = elapsed_ns / 1e6
+        with self._lock:
+            if self.latency_ms is None:
+                self.latency_ms = elapsed_ms
+            else:
+                self.latency_ms += LATENCY_SMOOTHING * (elapsed_ms - self.latency_ms)
+
+    @staticmethod
+    def _level_for(value: float, thresholds: tuple[float, ...], ratio: float = 1.0) -> int:
+        return sum(value >= threshold * ratio for threshold in thresholds)
+
+    def update(self, queue_depth: int) -> int:
+        """Degradation level for a request arriving with ``queue_depth`` ahead of it."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            self.queue_depth = queue_depth
+            latency = (self.latency_ms or 0.0) if queue_depth > 0 else 0.0
+            target = max(
+                self._level_for(queue_depth, self.queue_depths),
+                self._level_for(latency, self.latency_thresholds),
+            )
+            if target > self.level:
+                self.level = target
+                self.transitions += 1
+            elif self.level > 0:
+                recovered = max(
+                    self._level_for(queue_depth, self.queue_depths, RECOVERY_RATIO),
+                    self._level_for(latency, self.latency_thresholds, RECOVERY_RATIO),
+                )
+                if recovered < self.level:
+                    self.level -= 1
+                    self.transitions += 1
+            return self.level
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "level": self.level,
+                "queue_depth": self.queue_depth,
+                "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                "transitions": self.transitions,
+            }
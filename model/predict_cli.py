@@ -1,13 +1,24 @@
 import argparse
+import glob
+import hashlib
 import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import TextIO
 
 from PIL import Image, UnidentifiedImageError
 
 # Keep stdout clean so Spring can parse JSON reliably.
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+from model.runtime_profile import apply_runtime_profile, configure_threads
+
+# oneDNN follows the host profile from python -m model.tune_runtime, if any.
+RUNTIME_SETTINGS = apply_runtime_profile()
 os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "0")
 
 try:
@@ -15,14 +26,239 @@ try:
 except Exception:
     register_heif_opener = None
 
-from model.inference import predict_image
+from model.batching import BatchItem, MicroBatcher
+from model.config import INFERENCE_BACKEND
+from model.engine import BATCH_BUCKETS
+from model.inference import (
+    DEFAULT_TTA_POLICY,
+    INFERENCE_BACKENDS,
+    TTA_POLICIES,
+    StagedPrediction,
+    open_prediction,
+    predict_image,
+    reload_model,
+    score_views,
+    set_inference_backend,
+    timings_ms,
+    warmup_inference_assets,
+)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".heic", ".heif", ".webp", ".bmp"}
+
+
+def _parse_shard(value: str) -> tuple[int, int]:
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected i/n, e.g. 0/4") from None
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError("shard index must be in [0, n)")
+    return index, count
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Rice disease prediction CLI")
-    parser.add_argument("--image", required=True, help="Path to input image")
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("--image", help="Path to input image")
+    inputs.add_argument("--input-dir", help="Score every image under this directory (recursive)")
+    inputs.add_argument("--glob", help='Score every image matching this pattern, e.g. "survey/**/*.jpg"')
+    inputs.add_argument("--manifest", help="Text file listing one image path per line")
     parser.add_argument("--top-k", type=int, default=3, help="Top-k predictions")
-    return parser.parse_args()
+    parser.add_argument(
+        "--tta",
+        choices=TTA_POLICIES,
+        default=DEFAULT_TTA_POLICY,
+        help="TTA policy: adaptive early exit, always the full view set, student-first cascade, or tiled high-resolution scoring",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=INFERENCE_BACKENDS,
+        default=INFERENCE_BACKEND,
+        help="Model artifact to serve (TFLite variants come from python -m model.export)",
+    )
+    parser.add_argument("--model-version", help="Use artifacts/versions/<name>/ instead of the unversioned artifacts")
+    parser.add_argument("--timings", action="store_true", help="Include per-stage timings in the output")
+
+    batch = parser.add_argument_group("batch mode (--input-dir, --glob, --manifest)")
+    batch.add_argument("--output", help="JSONL output file (default: stdout)")
+    batch.add_argument(
+        "--resume",
+        action="store_true",
+        help="Append to --output and skip images it already has a result for (failed images are retried)",
+    )
+    batch.add_argument(
+        "--shard",
+        type=_parse_shard,
+        default=(0, 1),
+        help="Only score shard i of n (0-based), e.g. 2/4; assignment is stable per path",
+    )
+    batch.add_argument(
+        "--decode-workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Threads decoding images and building views",
+    )
+    batch.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=(RUNTIME_SETTINGS or {}).get("max_batch_size", BATCH_BUCKETS[-1]),
+        help="Maximum views per forward pass",
+    )
+    args = parser.parse_args()
+    if args.resume and not args.output:
+        parser.error("--resume requires --output")
+    return args
+
+
+def _collect_inputs(args: argparse.Namespace) -> list[Path]:
+    if args.input_dir:
+        root = Path(args.input_dir)
+        if not root.is_dir():
+            raise FileNotFoundError(f"Input directory not found: {root}")
+        return sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES)
+    if args.glob:
+        return sorted(Path(p) for p in glob.glob(args.glob, recursive=True) if Path(p).is_file())
+
+    manifest = Path(args.manifest)
+    if not manifest.exists():
+        raise FileNotFoundError(f"Manifest not found: {manifest}")
+    paths = []
+    with manifest.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                path = Path(line)
+                # Relative entries are relative to the manifest, not the cwd.
+                paths.append(path if path.is_absolute() else manifest.parent / path)
+    return paths
+
+
+def _in_shard(path: Path, shard: tuple[int, int]) -> bool:
+    index, count = shard
+    if count == 1:
+        return True
+    digest = hashlib.sha256(path.as_posix().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count == index
+
+
+def _completed_images(output: Path) -> set[str]:
+    """Images a previous run's JSONL output already has a result for.
+
+    Images recorded with ``"ok": false`` are not completed: the failure may
+    have been transient (I/O error, out of memory), so they are scored again.
+    """
+    done: set[str] = set()
+    if not output.exists():
+        return done
+    with output.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record["ok"] is True:
+                    done.add(record["image"])
+            except (ValueError, KeyError, TypeError):
+                # A run killed mid-write can leave a partial last line.
+                continue
+    return done
+
+
+def _open_output(output: Path | None, resume: bool) -> TextIO:
+    if output is None:
+        return sys.stdout
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if resume and output.exists() and output.stat().st_size:
+        with output.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        stream = output.open("a", encoding="utf-8")
+        if needs_newline:
+            stream.write("\n")
+        return stream
+    return output.open("w", encoding="utf-8")
+
+
+def _decode(path: Path, top_k: int, tta_policy: str) -> StagedPrediction:
+    with Image.open(path) as image:
+        return open_prediction(image, top_k=top_k, tta_policy=tta_policy)
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """Score many images in one process and stream results as JSONL.
+
+    Decoding and view rendering run on a thread pool while a micro-batcher
+    stacks views from several images into shared forward passes. Lines are
+    written as images finish, so output order is not input order.
+    """
+    set_inference_backend(args.backend)
+    warmup_inference_assets(args.model_version)
+
+    output = Path(args.output) if args.output else None
+    completed = _completed_images(output) if args.resume else set()
+    shard_paths = [p for p in _collect_inputs(args) if _in_shard(p, args.shard)]
+    paths = [p for p in shard_paths if str(p) not in completed]
+
+    out = _open_output(output, args.resume)
+    write_lock = threading.Lock()
+    # Bounds decoded-but-unscored images so memory stays flat on huge folders.
+    in_flight = threading.BoundedSemaphore(max(1, args.decode_workers) * 2 + args.max_batch_size)
+    counts = {"ok": 0, "error": 0}
+
+    def write(record: dict) -> None:
+        with write_lock:
+            counts["ok" if record["ok"] else "error"] += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+    def on_done(item: BatchItem, error: Exception | None) -> None:
+        path, started = item.context
+        try:
+            if error is not None:
+                raise error
+            result = item.prediction.result()
+            if args.timings:
+                item.prediction.add_timing("total", time.perf_counter_ns() - started)
+                result["timings_ms"] = timings_ms(item.prediction.timings_ns)
+            write({"image": str(path), "ok": True, "result": result})
+        except Exception as exc:
+            write({"image": str(path), "ok": False, "error": str(exc)})
+        finally:
+            in_flight.release()
+
+    batcher = MicroBatcher(score_views, on_done, args.max_batch_size, max_wait_ms=20.0)
+    batcher.start()
+
+    def on_decoded(future: Future, path: Path, started: int) -> None:
+        try:
+            prediction = future.result()
+        except UnidentifiedImageError:
+            write({"image": str(path), "ok": False, "error": "Invalid image format."})
+            in_flight.release()
+        except Exception as exc:
+            write({"image": str(path), "ok": False, "error": str(exc)})
+            in_flight.release()
+        else:
+            batcher.submit(BatchItem(prediction, (path, started)))
+
+    started_at = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.decode_workers), thread_name_prefix="decode") as pool:
+            for path in paths:
+                in_flight.acquire()
+                started = time.perf_counter_ns()
+                future = pool.submit(_decode, path, args.top_k, args.tta)
+                future.add_done_callback(lambda f, p=path, s=started: on_decoded(f, p, s))
+    finally:
+        batcher.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"Scored {counts['ok']} images ({counts['error']} errors, {len(shard_paths) - len(paths)} already done) "
+        f"in {elapsed:.1f}s",
+        file=sys.stderr,
+    )
+    return 0
 
 
 def main() -> int:
@@ -30,6 +266,14 @@ def main() -> int:
         register_heif_opener()
 
     args = parse_args()
+    configure_threads(RUNTIME_SETTINGS)
+    if args.image is None:
+        try:
+            return run_batch(args)
+        except Exception as exc:
+            print(str(exc), file=sys.stderr)
+            return 1
+
     image_path = Path(args.image)
 
     if not image_path.exists():
@@ -37,8 +281,11 @@ def main() -> int:
         return 2
 
     try:
+        set_inference_backend(args.backend)
+        if args.model_version is not None:
+            reload_model(args.model_version, warm=False)
         with Image.open(image_path) as image:
-            result = predict_image(image, top_k=args.top_k)
+            result = predict_image(image, top_k=args.top_k, tta_policy=args.tta, include_timings=args.timings)
     except UnidentifiedImageError:
         print("Invalid image format.", file=sys.stderr)
         return 3
@@ -0,0 +1,506 @@
+"""Pool supervisor for several inference workers behind one line protocol.
+
+The supervisor imports TensorFlow and the inference modules once, then forks
+``--workers`` children, so the imports are not repeated per worker.
+TensorFlow's runtime is not fork-safe once its thread pools exist, and thread
+counts cannot change after it initialises, so the supervisor never touches the
+runtime: each child pins itself to a slice of the CPU cores, configures
+intra/inter-op threads for that slice, then loads and warms the model.
+
+Only the imported code is shared. Each child holds its own copy of the model
+weights, its traced graph and activation buffers (TFLite arenas for the TFLite
+backends), so memory grows with ``--workers``; ``pool_stats`` reports every
+process's RSS and PSS for sizing the pool.
+
+Upstream clients speak the usual worker protocol on stdin/stdout, including
+binary ``image_length`` payloads. Requests are routed to idle children, so
+responses may arrive out of order and should be matched by ``id``. Crashed children are restarted automatically.
+A ``reload`` command is rolled out to one child at a time, so the others keep
+serving while each loads and warms the new model.
+
+Linux only: the pool relies on ``os.fork`` and CPU affinity.
+"""
+
+import argparse
+import json
+import os
+import selectors
+import sys
+import time
+import traceback
+
+# Keep stdout reserved for protocol messages.
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+from model.runtime_profile import apply_runtime_profile
+
+# oneDNN follows the host profile; each child sizes its own thread pools.
+apply_runtime_profile()
+os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "0")
+
+import tensorflow as tf
+
+# Importing the worker pulls in the whole inference import graph once, so
+# every forked child shares those pages instead of importing them again.
+from model import predict_worker
+
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+class _Child:
+    def __init__(self, slot: int, pid: int, stdin_fd: int, stdout_fd: int, cores: list[int]):
+        self.slot = slot
+        self.pid = pid
+        self.stdin_fd = stdin_fd
+        self.stdout_fd = stdout_fd
+        self.cores = cores
+        self.ready = False
+        self.in_flight: dict | None = None
+        self.reloading = False
+        self.buffer = b""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Supervisor for a pool of inference workers")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, len(os.sched_getaffinity(0)) // 2),
+        help="Number of worker processes",
+    )
+    args, worker_argv = parser.parse_known_args()
+    args.worker_argv = worker_argv
+    return args
+
+
+def _core_slices(workers: int) -> list[list[int]]:
+    cores = sorted(os.sched_getaffinity(0))
+    if workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    size, extra = divmod(len(cores), workers)
+    slices, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _emit_raw(data: bytes) -> None:
+    _write_all(sys.stdout.fileno(), data)
+
+
+def _emit(payload: dict) -> None:
+    _emit_raw((json.dumps(payload) + "\n").encode("utf-8"))
+
+
+def _payload_length(message: dict) -> int:
+    try:
+        return max(0, int(message.get("image_length", 0)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _with_model_version(argv: list[str], version: str) -> list[str]:
+    """Worker arguments with ``--model-version`` replaced by ``version``."""
+    out: list[str] = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == "--model-version":
+            skip = True
+        elif not arg.startswith("--model-version="):
+            out.append(arg)
+    return [*out, "--model-version", version]
+
+
+def _memory_mb(pid: int) -> dict[str, float] | None:
+    """Resident and proportional set size of ``pid``, in MB.
+
+    PSS divides every shared page between the processes mapping it, so the
+    children's PSS sum is what the pool really costs; RSS minus PSS is the
+    part a child shares with the supervisor and its siblings.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="ascii") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    fields[name.lower() + "_mb"] = round(int(value.split()[0]) / 1024.0, 1)
+    except (OSError, ValueError):
+        return None
+    return fields
+
+
+def _run_child(cores: list[int], worker_argv: list[str]) -> int:
+    os.sched_setaffinity(0, cores)
+    tf.config.threading.set_intra_op_parallelism_threads(len(cores))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    return predict_worker.main(worker_argv)
+
+
+class _Pool:
+    def __init__(self, workers: int, worker_argv: list[str]):
+        self.worker_argv = worker_argv
+        self.core_slices = _core_slices(workers)
+        self.selector = selectors.DefaultSelector()
+        self.children: dict[int, _Child] = {}
+        self.pending: list[tuple[dict, bytes]] = []
+        self.restart_at: dict[int, float] = {}
+        self.restarts = 0
+        self.stdin_buffer = bytearray()
+        self.partial: tuple[dict, bytes, int] | None = None
+        # Active reload rollout: the client's message, slots still to reload
+        # and per-worker results so far.
+        self.rollout: dict | None = None
+
+    # ---- Child lifecycle ----
+
+    def spawn(self, slot: int) -> None:
+        to_child_r, to_child_w = os.pipe()
+        from_child_r, from_child_w = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.dup2(to_child_r, 0)
+                os.dup2(from_child_w, 1)
+                for fd in (to_child_r, to_child_w, from_child_r, from_child_w):
+                    os.close(fd)
+                for child in self.children.values():
+                    os.close(child.stdin_fd)
+                    os.close(child.stdout_fd)
+                self.selector.close()
+                code = _run_child(self.core_slices[slot], self.worker_argv)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+
+        os.close(to_child_r)
+        os.close(from_child_w)
+        child = _Child(slot, pid, to_child_w, from_child_r, self.core_slices[slot])
+        self.children[slot] = child
+        self.selector.register(from_child_r, selectors.EVENT_READ, child)
+
+    def reap(self, child: _Child) -> None:
+        self.selector.unregister(child.stdout_fd)
+        os.close(child.stdout_fd)
+        os.close(child.stdin_fd)
+        os.waitpid(child.pid, 0)
+        del self.children[child.slot]
+
+        if child.reloading:
+            self.reload_finished(child, {"ok": False, "error": "Inference worker exited during reload."})
+        elif child.in_flight is not None:
+            response = {"ok": False, "error": "Inference worker exited unexpectedly."}
+            if "id" in child.in_flight:
+                response["id"] = child.in_flight["id"]
+            _emit(response)
+        if self.rollout is not None and child.slot not in self.rollout["slots"]:
+            # The replacement starts with the old arguments; reload it too.
+            self.rollout["slots"].append(child.slot)
+
+        self.restarts += 1
+        self.restart_at[child.slot] = time.monotonic() + RESTART_BACKOFF_SECONDS
+        print(f"predict_pool: worker {child.slot} (pid {child.pid}) exited; restarting", file=sys.stderr)
+
+    def restart_due(self) -> None:
+        now = time.monotonic()
+        for slot, when in list(self.restart_at.items()):
+            if when <= now:
+                del self.restart_at[slot]
+                self.spawn(slot)
+
+    # ---- Reload rollout ----
+
+    def start_rollout(self, message: dict) -> None:
+        if self.rollout is not None:
+            response = {"ok": False, "error": "A reload is already in progress."}
+            if "id" in message:
+                response["id"] = message["id"]
+            _emit(response)
+            return
+        self.rollout = {"message": message, "slots": sorted(self.children), "workers": []}
+        self.advance_rollout()
+
+    def advance_rollout(self) -> None:
+        """Send the reload to the next idle child, one child at a time."""
+        rollout = self.rollout
+        if rollout is None or any(child.reloading for child in self.children.values()):
+            return
+        if not rollout["slots"]:
+            self.finish_rollout()
+            return
+        for slot in rollout["slots"]:
+            child = self.children.get(slot)
+            if child is None or not child.ready or child.in_flight is not None:
+                continue
+            command = {"command": "reload"}
+            if rollout["message"].get("version") is not None:
+                command["version"] = str(rollout["message"]["version"])
+            try:
+                _write_all(child.stdin_fd, (json.dumps(command) + "\n").encode("utf-8"))
+            except OSError:
+                continue
+            rollout["slots"].remove(slot)
+            child.in_flight = command
+            child.reloading = True
+            return
+
+    def reload_finished(self, child: _Child, reply: dict) -> None:
+        rollout = self.rollout
+        child.reloading = False
+        child.in_flight = None
+        result = {"slot": child.slot, "ok": bool(reply.get("ok")), "model_version": reply.get("model_version")}
+        if not result["ok"]:
+            result["error"] = reply.get("error")
+        rollout["workers"].append(result)
+        if not result["ok"]:
+            # Stop here: the remaining children keep serving the previous model.
+            self.finish_rollout()
+        else:
+            self.advance_rollout()
+
+    def finish_rollout(self) -> None:
+        rollout, self.rollout = self.rollout, None
+        message, workers = rollout["message"], rollout["workers"]
+        ok = all(worker["ok"] for worker in workers)
+        response = {"ok": ok, "workers": workers}
+        if ok:
+            response["message"] = "reloaded"
+            if workers:
+                response["model_version"] = workers[-1]["model_version"]
+            if message.get("version") is not None:
+                # Restarted children must come back on the new version.
+                self.worker_argv = _with_model_version(self.worker_argv, str(message["version"]))
+        else:
+            response["error"] = next(worker["error"] for worker in workers if not worker["ok"])
+        if "id" in message:
+            response["id"] = message["id"]
+        _emit(response)
+
+    # ---- Routing ----
+
+    def dispatch(self) -> None:
+        self.advance_rollout()
+        for child in self.children.values():
+            if not self.pending:
+                return
+            if child.ready and child.in_flight is None:
+                message, line = self.pending.pop(0)
+                try:
+                    _write_all(child.stdin_fd, line)
+                except OSError:
+                    # The child died; it is reaped once its stdout reports EOF.
+                    self.pending.insert(0, (message, line))
+                    continue
+                child.in_flight = message
+
+    def on_child_output(self, child: _Child) -> None:
+        data = os.read(child.stdout_fd, 65536)
+        if not data:
+            self.reap(child)
+            return
+
+        child.buffer += data
+        while b"\n" in child.buffer:
+            line, child.buffer = child.buffer.split(b"\n", 1)
+            if not line.strip():
+                continue
+            if not child.ready:
+                message = json.loads(line)
+                if message.get("ready"):
+                    child.ready = True
+                else:
+                    print(f"predict_pool: worker {child.slot} failed to start: {message.get('error')}", file=sys.stderr)
+                continue
+            if child.reloading:
+                self.reload_finished(child, json.loads(line))
+                continue
+            child.in_flight = None
+            _emit_raw(line + b"\n")
+
+    def on_stdin(self) -> bool:
+        """Queue complete requests; returns False once stdin closes or a
+        shutdown command arrives."""
+        data = os.read(sys.stdin.fileno(), 1 << 20)
+        if not data:
+            return False
+
+        self.stdin_buffer += data
+        while True:
+            if self.partial is None:
+                newline = self.stdin_buffer.find(b"\n")
+                if newline < 0:
+                    break
+                line = bytes(self.stdin_buffer[:newline])
+                del self.stdin_buffer[: newline + 1]
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    _emit({"ok": False, "error": "Invalid worker request JSON."})
+                    continue
+                self.partial = (message, line, _payload_length(message))
+
+            # Binary requests are forwarded together with their image payload;
+            # wait until all of it has arrived.
+            message, line, length = self.partial
+            if len(self.stdin_buffer) < length:
+                break
+            request = line + b"\n" + bytes(self.stdin_buffer[:length])
+            del self.stdin_buffer[:length]
+            self.partial = None
+
+            command = message.get("command")
+            if command == "shutdown":
+                self.shutdown()
+                response = {"ok": True, "message": "shutting_down"}
+                if "id" in message:
+                    response["id"] = message["id"]
+                _emit(response)
+                return False
+            if command == "reload":
+                self.start_rollout(message)
+                continue
+            if command == "pool_stats":
+                response = {"ok": True, "pool": self.stats()}
+                if "id" in message:
+                    response["id"] = message["id"]
+                _emit(response)
+                continue
+
+            self.pending.append((message, request))
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {
+                    "slot": child.slot,
+                    "pid": child.pid,
+                    "cores": child.cores,
+                    "ready": child.ready,
+                    "busy": child.in_flight is not None,
+                    "reloading": child.reloading,
+                    "memory": _memory_mb(child.pid),
+                }
+                for child in sorted(self.children.values(), key=lambda c: c.slot)
+            ],
+            "supervisor_memory": _memory_mb(os.getpid()),
+            "queued": len(self.pending),
+            "restarts": self.restarts,
+        }
+
+    # ---- Main loop ----
+
+    def wait_until_ready(self) -> str | None:
+        """Block until every child reported ready; returns an error otherwise."""
+        while not all(child.ready for child in self.children.values()):
+            for key, _ in self.selector.select():
+                child = key.data
+                if child.ready:
+                    continue
+                data = os.read(child.stdout_fd, 65536)
+                if not data:
+                    return f"worker {child.slot} exited during startup"
+                child.buffer += data
+                if b"\n" in child.buffer:
+                    line, child.buffer = child.buffer.split(b"\n", 1)
+                    message = json.loads(line)
+                    if not message.get("ready"):
+                        return str(message.get("error", "worker failed to start"))
+                    child.ready = True
+        return None
+
+    def serve(self) -> int:
+        self.selector.register(sys.stdin.fileno(), selectors.EVENT_READ, None)
+        while True:
+            timeout = None
+            if self.restart_at:
+                timeout = max(0.0, min(self.restart_at.values()) - time.monotonic())
+            for key, _ in self.selector.select(timeout):
+                if key.data is None:
+                    if not self.on_stdin():
+                        # shutdown() is a no-op if a shutdown command already ran it.
+                        self.shutdown()
+                        return 0
+                else:
+                    self.on_child_output(key.data)
+            self.restart_due()
+            self.dispatch()
+
+    def shutdown(self) -> None:
+        """Fail queued requests, let children finish in-flight ones, then stop them."""
+        for message, _ in self.pending:
+            response = {"ok": False, "error": "Inference pool is shutting down."}
+            if "id" in message:
+                response["id"] = message["id"]
+            _emit(response)
+        self.pending.clear()
+        if self.rollout is not None:
+            message, self.rollout = self.rollout["message"], None
+            response = {"ok": False, "error": "Inference pool is shutting down."}
+            if "id" in message:
+                response["id"] = message["id"]
+            _emit(response)
+
+        for child in list(self.children.values()):
+            try:
+                os.write(child.stdin_fd, b'{"command": "shutdown"}\n')
+            except OSError:
+                pass
+            os.close(child.stdin_fd)
+
+        for child in list(self.children.values()):
+            self.selector.unregister(child.stdout_fd)
+            while data := os.read(child.stdout_fd, 65536):
+                child.buffer += data
+            for line in child.buffer.split(b"\n"):
+                if not line.strip() or not child.ready or child.reloading:
+                    continue
+                if json.loads(line).get("message") == "shutting_down":
+                    continue
+                _emit_raw(line + b"\n")
+            os.close(child.stdout_fd)
+            os.waitpid(child.pid, 0)
+
+        self.children.clear()
+        self.restart_at.clear()
+
+
+def main() -> int:
+    args = parse_args()
+    pool = _Pool(max(1, args.workers), args.worker_argv)
+
+    for slot in range(len(pool.core_slices)):
+        pool.spawn(slot)
+
+    error = pool.wait_until_ready()
+    if error is not None:
+        pool.shutdown()
+        _emit({"ready": False, "error": error})
+        return 1
+
+    _emit({"ready": True, "workers": len(pool.children)})
+    return pool.serve()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
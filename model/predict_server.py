@@ -0,0 +1,399 @@
+"""Socket front-end for the inference worker.
+
+Serves the worker's line protocol (JSON messages with ``id``, optional raw
+``image_length`` payloads, and the ``stats``/``cache_stats``/``reload``/
+``shutdown`` commands) on a Unix domain socket and/or a localhost TCP port,
+so several API replicas and CLI clients can share one warm model.
+
+Each connection is read by an asyncio task; accepted requests go into one
+bounded queue. When the queue is full, connections stop being read until the
+model catches up, which pushes back on clients through the socket buffers.
+The model runs on a dedicated executor thread (plus the micro-batcher thread
+with ``--batching``), so the event loop never blocks on loading the model,
+decoding or a forward pass. With ``--batching`` at most ``--pipeline-depth``
+requests are decoded and waiting in the micro-batcher at once; further
+requests stay in the queue. Responses go back on the connection that sent the
+request and may arrive out of order; match them by ``id``.
+
+Worker options such as ``--backend``, ``--batching`` or ``--cache-size`` are
+passed through. ``python -m model.predict_worker`` on stdin/stdout stays
+available as the fallback transport.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from model import predict_worker
+from model.batching import BatchItem, MicroBatcher
+from model.inference import score_views
+from model.load_shedding import LoadShedder
+from model.prediction_cache import PredictionCache
+from model.worker_stats import WorkerStats
+
+# Longest JSON header line accepted; image bytes are sent separately.
+MAX_LINE_BYTES = 1 << 20
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the inference worker on local sockets")
+    parser.add_argument("--socket", help="Unix domain socket path to listen on")
+    parser.add_argument("--tcp-port", type=int, help="TCP port to listen on at 127.0.0.1")
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=64,
+        help="Requests accepted but not yet started before connections stop being read",
+    )
+    args, worker_argv = parser.parse_known_args()
+    if args.socket is None and args.tcp_port is None:
+        parser.error("pass --socket and/or --tcp-port")
+    args.worker = predict_worker.parse_args(worker_argv)
+    return args
+
+
+class _Connection:
+    """Write side of one client connection.
+
+    Tracks requests queued but not answered yet, so a client that half-closes
+    its socket after sending still receives every response.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, loop: asyncio.AbstractEventLoop):
+        self.writer = writer
+        self.loop = loop
+        self.task = asyncio.current_task()
+        self.outstanding = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def send(self, payload: dict) -> None:
+        """Write a message; must be called on the event loop."""
+        if not self.writer.is_closing():
+            self.writer.write((json.dumps(payload) + "\n").encode("utf-8"))
+
+    def expect(self) -> None:
+        self.outstanding += 1
+        self.idle.clear()
+
+    def answer(self, payload: dict) -> None:
+        """Write the response to a request counted by ``expect()``."""
+        self.send(payload)
+        self.outstanding -= 1
+        if self.outstanding == 0:
+            self.idle.set()
+
+    def _threadsafe(self, callback, payload: dict) -> None:
+        try:
+            self.loop.call_soon_threadsafe(callback, payload)
+        except RuntimeError:
+            # The event loop is gone; nobody is left to read the message.
+            pass
+
+    def send_threadsafe(self, payload: dict) -> None:
+        self._threadsafe(self.send, payload)
+
+    def answer_threadsafe(self, payload: dict) -> None:
+        self._threadsafe(self.answer, payload)
+
+
+class _SocketServer:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        # Set by serve() once the model is loaded.
+        self.cache: PredictionCache | None = None
+        self.stats: WorkerStats | None = None
+        self.shedder: LoadShedder | None = None
+        self.reloader = predict_worker._Reloader()
+        # One thread owns decoding and the model, as in the stdin worker.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        self.batcher: MicroBatcher | None = None
+        self.connections: set[_Connection] = set()
+        self.accepted = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, args.max_queue))
+        # Decoded requests held in memory until answered, with --batching.
+        self.pipeline_depth = max(1, args.worker.pipeline_depth)
+        self._slots = asyncio.Semaphore(self.pipeline_depth)
+        self.in_pipeline = 0
+        self._ready = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._shutdown_replies: list[tuple[_Connection, dict]] = []
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def queue_depth(self) -> int:
+        """Requests waiting in the queue plus those inside the batcher."""
+        depth = self._queue.qsize()
+        if self.batcher is not None:
+            depth += self.batcher.backlog
+        return depth
+
+    def snapshot(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "accepted": self.accepted,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "in_batcher": 0 if self.batcher is None else self.batcher.backlog,
+            "in_pipeline": self.in_pipeline,
+            "pipeline_depth": self.pipeline_depth,
+        }
+
+    # -- connections -------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = _Connection(writer, asyncio.get_running_loop())
+        self.connections.add(connection)
+        await self._ready.wait()
+        try:
+            while True:
+                try:
+                    raw_line = await reader.readline()
+                except ValueError:
+                    connection.send({"ok": False, "error": "Worker request line too long."})
+                    break
+                if not raw_line:
+                    break
+                line = raw_line.strip()
+                if not line:
+                    continue
+
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    connection.send({"ok": False, "error": "Invalid worker request JSON."})
+                    continue
+                if not isinstance(message, dict):
+                    connection.send({"ok": False, "error": "Invalid worker request JSON."})
+                    continue
+
+                payload = None
+                if "image_length" in message:
+                    try:
+                        length = int(message["image_length"])
+                    except (TypeError, ValueError):
+                        length = -1
+                    if length < 0:
+                        connection.send(predict_worker._reply(message, {"ok": False, "error": "Invalid image_length."}))
+                        continue
+                    try:
+                        payload = await reader.readexactly(length)
+                    except asyncio.IncompleteReadError:
+                        connection.send(
+                            predict_worker._reply(message, {"ok": False, "error": "Truncated image payload."})
+                        )
+                        break
+
+                if self._stopping.is_set():
+                    # Keep draining the socket so closing it later does not
+                    # reset the connection before the client reads its replies.
+                    connection.send(predict_worker._reply(message, {"ok": False, "error": "Worker is shutting down."}))
+                elif not self._handle_command(message, connection):
+                    # Blocks this connection (not the loop) while the queue is full.
+                    connection.expect()
+                    await self._queue.put((message, payload, connection))
+                    self.accepted += 1
+                await writer.drain()
+            # The client stopped sending; answer everything it already sent.
+            await connection.idle.wait()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if self._stopping.is_set():
+                # serve() still owes this connection the shutdown reply.
+                await self._stopped.wait()
+            self.connections.discard(connection)
+            writer.close()
+
+    def _handle_command(self, message: dict, connection: _Connection) -> bool:
+        command = message.get("command")
+        if command == "shutdown":
+            self._shutdown_replies.append(
+                (connection, predict_worker._reply(message, {"ok": True, "message": "shutting_down"}))
+            )
+            self._stopping.set()
+            return True
+        if command == "stats":
+            response = predict_worker._stats_response(self.cache, self.stats, self.shedder)
+            response["server"] = self.snapshot()
+            connection.send(predict_worker._reply(message, response))
+            return True
+        return predict_worker._handle_command(
+            message, self.cache, self.stats, self.shedder, self.reloader, connection.send_threadsafe
+        )
+
+    # -- model stage -------------------------------------------------------
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            message, payload, connection = await self._queue.get()
+            try:
+                if self.batcher is None:
+                    response = await loop.run_in_executor(
+                        self.executor,
+                        predict_worker._handle_request,
+                        message,
+                        payload,
+                        self.cache,
+                        self.stats,
+                        self.shedder,
+                        self.queue_depth(),
+                    )
+                    connection.answer(predict_worker._reply(message, response))
+                    continue
+
+                # Like the stdin worker's decode stage: a slot is held from
+                # decoding until the reply, so decoded views cannot pile up.
+                await self._slots.acquire()
+                self.in_pipeline += 1
+                handed_off = False
+                try:
+                    response, prediction, pending = await loop.run_in_executor(
+                        self.executor,
+                        predict_worker._open_request,
+                        message,
+                        payload,
+                        self.cache,
+                        self.stats,
+                        self.shedder,
+                        self.queue_depth(),
+                    )
+                    if prediction is None:
+                        connection.answer(predict_worker._reply(message, response))
+                    else:
+                        pending.reply = self._pipelined_reply(connection)
+                        self.batcher.submit(BatchItem(prediction, pending, pending.deadline_ms))
+                        handed_off = True
+                finally:
+                    if not handed_off:
+                        self._release_slot()
+            except Exception as exc:
+                self.stats.record_error()
+                connection.answer(predict_worker._reply(message, {"ok": False, "error": str(exc)}))
+            finally:
+                self._queue.task_done()
+
+    def _release_slot(self) -> None:
+        self.in_pipeline -= 1
+        self._slots.release()
+
+    def _pipelined_reply(self, connection: _Connection):
+        """Reply callback for the batcher thread that also frees the slot."""
+
+        def answer(payload: dict) -> None:
+            connection.answer(payload)
+            self._release_slot()
+
+        return lambda payload: connection._threadsafe(answer, payload)
+
+    def _on_batch_done(self, item: BatchItem, error: Exception | None) -> None:
+        response = predict_worker._batched_response(item, error, self.cache, self.stats, self.shedder)
+        item.context.reply(response)
+
+    # -- lifecycle ---------------------------------------------------------
+
+    async def serve(
+        self, servers: list[asyncio.AbstractServer], state: tuple[PredictionCache, WorkerStats, LoadShedder]
+    ) -> None:
+        self.cache, self.stats, self.shedder = state
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self._stopping.set)
+            except NotImplementedError:
+                # Windows event loops; Ctrl+C still stops the process.
+                pass
+
+        if self.args.worker.batching:
+            self.batcher = MicroBatcher(
+                score_views, self._on_batch_done, self.args.worker.max_batch_size, self.args.worker.max_wait_ms
+            )
+            self.batcher.start()
+        consumer = asyncio.create_task(self._consume())
+        self._ready.set()
+
+        await self._stopping.wait()
+        for server in servers:
+            server.close()
+
+        # Every accepted request still gets its response before shutdown,
+        # including one a connection was blocked queueing when the stop came.
+        await asyncio.gather(*(connection.idle.wait() for connection in list(self.connections)))
+        await self._queue.join()
+        consumer.cancel()
+        if self.batcher is not None:
+            await loop.run_in_executor(None, self.batcher.close)
+        self.executor.shutdown()
+        await asyncio.sleep(0)  # run replies the batcher scheduled from its thread
+
+        for connection, reply in self._shutdown_replies:
+            connection.send(reply)
+        for connection in list(self.connections):
+            try:
+                await connection.writer.drain()
+            except ConnectionError:
+                pass
+        self._stopped.set()
+        connections = list(self.connections)
+        for connection in connections:
+            connection.writer.close()
+        await asyncio.gather(*(connection.task for connection in connections), return_exceptions=True)
+        if self.args.socket is not None:
+            Path(self.args.socket).unlink(missing_ok=True)
+
+
+async def _listen(args: argparse.Namespace, handler) -> tuple[list[asyncio.AbstractServer], list[str]]:
+    """Listen on every requested address; connections wait for the model."""
+    servers, listening = [], []
+    if args.socket is not None:
+        path = Path(args.socket)
+        if path.is_socket():
+            # Left behind by a server that did not shut down cleanly.
+            path.unlink()
+        servers.append(
+            await asyncio.start_unix_server(handler, path=str(path), limit=MAX_LINE_BYTES)
+        )
+        listening.append(f"unix:{path}")
+    if args.tcp_port is not None:
+        server = await asyncio.start_server(handler, host="127.0.0.1", port=args.tcp_port, limit=MAX_LINE_BYTES)
+        servers.append(server)
+        listening.append(f"tcp:127.0.0.1:{server.sockets[0].getsockname()[1]}")
+    return servers, listening
+
+
+async def _run(args: argparse.Namespace) -> int:
+    server = _SocketServer(args)
+    # Bind before loading the model so a taken port or path fails fast.
+    try:
+        servers, listening = await _listen(args, server._handle_connection)
+    except OSError as exc:
+        predict_worker._emit({"ready": False, "error": str(exc)})
+        return 1
+
+    # Load and warm on the model thread: the loop keeps accepting connections
+    # (which wait for the model) instead of stalling for the whole load.
+    loop = asyncio.get_running_loop()
+    state = await loop.run_in_executor(
+        server.executor, functools.partial(predict_worker._startup, args.worker, listening=listening)
+    )
+    if state is None:
+        return 1
+    await server.serve(servers, state)
+    return 0
+
+
+def main() -> int:
+    args = parse_args()
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
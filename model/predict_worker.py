@@ -1,12 +1,28 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import argparse
 import json
 import os
+import queue
 import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
+from typing import Callable, Iterator
 
 from PIL import Image, UnidentifiedImageError
 
 # Keep stdout reserved for protocol messages.
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+from model.runtime_profile import apply_runtime_profile, configure_threads
+
+# A host profile from python -m model.tune_runtime decides oneDNN before
+# TensorFlow is imported; without one it stays off.
+RUNTIME_SETTINGS = apply_runtime_profile()
 os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "0")
 
 try:
@@ -14,44 +30,149 @@ try:
 except Exception:
     register_heif_opener = None
 
-from model.inference import predict_image, warmup_inference_assets
+from model.batching import BatchItem, DeadlineExceeded, MicroBatcher
+from model.config import (
+    INFERENCE_BACKEND,
+    PREDICTION_CACHE_DIR,
+    PREDICTION_CACHE_DISK_MB,
+    PREDICTION_CACHE_SIZE,
+)
+from model.engine import BATCH_BUCKETS, _available_cores
+from model.inference import (
+    DEFAULT_TTA_POLICY,
+    INFERENCE_BACKENDS,
+    StagedPrediction,
+    TiledPrediction,
+    open_prediction,
+    reload_model,
+    score_views,
+    served_model,
+    set_inference_backend,
+    timings_ms,
+    warmup_inference_assets,
+)
+from model.load_shedding import LoadShedder, deadline_expired
+from model.prediction_cache import PredictionCache
+from model.worker_stats import StageMeter, WorkerStats
 
+_IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000.0
+_EMIT_LOCK = threading.Lock()
 
-def _emit(payload: dict) -> None:
-    sys.stdout.write(json.dumps(payload) + "\n")
-    sys.stdout.flush()
 
+class _PendingRequest:
+    """Request context carried alongside its TTA state until it completes."""
 
-def _handle_request(message: dict) -> dict:
-    image_path = Path(str(message.get("image_path", "")))
-    top_k = int(message.get("top_k", 3))
+    def __init__(
+        self,
+        request_id,
+        cache_key: str | None,
+        fingerprint: str | None,
+        started_ns: int,
+        timings_ns: dict[str, int],
+        include_timings: bool,
+        deadline_ms: float | None = None,
+    ):
+        self.request_id = request_id
+        self.cache_key = cache_key
+        self.fingerprint = fingerprint
+        self.started_ns = started_ns
+        self.timings_ns = timings_ns
+        self.include_timings = include_timings
+        self.deadline_ms = deadline_ms
+        # Where the response goes when it is not written to stdout.
+        self.reply: Callable[[dict], None] | None = None
 
-    if not image_path.exists():
-        return {"ok": False, "error": f"Image not found: {image_path}"}
 
-    try:
-        with Image.open(image_path) as image:
-            result = predict_image(image, top_k=top_k)
-        return {"ok": True, "result": result}
-    except UnidentifiedImageError:
-        return {"ok": False, "error": "Invalid image format."}
-    except Exception as exc:
-        return {"ok": False, "error": str(exc)}
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Persistent rice disease inference worker")
+    parser.add_argument(
+        "--backend",
+        choices=INFERENCE_BACKENDS,
+        default=INFERENCE_BACKEND,
+        help="Model artifact to serve (TFLite variants come from python -m model.export)",
+    )
+    parser.add_argument(
+        "--model-version",
+        help="Serve artifacts/versions/<name>/ instead of the unversioned artifacts",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=PREDICTION_CACHE_SIZE,
+        help="In-memory prediction cache entries (0 disables)",
+    )
+    parser.add_argument(
+        "--disk-cache",
+        action="store_true",
+        help=f"Also persist cached predictions under {PREDICTION_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--disk-cache-mb",
+        type=int,
+        default=PREDICTION_CACHE_DISK_MB,
+        help="Evict least recently used disk cache entries above this size (0 = unbounded)",
+    )
+    parser.add_argument(
+        "--batching",
+        action="store_true",
+        help="Micro-batch views across concurrent requests; responses may arrive out of order",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=(RUNTIME_SETTINGS or {}).get("max_batch_size", BATCH_BUCKETS[-1]),
+        help="Maximum views per shared forward pass in batching mode (default: runtime profile, else largest bucket)",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5.0,
+        help="Longest time a batch stays open waiting for more requests",
+    )
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=min(4, _available_cores()),
+        help="Threads decoding requests and building views ahead of the model (0: decode inline, strictly in order)",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=64,
+        help="Requests read but not yet answered before the worker stops reading stdin",
+    )
+    parser.add_argument(
+        "--no-degradation",
+        action="store_true",
+        help="Always spend full TTA effort, even when requests back up",
+    )
+    return parser.parse_args(argv)
 
 
-def main() -> int:
-    if register_heif_opener is not None:
-        register_heif_opener()
+def _emit(payload: dict) -> None:
+    with _EMIT_LOCK:
+        sys.stdout.write(json.dumps(payload) + "\n")
+        sys.stdout.flush()
 
-    try:
-        warmup_inference_assets()
-    except Exception as exc:
-        _emit({"ready": False, "error": str(exc)})
-        return 1
 
-    _emit({"ready": True})
+def _reply(message: dict, payload: dict) -> dict:
+    if "id" in message:
+        payload["id"] = message["id"]
+    return payload
+
 
-    for raw_line in sys.stdin:
+def _read_messages() -> Iterator[tuple[dict, bytes | None]]:
+    """Yield ``(message, payload)`` pairs from stdin.
+
+    A message is one JSON line. When it carries ``image_length``, exactly that
+    many raw image bytes follow the line and are returned as the payload;
+    otherwise the payload is ``None`` and the image is read from ``image_path``.
+    """
+    stream = sys.stdin.buffer
+    while True:
+        raw_line = stream.readline()
+        if not raw_line:
+            return
         line = raw_line.strip()
         if not line:
             continue
@@ -62,14 +183,535 @@ def main() -> int:
             _emit({"ok": False, "error": "Invalid worker request JSON."})
             continue
 
+        payload = None
+        if "image_length" in message:
+            try:
+                length = int(message["image_length"])
+            except (TypeError, ValueError):
+                length = -1
+            if length < 0:
+                _emit(_reply(message, {"ok": False, "error": "Invalid image_length."}))
+                continue
+            payload = stream.read(length)
+            if len(payload) < length:
+                _emit(_reply(message, {"ok": False, "error": "Truncated image payload."}))
+                return
+
+        yield message, payload
+
+
+def _expired_response() -> dict:
+    return {"ok": False, "error": "Deadline exceeded.", "deadline_exceeded": True}
+
+
+def _open_request(
+    message: dict,
+    payload: bytes | None,
+    cache: PredictionCache,
+    stats: WorkerStats,
+    shedder: LoadShedder,
+    queue_depth: int = 0,
+) -> tuple[dict | None, StagedPrediction | None, _PendingRequest | None]:
+    """Decode a request, answering it straight away on errors, expired
+    deadlines and cache hits."""
+    started = time.perf_counter_ns()
+    # Pin the request to the model served right now; a concurrent reload
+    # only affects requests opened after the swap.
+    model = served_model()
+    include_timings = bool(message.get("timings", False))
+    top_k = int(message.get("top_k", 3))
+    tta_policy = str(message.get("tta_policy", DEFAULT_TTA_POLICY))
+
+    deadline_ms = message.get("deadline_ms")
+    if deadline_ms is not None:
+        try:
+            deadline_ms = float(deadline_ms)
+        except (TypeError, ValueError):
+            stats.record_error()
+            return {"ok": False, "error": "Invalid deadline_ms."}, None, None
+        if deadline_expired(deadline_ms):
+            # The caller has already given up: skip even the decode.
+            stats.record_expired()
+            return _expired_response(), None, None
+
+    if payload is None:
+        image_path = Path(str(message.get("image_path", "")))
+        if not image_path.exists():
+            stats.record_error()
+            return {"ok": False, "error": f"Image not found: {image_path}"}, None, None
+
+    try:
+        timings_ns: dict[str, int] = {}
+        image_bytes = payload if payload is not None else image_path.read_bytes()
+        timings_ns["read"] = time.perf_counter_ns() - started
+
+        cache_key = fingerprint = None
+        if cache.enabled:
+            lookup_started = time.perf_counter_ns()
+            # Covers the cascade student too: one namespace for every policy.
+            fingerprint = model.cascade_fingerprint
+            cache_key = cache.make_key(image_bytes, fingerprint, top_k, tta_policy)
+            cached = cache.get(cache_key, fingerprint)
+            timings_ns["cache"] = time.perf_counter_ns() - lookup_started
+            if cached is not None:
+                timings_ns["total"] = time.perf_counter_ns() - started
+                stats.record_request(timings_ns, cache_hit=True)
+                # Versions with identical artifacts share entries; report the one
+                # serving. Only full-effort results are ever cached.
+                result = {**cached, "model_version": model.version, "degradation_level": 0}
+                response = {"ok": True, "result": result, "cache_hit": True}
+                if include_timings:
+                    response["timings_ms"] = timings_ms(timings_ns)
+                return response, None, None
+
+        with Image.open(BytesIO(image_bytes)) as image:
+            prediction = open_prediction(
+                image,
+                top_k=top_k,
+                tta_policy=tta_policy,
+                model=model,
+                degradation_level=shedder.update(queue_depth),
+            )
+        pending = _PendingRequest(
+            message.get("id"), cache_key, fingerprint, started, timings_ns, include_timings, deadline_ms
+        )
+        return None, prediction, pending
+    except UnidentifiedImageError:
+        stats.record_error()
+        return {"ok": False, "error": "Invalid image format."}, None, None
+    except Exception as exc:
+        stats.record_error()
+        return {"ok": False, "error": str(exc)}, None, None
+
+
+def _finish_request(
+    prediction: StagedPrediction,
+    pending: _PendingRequest,
+    cache: PredictionCache,
+    stats: WorkerStats,
+    shedder: LoadShedder,
+) -> dict:
+    result = prediction.result()
+    degraded = result["degradation_level"] > 0
+    # A degraded result must not be served later in place of a full one.
+    if pending.cache_key is not None and not degraded:
+        store_started = time.perf_counter_ns()
+        cache.put(pending.cache_key, pending.fingerprint, result)
+        pending.timings_ns["cache"] = pending.timings_ns.get("cache", 0) + time.perf_counter_ns() - store_started
+
+    timings_ns = {**pending.timings_ns, **prediction.timings_ns}
+    timings_ns["total"] = time.perf_counter_ns() - pending.started_ns
+    stats.record_request(timings_ns, views=result["tta_views"], degraded=degraded)
+    if not isinstance(prediction, TiledPrediction):
+        # Tiled requests are slow by design; they say nothing about load.
+        shedder.record_latency(timings_ns["total"])
+
+    response = {"ok": True, "result": result, "cache_hit": False}
+    if pending.include_timings:
+        response["timings_ms"] = timings_ms(timings_ns)
+    return response
+
+
+def _handle_request(
+    message: dict,
+    payload: bytes | None,
+    cache: PredictionCache,
+    stats: WorkerStats,
+    shedder: LoadShedder,
+    queue_depth: int = 0,
+) -> dict:
+    response, prediction, pending = _open_request(message, payload, cache, stats, shedder, queue_depth)
+    if prediction is None:
+        return response
+    return _complete_request(prediction, pending, cache, stats, shedder)
+
+
+def _complete_request(
+    prediction: StagedPrediction,
+    pending: _PendingRequest,
+    cache: PredictionCache,
+    stats: WorkerStats,
+    shedder: LoadShedder,
+    score_fn: Callable = score_views,
+) -> dict:
+    """Run an opened request's forward passes one request at a time."""
+    try:
+        while not prediction.done:
+            if deadline_expired(pending.deadline_ms):
+                stats.record_expired()
+                return _expired_response()
+            forward_started = time.perf_counter_ns()
+            probs = score_fn(prediction.pending_batch(), prediction.model)
+            prediction.add_timing("forward", time.perf_counter_ns() - forward_started)
+            prediction.submit(probs)
+        return _finish_request(prediction, pending, cache, stats, shedder)
+    except Exception as exc:
+        stats.record_error()
+        return {"ok": False, "error": str(exc)}
+
+
+def _stats_response(
+    cache: PredictionCache, stats: WorkerStats, shedder: LoadShedder, pipeline: "_DecodeStage | None" = None
+) -> dict:
+    response = {
+        "ok": True,
+        "stats": stats.snapshot(),
+        "cache": cache.stats(),
+        "degradation": shedder.snapshot(),
+        "model_version": served_model().version,
+    }
+    if pipeline is not None:
+        response["pipeline"] = pipeline.snapshot()
+    return response
+
+
+class _DecodeStage:
+    """Decodes requests and builds their TTA views on a thread pool, so the
+    next requests are prepared while the model scores the current ones.
+
+    ``depth`` slots bound the requests between the reader and their reply:
+    once they are all taken, ``submit`` blocks and the worker stops reading
+    stdin until the model stage catches up. With no worker threads requests
+    are decoded on the calling thread.
+    """
+
+    def __init__(
+        self, workers: int, depth: int, cache: PredictionCache, stats: WorkerStats, shedder: LoadShedder
+    ):
+        self.workers = max(0, workers)
+        self.depth = max(1, depth)
+        self.cache = cache
+        self.stats = stats
+        self.shedder = shedder
+        self.decode_meter = StageMeter(self.workers)
+        self.model_meter = StageMeter()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="decode") if self.workers else None
+        self._slots = threading.BoundedSemaphore(self.depth)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._decoding = 0
+
+    def submit(self, message: dict, payload: bytes | None) -> Future:
+        """Queue ``message`` for decoding; the future yields ``_open_request``'s result."""
+        self._slots.acquire()
+        with self._lock:
+            # Requests already ahead of this one drive degradation.
+            queue_depth = self._in_flight
+            self._in_flight += 1
+            self._decoding += 1
+        if self._executor is not None:
+            return self._executor.submit(self._open, message, payload, queue_depth)
+        future: Future = Future()
+        future.set_result(self._open(message, payload, queue_depth))
+        return future
+
+    def _open(self, message: dict, payload: bytes | None, queue_depth: int):
+        started = time.perf_counter_ns()
+        try:
+            return _open_request(message, payload, self.cache, self.stats, self.shedder, queue_depth)
+        finally:
+            self.decode_meter.record(time.perf_counter_ns() - started)
+            with self._lock:
+                self._decoding -= 1
+
+    def release(self) -> None:
+        """Free the slot of a request that has been answered."""
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def score(self, batch, model):
+        """``score_views`` with its time counted as model-stage busy time."""
+        started = time.perf_counter_ns()
+        try:
+            return score_views(batch, model)
+        finally:
+            self.model_meter.record(time.perf_counter_ns() - started)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            in_flight, decoding = self._in_flight, self._decoding
+        return {
+            "depth": self.depth,
+            "in_flight": in_flight,
+            "decoding": decoding,
+            # Decoded and waiting for (or inside) the model stage.
+            "prepared": in_flight - decoding,
+            "decode": self.decode_meter.snapshot(),
+            "model": self.model_meter.snapshot(),
+        }
+
+
+class _Reloader:
+    """Loads and warms a model version on a background thread.
+
+    The current model keeps serving until the new one is ready, then
+    ``reload_model`` swaps it in atomically. The reply to the ``reload``
+    command is emitted when the swap is done (or has failed), so it can
+    arrive after replies to requests sent later.
+    """
+
+    def __init__(self):
+        self._busy = False
+        self._lock = threading.Lock()
+
+    def start(
+        self, message: dict, cache: PredictionCache, emit: Callable[[dict], None] = _emit
+    ) -> dict | None:
+        """Begin a reload; returns an immediate error reply if one is running.
+
+        ``emit`` is called from the reload thread with the final reply. Once
+        the new model is live, ``cache`` drops other models' disk entries.
+        """
+        with self._lock:
+            if self._busy:
+                return {"ok": False, "error": "A reload is already in progress."}
+            self._busy = True
+        threading.Thread(target=self._run, args=(message, cache, emit), name="model-reload", daemon=True).start()
+        return None
+
+    def _run(self, message: dict, cache: PredictionCache, emit: Callable[[dict], None]) -> None:
+        version = message.get("version")
+        try:
+            model = reload_model(None if version is None else str(version))
+            cache.prune(model.cascade_fingerprint)
+            response = {
+                "ok": True,
+                "message": "reloaded",
+                "model_version": model.version,
+                "load_ms": {phase: round(ms, 1) for phase, ms in model.load_ms.items()},
+            }
+        except Exception as exc:
+            response = {"ok": False, "error": str(exc), "model_version": served_model().version}
+        # Accept the next reload before replying, so a client reacting to
+        # this reply is never told one is still running.
+        with self._lock:
+            self._busy = False
+        emit(_reply(message, response))
+
+
+def _handle_command(
+    message: dict,
+    cache: PredictionCache,
+    stats: WorkerStats,
+    shedder: LoadShedder,
+    reloader: _Reloader,
+    emit: Callable[[dict], None] = _emit,
+    pipeline: _DecodeStage | None = None,
+) -> bool:
+    """Answer a non-prediction command; returns False if ``message`` is not one."""
+    command = message.get("command")
+    if command == "cache_stats":
+        emit(_reply(message, {"ok": True, "cache": cache.stats()}))
+    elif command == "stats":
+        emit(_reply(message, _stats_response(cache, stats, shedder, pipeline)))
+    elif command == "reload":
+        error = reloader.start(message, cache, emit)
+        if error is not None:
+            emit(_reply(message, error))
+    else:
+        return False
+    return True
+
+
+def _serve_sequential(cache: PredictionCache, stats: WorkerStats, shedder: LoadShedder) -> int:
+    reloader = _Reloader()
+    for message, payload in _read_messages():
         if message.get("command") == "shutdown":
-            _emit({"ok": True, "message": "shutting_down"})
+            _emit(_reply(message, {"ok": True, "message": "shutting_down"}))
             return 0
+        if _handle_command(message, cache, stats, shedder, reloader):
+            continue
+
+        _emit(_reply(message, _handle_request(message, payload, cache, stats, shedder)))
+
+    return 0
+
+
+def _serve_pipelined(cache: PredictionCache, stats: WorkerStats, shedder: LoadShedder, pipeline: _DecodeStage) -> int:
+    """Sequential scoring with decoding overlapped.
+
+    The decode pool prepares the next requests while a model thread scores
+    them one at a time, so responses still come back in request order.
+    Command replies are not queued behind requests and may overtake them.
+    """
+    prepared: queue.Queue = queue.Queue()
+
+    def run_model() -> None:
+        while True:
+            item = prepared.get()
+            if item is None:
+                return
+            message, future = item
+            try:
+                response, prediction, pending = future.result()
+                if prediction is not None:
+                    response = _complete_request(prediction, pending, cache, stats, shedder, pipeline.score)
+            except Exception as exc:
+                stats.record_error()
+                response = {"ok": False, "error": str(exc)}
+            pipeline.release()
+            _emit(_reply(message, response))
+
+    model_thread = threading.Thread(target=run_model, name="model", daemon=True)
+    model_thread.start()
+    reloader = _Reloader()
+
+    shutdown_message = None
+    try:
+        for message, payload in _read_messages():
+            if message.get("command") == "shutdown":
+                shutdown_message = message
+                break
+            if _handle_command(message, cache, stats, shedder, reloader, pipeline=pipeline):
+                continue
+            prepared.put((message, pipeline.submit(message, payload)))
+    finally:
+        # Answer everything already read before replying to shutdown.
+        prepared.put(None)
+        model_thread.join()
+        pipeline.shutdown()
+
+    if shutdown_message is not None:
+        _emit(_reply(shutdown_message, {"ok": True, "message": "shutting_down"}))
+    return 0
 
-        _emit(_handle_request(message))
 
+def _batched_response(
+    item: BatchItem, error: Exception | None, cache: PredictionCache, stats: WorkerStats, shedder: LoadShedder
+) -> dict:
+    """Response for a request the micro-batcher has finished (or failed)."""
+    pending: _PendingRequest = item.context
+    if error is None:
+        try:
+            response = _finish_request(item.prediction, pending, cache, stats, shedder)
+        except Exception as exc:
+            stats.record_error()
+            response = {"ok": False, "error": str(exc)}
+    elif isinstance(error, DeadlineExceeded):
+        stats.record_expired()
+        response = _expired_response()
+    else:
+        stats.record_error()
+        response = {"ok": False, "error": str(error)}
+    if pending.request_id is not None:
+        response["id"] = pending.request_id
+    return response
+
+
+def _serve_batching(
+    cache: PredictionCache,
+    stats: WorkerStats,
+    shedder: LoadShedder,
+    pipeline: _DecodeStage,
+    max_batch_size: int,
+    max_wait_ms: float,
+) -> int:
+    """Read requests while the decode pool prepares them and a background
+    batcher scores them.
+
+    Requests should carry an ``id``: responses are emitted as soon as each
+    request finishes, which is not necessarily the order they arrived in.
+    """
+
+    def on_done(item: BatchItem, error: Exception | None) -> None:
+        response = _batched_response(item, error, cache, stats, shedder)
+        pipeline.release()
+        _emit(response)
+
+    batcher = MicroBatcher(pipeline.score, on_done, max_batch_size, max_wait_ms)
+    batcher.start()
+    reloader = _Reloader()
+
+    def on_decoded(future: Future, message: dict) -> None:
+        try:
+            response, prediction, pending = future.result()
+        except Exception as exc:
+            stats.record_error()
+            response, prediction = {"ok": False, "error": str(exc)}, None
+        if prediction is None:
+            pipeline.release()
+            _emit(_reply(message, response))
+        else:
+            batcher.submit(BatchItem(prediction, pending, pending.deadline_ms))
+
+    shutdown_message = None
+    try:
+        for message, payload in _read_messages():
+            if message.get("command") == "shutdown":
+                shutdown_message = message
+                break
+            if _handle_command(message, cache, stats, shedder, reloader, pipeline=pipeline):
+                continue
+
+            future = pipeline.submit(message, payload)
+            future.add_done_callback(lambda f, m=message: on_decoded(f, m))
+    finally:
+        # Drain in-flight requests so every accepted request gets a response.
+        pipeline.shutdown()
+        batcher.close()
+
+    if shutdown_message is not None:
+        _emit(_reply(shutdown_message, {"ok": True, "message": "shutting_down"}))
     return 0
 
 
+def _startup(args: argparse.Namespace, **ready_fields) -> tuple[PredictionCache, WorkerStats, LoadShedder] | None:
+    """Load and warm the model, then emit the ready (or failure) message.
+
+    Returns ``None`` when the model could not be loaded.
+    """
+    if register_heif_opener is not None:
+        register_heif_opener()
+
+    cache = PredictionCache(
+        max_entries=args.cache_size,
+        disk_dir=PREDICTION_CACHE_DIR if args.disk_cache else None,
+        max_disk_bytes=args.disk_cache_mb * 1024 * 1024,
+    )
+
+    started = time.perf_counter()
+    try:
+        configure_threads(RUNTIME_SETTINGS)
+        set_inference_backend(args.backend)
+        startup_ms = {"imports": _IMPORT_MS, **warmup_inference_assets(args.model_version)}
+        cache.prune(served_model().cascade_fingerprint)
+    except Exception as exc:
+        _emit({"ready": False, "error": str(exc)})
+        return None
+    startup_ms["total"] = _IMPORT_MS + (time.perf_counter() - started) * 1000.0
+
+    _emit(
+        {
+            "ready": True,
+            "model_version": served_model().version,
+            "startup_ms": {phase: round(ms, 1) for phase, ms in startup_ms.items()},
+            "runtime_profile": RUNTIME_SETTINGS,
+            **ready_fields,
+        }
+    )
+    return cache, WorkerStats(), LoadShedder(enabled=not args.no_degradation)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    state = _startup(args)
+    if state is None:
+        return 1
+
+    cache, stats, shedder = state
+    if not args.batching and args.decode_workers == 0:
+        return _serve_sequential(cache, stats, shedder)
+
+    pipeline = _DecodeStage(args.decode_workers, args.pipeline_depth, cache, stats, shedder)
+    if args.batching:
+        return _serve_batching(cache, stats, shedder, pipeline, args.max_batch_size, args.max_wait_ms)
+    return _serve_pipelined(cache, stats, shedder, pipeline)
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class PredictionCache:
+    """Content-addressed cache of prediction results.
+
+    Entries are keyed by the image bytes, the fingerprint of the loaded model
+    and class names, and the request options that change the result. The
+    in-memory tier is a bounded LRU. The optional disk tier keeps one
+    directory per model fingerprint so results survive worker restarts; it
+    is capped at ``max_disk_bytes`` by evicting the least recently used
+    files, and ``prune()`` drops the namespaces of models no longer served.
+    """
+
+    def __init__(self, max_entries: int, disk_dir: Path | None = None, max_disk_bytes: int = 0):
+        self.max_entries = max(0, max_entries)
+        self.disk_dir = disk_dir
+        # 0 leaves the disk tier unbounded.
+        self.max_disk_bytes = max(0, max_disk_bytes)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        # Disk files in least recently used order, with their sizes; built on
+        # first use from modification times, which disk hits refresh.
+        self._disk_files: OrderedDict[Path, int] | None = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.disk_dir is not None
+
+    @staticmethod
+    def make_key(image_bytes: bytes, fingerprint: str, top_k: int, tta_policy: str) -> str:
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return hashlib.sha256(f"{digest}:{fingerprint}:{top_k}:{tta_policy}".encode()).hexdigest()
+
+    def get(self, key: str, fingerprint: str) -> dict | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+            result = self._read_disk(key, fingerprint)
+            if result is not None:
+                self._remember(key, result)
+                self.hits += 1
+                self.disk_hits += 1
+                return result
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, fingerprint: str, result: dict) -> None:
+        with self._lock:
+            self._remember(key, result)
+            self._write_disk(key, fingerprint, result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_enabled": self.disk_dir is not None,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, result: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def prune(self, fingerprint: str) -> None:
+        """Delete the disk namespaces of every model except ``fingerprint``.
+
+        Called when a model starts being served (worker startup, reload), not
+        on lookups: requests still in flight on the previous model keep
+        reading and writing its namespace until they finish.
+        """
+        if self.disk_dir is None or not self.disk_dir.exists():
+            return
+        namespace = fingerprint[:16]
+        with self._lock:
+            for child in self.disk_dir.iterdir():
+                if child.is_dir() and child.name != namespace:
+                    shutil.rmtree(child, ignore_errors=True)
+            # Rebuilt from what is left on the next disk access.
+            self._disk_files = None
+            self._disk_bytes = 0
+
+    def _disk_path(self, key: str, fingerprint: str) -> Path | None:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / fingerprint[:16] / key[:2] / f"{key}.json"
+
+    def _disk_index(self) -> OrderedDict[Path, int]:
+        if self._disk_files is None:
+            files = []
+            if self.disk_dir is not None and self.disk_dir.exists():
+                for path in self.disk_dir.glob("*/*/*.json"):
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime_ns, path, stat.st_size))
+            files.sort()
+            self._disk_files = OrderedDict((path, size) for _, path, size in files)
+            self._disk_bytes = sum(self._disk_files.values())
+        return self._disk_files
+
+    def _read_disk(self, key: str, fingerprint: str) -> dict | None:
+        path = self._disk_path(key, fingerprint)
+        if path is None:
+            return None
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                result = json.load(f)
+            # The modification time orders eviction across restarts.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        index = self._disk_index()
+        if path in index:
+            index.move_to_end(path)
+        return result if isinstance(result, dict) else None
+
+    def _write_disk(self, key: str, fingerprint: str, result: dict) -> None:
+        path = self._disk_path(key, fingerprint)
+        if path is None:
+            return
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(result, f)
+            size = tmp_path.stat().st_size
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk tier is best-effort; a failed write only costs a miss later.
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        index = self._disk_index()
+        self._disk_bytes += size - index.pop(path, 0)
+        index[path] = size
+        while self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes and len(index) > 1:
+            evicted, evicted_size = index.popitem(last=False)
+            evicted.unlink(missing_ok=True)
+            self._disk_bytes -= evicted_size
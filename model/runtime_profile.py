@@ -0,0 +1,100 @@
+"""Per-host CPU execution profile for TensorFlow.
+
+``python -m model.tune_runtime`` benchmarks oneDNN, thread pool sizes and
+batch sizes on this machine and saves the winner under
+``RUNTIME_PROFILE_DIR``. Serving entrypoints call ``apply_runtime_profile()``
+before TensorFlow is imported (oneDNN is chosen at import time) and
+``configure_threads()`` before the first op runs.
+
+This module must stay importable without TensorFlow.
+"""
+
+import json
+import os
+import platform
+import socket
+import sys
+from pathlib import Path
+
+from model.config import RUNTIME_PROFILE_DIR
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _available_cores() -> int:
+    # Same as model.engine's, which cannot be imported before TensorFlow.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def host_fingerprint() -> dict:
+    """What a profile must match to be applied: same CPU and core count."""
+    return {
+        "hostname": socket.gethostname(),
+        "machine": platform.machine(),
+        "cpu": _cpu_model(),
+        "cores": _available_cores(),
+    }
+
+
+def profile_path(hostname: str | None = None) -> Path:
+    return RUNTIME_PROFILE_DIR / f"{hostname or socket.gethostname()}.json"
+
+
+def load_runtime_profile() -> dict | None:
+    """This host's profile, or ``None`` if there is none or it was tuned on
+    different hardware (e.g. a copied artifacts folder or a resized VM)."""
+    path = profile_path()
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            profile = json.load(f)
+        recorded = profile["host"]
+        settings = profile["settings"]
+    except (OSError, ValueError, KeyError, TypeError):
+        print(f"Ignoring unreadable runtime profile: {path}", file=sys.stderr)
+        return None
+
+    current = host_fingerprint()
+    if any(recorded.get(key) != current[key] for key in ("machine", "cpu", "cores")):
+        print(f"Ignoring runtime profile tuned on different hardware: {path}", file=sys.stderr)
+        return None
+    return settings
+
+
+def apply_runtime_profile() -> dict | None:
+    """Apply the host profile's environment settings; returns its settings.
+
+    Variables already set in the environment win over the profile.
+    """
+    settings = load_runtime_profile()
+    if settings is not None and "onednn" in settings:
+        os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "1" if settings["onednn"] else "0")
+    return settings
+
+
+def configure_threads(settings: dict | None) -> None:
+    """Size TensorFlow's thread pools from the profile.
+
+    Leaves them alone when a caller (such as ``predict_pool`` children
+    pinned to a core slice) has already configured them.
+    """
+    if not settings:
+        return
+    import tensorflow as tf  # only once the environment is settled
+
+    if tf.config.threading.get_intra_op_parallelism_threads() == 0 and settings.get("intra_op_threads"):
+        tf.config.threading.set_intra_op_parallelism_threads(int(settings["intra_op_threads"]))
+    if tf.config.threading.get_inter_op_parallelism_threads() == 0 and settings.get("inter_op_threads"):
+        tf.config.threading.set_inter_op_parallelism_threads(int(settings["inter_op_threads"]))
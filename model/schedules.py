@@ -0,0 +1,34 @@
+import math
+
+import keras.saving
+import tensorflow as tf
+
+
+# Kept out of model.train so loading a trained model does not import the
+# training stack. The registered name ("Custom>WarmupCosineDecay") is unchanged,
+# so models saved before the move still deserialize.
+@keras.saving.register_keras_serializable()
+class WarmupCosineDecay(tf.keras.optimizers.schedules.LearningRateSchedule):
+    """Cosine annealing with linear warmup."""
+
+    def __init__(self, base_lr: float, total_steps: int, warmup_steps: int):
+        super().__init__()
+        self.base_lr = base_lr
+        self.total_steps = total_steps
+        self.warmup_steps = warmup_steps
+
+    def __call__(self, step):
+        step = tf.cast(step, tf.float32)
+        warmup = tf.cast(self.warmup_steps, tf.float32)
+        total = tf.cast(self.total_steps, tf.float32)
+        warmup_lr = self.base_lr * (step / tf.maximum(warmup, 1.0))
+        progress = (step - warmup) / tf.maximum(total - warmup, 1.0)
+        cosine_lr = self.base_lr * 0.5 * (1.0 + tf.cos(math.pi * progress))
+        return tf.where(step < warmup, warmup_lr, cosine_lr)
+
+    def get_config(self):
+        return {
+            "base_lr": self.base_lr,
+            "total_steps": self.total_steps,
+            "warmup_steps": self.warmup_steps,
+        }
@@ -1,6 +1,6 @@
 import json
-import math
 from collections import Counter
+from pathlib import Path
 
 import numpy as np
 import tensorflow as tf
@@ -19,41 +19,11 @@ from model.config import (
     MODEL_PATH,
     SEED,
     TRAIN_DIR,
+    USE_IMAGE_CACHE,
     VALIDATION_DIR,
 )
-
-
-# ---------------------------------------------------------------------------
-# Cosine decay with warmup
-# ---------------------------------------------------------------------------
-
-import keras.saving
-
-@keras.saving.register_keras_serializable()
-class WarmupCosineDecay(tf.keras.optimizers.schedules.LearningRateSchedule):
-    """Cosine annealing with linear warmup."""
-
-    def __init__(self, base_lr: float, total_steps: int, warmup_steps: int):
-        super().__init__()
-        self.base_lr = base_lr
-        self.total_steps = total_steps
-        self.warmup_steps = warmup_steps
-
-    def __call__(self, step):
-        step = tf.cast(step, tf.float32)
-        warmup = tf.cast(self.warmup_steps, tf.float32)
-        total = tf.cast(self.total_steps, tf.float32)
-        warmup_lr = self.base_lr * (step / tf.maximum(warmup, 1.0))
-        progress = (step - warmup) / tf.maximum(total - warmup, 1.0)
-        cosine_lr = self.base_lr * 0.5 * (1.0 + tf.cos(math.pi * progress))
-        return tf.where(step < warmup, warmup_lr, cosine_lr)
-
-    def get_config(self):
-        return {
-            "base_lr": self.base_lr,
-            "total_steps": self.total_steps,
-            "warmup_steps": self.warmup_steps,
-        }
+from model.image_cache import ImageCache, decode_resized
+from model.schedules import WarmupCosineDecay
 
 
 # ---------------------------------------------------------------------------
@@ -109,11 +79,12 @@ def _mixup_batch(images: tf.Tensor, labels: tf.Tensor, alpha: float = 0.2):
 # Model builder
 # ---------------------------------------------------------------------------
 
-def build_model(num_classes: int) -> tuple[tf.keras.Model, tf.keras.Model]:
+def build_model(num_classes: int, weights: str | None = "imagenet") -> tuple[tf.keras.Model, tf.keras.Model]:
     """Build EfficientNetV2S with a deeper classification head.
 
     Uses include_preprocessing=True so the backbone handles input rescaling
-    internally — raw [0, 255] images can be passed directly.
+    internally — raw [0, 255] images can be passed directly. ``weights=None``
+    gives a randomly initialized backbone (no download), e.g. for benchmarks.
     """
     inputs = tf.keras.Input(shape=(*IMAGE_SIZE, 3))
 
@@ -122,7 +93,7 @@ def build_model(num_classes: int) -> tuple[tf.keras.Model, tf.keras.Model]:
 
     backbone = tf.keras.applications.EfficientNetV2S(
         include_top=False,
-        weights="imagenet",
+        weights=weights,
         input_shape=(*IMAGE_SIZE, 3),
         include_preprocessing=True,
     )
@@ -144,11 +115,77 @@ def build_model(num_classes: int) -> tuple[tf.keras.Model, tf.keras.Model]:
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _extract_labels(dataset: tf.data.Dataset) -> np.ndarray:
+# Same formats image_dataset_from_directory picks up.
+IMAGE_EXTENSIONS = (".bmp", ".gif", ".jpeg", ".jpg", ".png")
+
+
+def _list_image_files(directory: Path, class_names: list[str] | None = None) -> tuple[list[str], np.ndarray, list[str]]:
+    """File paths and integer labels from the ``<class>/<image>`` layout,
+    without decoding anything.
+
+    Classes are the sorted subdirectory names unless ``class_names`` fixes
+    the label order (e.g. validation labels must follow the training ones).
+    """
+    if class_names is None:
+        class_names = sorted(p.name for p in directory.iterdir() if p.is_dir())
+    paths: list[str] = []
     labels: list[int] = []
-    for _, batch_labels in dataset:
-        labels.extend(int(v) for v in batch_labels.numpy().tolist())
-    return np.array(labels, dtype=np.int32)
+    for label, name in enumerate(class_names):
+        class_dir = directory / name
+        if not class_dir.is_dir():
+            continue
+        files = sorted(
+            str(p) for p in class_dir.rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+        )
+        paths.extend(files)
+        labels.extend([label] * len(files))
+    if not paths:
+        raise FileNotFoundError(f"No images found under '{directory}'.")
+    return paths, np.array(labels, dtype=np.int32), class_names
+
+
+def _open_image_cache(*path_lists: list[str]) -> ImageCache | None:
+    """The decoded image cache, refreshed for these files, unless disabled."""
+    if not USE_IMAGE_CACHE:
+        return None
+    cache = ImageCache()
+    stats = cache.refresh([path for paths in path_lists for path in paths])
+    print(f"Image cache: {stats['reused']} images reused, {stats['decoded']} decoded ({cache.root})")
+    return cache
+
+
+def _image_dataset(
+    paths: list[str],
+    labels: np.ndarray,
+    num_classes: int | None = None,
+    shuffle: bool = False,
+    seed: int = SEED,
+    cache: ImageCache | None = None,
+    batch_size: int = BATCH_SIZE,
+) -> tf.data.Dataset:
+    """Batched ``(images, labels)`` read from ``cache`` or decoded on parallel
+    tf.data workers.
+
+    Shuffling happens on the file list, before any pixels are read, with a
+    fixed seed and a fresh order every epoch. With ``num_classes`` the labels
+    are one-hot encoded in the graph; otherwise they stay integers.
+    """
+    autotune = tf.data.AUTOTUNE
+    sources = paths if cache is None else cache.locate(paths)
+    ds = tf.data.Dataset.from_tensor_slices((sources, labels))
+    if shuffle:
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    # deterministic=True keeps the seeded order even though batches load in parallel.
+    if cache is None:
+        ds = ds.map(lambda path, label: (decode_resized(path), label), num_parallel_calls=autotune, deterministic=True)
+        ds = ds.batch(batch_size)
+    else:
+        ds = ds.batch(batch_size)
+        ds = ds.map(lambda slots, label: (cache.read(slots), label), num_parallel_calls=autotune, deterministic=True)
+    if num_classes is not None:
+        ds = ds.map(lambda images, label: (images, tf.one_hot(label, num_classes)))
+    return ds
 
 
 def _build_class_weights(labels: np.ndarray) -> dict[int, float]:
@@ -170,22 +207,13 @@ def train() -> None:
     tf.keras.utils.set_random_seed(SEED)
     ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
 
-    # ---- Load datasets with int labels for class weight computation ----
-    train_ds_int = tf.keras.utils.image_dataset_from_directory(
-        TRAIN_DIR,
-        labels="inferred",
-        label_mode="int",
-        color_mode="rgb",
-        batch_size=BATCH_SIZE,
-        image_size=IMAGE_SIZE,
-        shuffle=True,
-        seed=SEED,
-    )
-    class_names = train_ds_int.class_names
+    # ---- One file listing: labels, counts and class weights without decoding ----
+    train_paths, train_labels, class_names = _list_image_files(TRAIN_DIR)
+    val_paths, val_labels, _ = _list_image_files(VALIDATION_DIR, class_names)
     num_classes = len(class_names)
-    train_labels = _extract_labels(train_ds_int)
     class_counts = Counter(train_labels.tolist())
     class_weights = _build_class_weights(train_labels)
+    cache = _open_image_cache(train_paths, val_paths)
 
     print("Class distribution:")
     for idx, name in enumerate(class_names):
@@ -193,27 +221,9 @@ def train() -> None:
             f"  {name}: count={class_counts.get(idx, 0)} class_weight={class_weights.get(idx, 1.0):.3f}"
         )
 
-    # ---- Load with categorical (one-hot) labels for label smoothing + Mixup ----
-    train_ds = tf.keras.utils.image_dataset_from_directory(
-        TRAIN_DIR,
-        labels="inferred",
-        label_mode="categorical",
-        color_mode="rgb",
-        batch_size=BATCH_SIZE,
-        image_size=IMAGE_SIZE,
-        shuffle=True,
-        seed=SEED,
-    )
-
-    val_ds = tf.keras.utils.image_dataset_from_directory(
-        VALIDATION_DIR,
-        labels="inferred",
-        label_mode="categorical",
-        color_mode="rgb",
-        batch_size=BATCH_SIZE,
-        image_size=IMAGE_SIZE,
-        shuffle=False,
-    )
+    # ---- Cached (or decoded) images, one-hot labels for label smoothing + Mixup ----
+    train_ds = _image_dataset(train_paths, train_labels, num_classes, shuffle=True, cache=cache)
+    val_ds = _image_dataset(val_paths, val_labels, num_classes, cache=cache)
 
     autotune = tf.data.AUTOTUNE
 
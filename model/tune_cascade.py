@@ -0,0 +1,169 @@
+import argparse
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+from model.config import CASCADE_THRESHOLDS_PATH, INFERENCE_BACKEND, VALIDATION_DIR
+from model.inference import (
+    DEFAULT_CASCADE_THRESHOLDS,
+    INFERENCE_BACKENDS,
+    ServedModel,
+    TTAPrediction,
+    _artifacts_root,
+    _passes_thresholds,
+)
+from model.train import _list_image_files
+
+CONFIDENCE_GRID = tuple(round(v, 2) for v in np.arange(0.30, 1.0, 0.05))
+MARGIN_GRID = tuple(round(v, 2) for v in np.arange(0.0, 0.55, 0.05))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tune cascade escalation thresholds on the validation set")
+    parser.add_argument(
+        "--backend",
+        choices=[b for b in INFERENCE_BACKENDS if b != "student"],
+        default=INFERENCE_BACKEND,
+        help="Heavy model the cascade escalates to",
+    )
+    parser.add_argument("--model-version", help="Tune artifacts/versions/<name>/ instead of the unversioned artifacts")
+    parser.add_argument(
+        "--max-accuracy-drop",
+        type=float,
+        default=0.005,
+        help="Largest validation accuracy loss allowed against always running the heavy model",
+    )
+    return parser.parse_args()
+
+
+def _score(prediction: TTAPrediction) -> int:
+    """Run ``prediction`` to completion and return the forward time in ns."""
+    elapsed = 0
+    while not prediction.done:
+        started = time.perf_counter_ns()
+        probs = prediction.model.engine.predict(prediction.pending_batch())
+        elapsed += time.perf_counter_ns() - started
+        prediction.submit(probs)
+    return elapsed
+
+
+def _collect(served: ServedModel, fast: ServedModel) -> dict:
+    """Fast-tier base-stage views and full-TTA heavy-model probabilities for
+    every validation image."""
+    paths, labels, folder_names = _list_image_files(VALIDATION_DIR)
+    if folder_names != served.class_names:
+        raise ValueError(
+            f"Model classes {served.class_names} do not match the validation folders {folder_names}."
+        )
+
+    records = {"labels": labels.tolist(), "fast_views": [], "dark": [], "full": [], "fast_ns": 0, "full_ns": 0}
+    started = time.perf_counter()
+    for i, path in enumerate(paths):
+        with Image.open(path) as image:
+            # Degradation level 1 scores the base stage only, never escalating.
+            fast_prediction = TTAPrediction(image, tta_policy="adaptive", model=fast, degradation_level=1)
+            full_prediction = TTAPrediction(image, tta_policy="full", model=served)
+        records["fast_ns"] += _score(fast_prediction)
+        records["full_ns"] += _score(full_prediction)
+        records["fast_views"].append(fast_prediction.view_probabilities())
+        records["dark"].append(fast_prediction.dark_background_ratio)
+        records["full"].append(full_prediction.probabilities())
+        if (i + 1) % 200 == 0 or i + 1 == len(paths):
+            print(f"  scored {i + 1}/{len(paths)} images ({time.perf_counter() - started:.0f}s)")
+    return records
+
+
+def _exit_mask(records: dict, thresholds: dict[str, float]) -> np.ndarray:
+    """Which images the fast tier answers on its own under ``thresholds``."""
+    return np.array(
+        [_passes_thresholds(views, dark, thresholds) for views, dark in zip(records["fast_views"], records["dark"])]
+    )
+
+
+def tune(backend: str, version: str | None, max_accuracy_drop: float) -> dict:
+    if not VALIDATION_DIR.exists():
+        raise FileNotFoundError(f"Validation directory not found: {VALIDATION_DIR}")
+
+    served = ServedModel(backend, version)
+    fast = served.student or served
+    if served.student is None:
+        print("No distilled student found; tuning the base TTA stage of the same model as the fast tier.")
+
+    print("Scoring the validation set with both tiers...")
+    records = _collect(served, fast)
+    labels = np.array(records["labels"])
+    fast_pred = np.array([np.argmax(np.mean(views, axis=0)) for views in records["fast_views"]])
+    full_pred = np.argmax(np.stack(records["full"]), axis=1)
+    full_accuracy = float((full_pred == labels).mean())
+    target = full_accuracy - max_accuracy_drop
+
+    best = None
+    for confidence in CONFIDENCE_GRID:
+        for margin in MARGIN_GRID:
+            thresholds = dict(DEFAULT_CASCADE_THRESHOLDS, confidence=confidence, margin=margin)
+            exits = _exit_mask(records, thresholds)
+            accuracy = float((np.where(exits, fast_pred, full_pred) == labels).mean())
+            escalation_rate = 1.0 - float(exits.mean())
+            if accuracy < target:
+                continue
+            key = (escalation_rate, -accuracy)
+            if best is None or key < best[0]:
+                best = (key, thresholds, accuracy, escalation_rate)
+
+    if best is None:
+        # Nothing in the grid holds accuracy: escalate every image.
+        best = (None, dict(DEFAULT_CASCADE_THRESHOLDS, confidence=1.0, margin=1.0), full_accuracy, 1.0)
+    _, thresholds, accuracy, escalation_rate = best
+
+    count = len(labels)
+    fast_ms = records["fast_ns"] / count / 1e6
+    full_ms = records["full_ns"] / count / 1e6
+    report = {
+        **thresholds,
+        "validation": {
+            "images": int(count),
+            "fast_tier": fast.backend,
+            "full_tier": served.backend,
+            "max_accuracy_drop": max_accuracy_drop,
+            "full_accuracy": full_accuracy,
+            "fast_accuracy": float((fast_pred == labels).mean()),
+            "cascade_accuracy": accuracy,
+            "escalation_rate": escalation_rate,
+            "fast_forward_ms": round(fast_ms, 3),
+            "full_forward_ms": round(full_ms, 3),
+            # Escalated images pay for both tiers.
+            "estimated_cost_ratio": round((fast_ms + escalation_rate * full_ms) / max(full_ms, 1e-6), 4),
+        },
+    }
+
+    path = _artifacts_root(version) / CASCADE_THRESHOLDS_PATH.name
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    stats = report["validation"]
+    print(
+        f"Thresholds: confidence>={thresholds['confidence']:.2f} margin>={thresholds['margin']:.2f} "
+        f"(disagreement<={thresholds['disagreement']:.2f}, dark background<={thresholds['dark_background']:.2f})"
+    )
+    print(
+        f"Accuracy: full={stats['full_accuracy']:.4f} fast={stats['fast_accuracy']:.4f} "
+        f"cascade={stats['cascade_accuracy']:.4f}"
+    )
+    print(
+        f"Escalation rate: {stats['escalation_rate']:.1%}, "
+        f"estimated forward cost: {stats['estimated_cost_ratio']:.1%} of full TTA"
+    )
+    print(f"Saved cascade thresholds to: {path}")
+    return report
+
+
+def main() -> int:
+    args = parse_args()
+    tune(args.backend, args.model_version, args.max_accuracy_drop)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
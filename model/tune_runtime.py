@@ -0,0 +1,194 @@
+"""Benchmark TensorFlow CPU execution settings on this host.
+
+Every candidate (oneDNN on/off x intra-op threads x inter-op threads) runs in
+a fresh subprocess, because oneDNN is fixed when TensorFlow is imported and
+thread pools once it starts. Each probe loads the served model and times
+forward passes at every engine batch size. The fastest setting for one
+adaptive request (base stage plus full TTA pass) is saved with the best
+batching size as this host's runtime profile:
+
+    python -m model.tune_runtime
+    python -m model.tune_runtime --repeats 50 --backend student
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from model.config import INFERENCE_BACKEND
+from model.runtime_profile import host_fingerprint, profile_path
+
+# TFLite backends size their own interpreter threads, so only TensorFlow
+# graph backends are tuned here.
+TUNABLE_BACKENDS = ("keras", "student")
+BASELINE = {"onednn": False, "intra_op_threads": 0, "inter_op_threads": 0}
+# A 12 MP landscape phone photo; its aspect ratio sets how many views each
+# adaptive TTA stage scores.
+PHONE_PHOTO_SIZE = (4032, 3024)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tune TensorFlow CPU execution settings for this host")
+    parser.add_argument(
+        "--backend",
+        choices=TUNABLE_BACKENDS,
+        default=INFERENCE_BACKEND if INFERENCE_BACKEND in TUNABLE_BACKENDS else TUNABLE_BACKENDS[0],
+        help="Model artifact to benchmark",
+    )
+    parser.add_argument("--model-version", help="Benchmark artifacts/versions/<name>/ instead")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed forward passes per batch size")
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def _thread_candidates(cores: int) -> list[int]:
+    powers = {1 << i for i in range(cores.bit_length()) if 1 << i <= cores}
+    return sorted(powers | {max(1, cores // 2), cores})
+
+
+def _candidates(cores: int) -> list[dict]:
+    configs = [BASELINE]
+    for onednn in (False, True):
+        for intra in _thread_candidates(cores):
+            for inter in sorted({1, 2} & set(range(1, cores + 1))) or [1]:
+                configs.append({"onednn": onednn, "intra_op_threads": intra, "inter_op_threads": inter})
+    return configs
+
+
+# ---------------------------------------------------------------------------
+# Probe (child process)
+# ---------------------------------------------------------------------------
+
+def _probe(config: dict, backend: str, version: str | None, repeats: int) -> dict:
+    # Imported here: the environment for oneDNN must be set before TensorFlow loads.
+    import numpy as np
+    import tensorflow as tf
+
+    if config["intra_op_threads"]:
+        tf.config.threading.set_intra_op_parallelism_threads(config["intra_op_threads"])
+    if config["inter_op_threads"]:
+        tf.config.threading.set_inter_op_parallelism_threads(config["inter_op_threads"])
+
+    from model.config import IMAGE_SIZE
+    from model.engine import BATCH_BUCKETS
+    from model.inference import ServedModel, _base_view_specs, _tta_view_specs
+
+    engine = ServedModel(backend, version, cascade=False).engine
+    rng = np.random.default_rng(0)
+
+    def median_ms(views: int) -> float:
+        batch = rng.uniform(0, 255, (views, IMAGE_SIZE[1], IMAGE_SIZE[0], 3)).astype(np.float32)
+        engine.predict(batch)
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            engine.predict(batch)
+            samples.append((time.perf_counter() - started) * 1000.0)
+        return float(np.median(samples))
+
+    # Adaptive TTA scores the base stage, then only the full-stage views it
+    # has not scored yet when it escalates.
+    base = _base_view_specs(*PHONE_PHOTO_SIZE)
+    stages = [len(base), len(set(_tta_view_specs(*PHONE_PHOTO_SIZE)) - set(base))]
+
+    forward_ms = {str(bucket): round(median_ms(bucket), 3) for bucket in BATCH_BUCKETS}
+    return {
+        "forward_ms": forward_ms,
+        "request_views": stages,
+        "request_ms": round(sum(median_ms(views) for views in stages), 3),
+    }
+
+
+def _run_probe(config: dict, args: argparse.Namespace) -> dict | None:
+    env = {**os.environ, "TF_CPP_MIN_LOG_LEVEL": "3", "TF_ENABLE_ONEDNN_OPTS": "1" if config["onednn"] else "0"}
+    command = [sys.executable, "-m", "model.tune_runtime", "--probe", json.dumps(config), "--backend", args.backend]
+    command += ["--repeats", str(args.repeats)]
+    if args.model_version is not None:
+        command += ["--model-version", args.model_version]
+    proc = subprocess.run(command, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"  probe failed: {proc.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ---------------------------------------------------------------------------
+# Tuning entrypoint
+# ---------------------------------------------------------------------------
+
+def _describe(config: dict) -> str:
+    if config == BASELINE:
+        return "defaults (oneDNN off, TensorFlow thread pools)"
+    return (
+        f"oneDNN {'on' if config['onednn'] else 'off'}, "
+        f"intra-op {config['intra_op_threads']}, inter-op {config['inter_op_threads']}"
+    )
+
+
+def tune(args: argparse.Namespace) -> dict:
+    host = host_fingerprint()
+    candidates = _candidates(host["cores"])
+    print(f"Probing {len(candidates)} settings on {host['cpu']} ({host['cores']} cores)...")
+
+    probes = []
+    for config in candidates:
+        result = _run_probe(config, args)
+        if result is None:
+            continue
+        probes.append({**config, **result})
+        print(f"  {_describe(config)}: {result['request_ms']:.1f} ms per request")
+    if not probes:
+        raise RuntimeError("Every probe failed; check that the model loads with predict_cli first.")
+
+    tuned = [probe for probe in probes if probe["intra_op_threads"]] or probes
+    best = min(tuned, key=lambda probe: probe["request_ms"])
+    # Largest views-per-second batch under the chosen setting; ties go to the smaller batch.
+    max_batch_size = max(
+        (int(size) for size in best["forward_ms"]),
+        key=lambda size: (size / best["forward_ms"][str(size)], -size),
+    )
+
+    profile = {
+        "host": host,
+        "backend": args.backend,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {
+            "onednn": best["onednn"],
+            "intra_op_threads": best["intra_op_threads"],
+            "inter_op_threads": best["inter_op_threads"],
+            "max_batch_size": max_batch_size,
+        },
+        "probes": probes,
+    }
+
+    baseline = next((probe for probe in probes if probe["intra_op_threads"] == 0), None)
+    if baseline is not None:
+        profile["speedup_vs_defaults"] = round(baseline["request_ms"] / max(best["request_ms"], 1e-6), 3)
+
+    path = profile_path(host["hostname"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+
+    print(f"Best: {_describe(best)}, max batch size {max_batch_size}")
+    if "speedup_vs_defaults" in profile:
+        print(f"  {profile['speedup_vs_defaults']:.2f}x the speed of the current defaults per request")
+    print(f"Saved runtime profile to: {path}")
+    return profile
+
+
+def main() -> int:
+    args = parse_args()
+    if args.probe is not None:
+        print(json.dumps(_probe(json.loads(args.probe), args.backend, args.model_version, args.repeats)))
+        return 0
+    tune(args)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
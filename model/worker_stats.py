@@ -0,0 +1,140 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Samples kept per rolling window; recording is an O(1) append, percentiles
+# are only computed when stats are requested.
+STATS_WINDOW = 1024
+
+
+def _rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class WorkerStats:
+    """Rolling latency windows and counters for one worker process."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.window = window
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.degraded = 0
+        self.expired = 0
+        self._stages: dict[str, deque[int]] = {}
+        self._views: deque[int] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_request(
+        self, timings_ns: dict[str, int], views: int = 0, cache_hit: bool = False, degraded: bool = False
+    ) -> None:
+        with self._lock:
+            self.requests += 1
+            if degraded:
+                self.degraded += 1
+            if cache_hit:
+                self.cache_hits += 1
+            else:
+                self._views.append(views)
+            for stage, elapsed in timings_ns.items():
+                samples = self._stages.get(stage)
+                if samples is None:
+                    samples = self._stages[stage] = deque(maxlen=self.window)
+                samples.append(elapsed)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+
+    def record_expired(self) -> None:
+        """A request dropped unscored because its deadline passed."""
+        with self._lock:
+            self.requests += 1
+            self.expired += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {stage: np.fromiter(samples, dtype=np.int64) for stage, samples in self._stages.items()}
+            views = np.fromiter(self._views, dtype=np.int64)
+            requests, errors, cache_hits = self.requests, self.errors, self.cache_hits
+            degraded, expired = self.degraded, self.expired
+
+        latency_ms = {}
+        for stage, samples in stages.items():
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99)) / 1e6
+            latency_ms[stage] = {
+                "count": int(len(samples)),
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+            }
+
+        rss = _rss_bytes()
+        peak_rss = _peak_rss_bytes()
+        return {
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "requests": requests,
+            "errors": errors,
+            "cache_hits": cache_hits,
+            "cache_hit_rate": (cache_hits / requests) if requests else 0.0,
+            "degraded": degraded,
+            "expired": expired,
+            "views_per_request": {
+                "mean": round(float(views.mean()), 2) if len(views) else 0.0,
+                "max": int(views.max()) if len(views) else 0,
+            },
+            "latency_ms": latency_ms,
+            "rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+            "peak_rss_mb": round(peak_rss / 2**20, 1) if peak_rss is not None else None,
+        }
+
+
+class StageMeter:
+    """Busy time of one pipeline stage served by ``workers`` threads.
+
+    ``utilization`` is the busy fraction since the worker started; diff
+    ``busy_ms`` between two snapshots for a recent window.
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = max(1, workers)
+        self.started = time.monotonic()
+        self._busy_ns = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ns: int) -> None:
+        with self._lock:
+            self._busy_ns += elapsed_ns
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            busy_ns = self._busy_ns
+        elapsed_ns = max(1, int((time.monotonic() - self.started) * 1e9))
+        return {
+            "workers": self.workers,
+            "busy_ms": round(busy_ns / 1e6, 1),
+            "utilization": round(min(1.0, busy_ns / (elapsed_ns * self.workers)), 4),
+        }
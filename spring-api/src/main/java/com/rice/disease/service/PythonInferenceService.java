@@ -5,14 +5,12 @@ import com.fasterxml.jackson.databind.ObjectMapper;
 import com.fasterxml.jackson.databind.node.ObjectNode;
 import com.rice.disease.config.InferenceProperties;
 import jakarta.annotation.PreDestroy;
+import java.io.BufferedOutputStream;
 import java.io.BufferedReader;
-import java.io.BufferedWriter;
 import java.io.IOException;
 import java.io.InputStreamReader;
-import java.io.OutputStreamWriter;
+import java.io.OutputStream;
 import java.nio.charset.StandardCharsets;
-import java.nio.file.Files;
-import java.nio.file.Path;
 import java.time.Duration;
 import java.util.ArrayList;
 import java.util.List;
@@ -29,7 +27,7 @@ public class PythonInferenceService {
     private final ObjectMapper objectMapper;
 
     private Process workerProcess;
-    private BufferedWriter workerInput;
+    private OutputStream workerInput;
     private BufferedReader workerOutput;
     private BufferedReader workerError;
 
@@ -39,21 +37,18 @@ public class PythonInferenceService {
     }
 
     public synchronized JsonNode predict(MultipartFile file) {
-        Path tempImage = null;
         try {
             ensureWorkerReady();
 
-            String suffix = resolveSuffix(file.getOriginalFilename());
-            tempImage = Files.createTempFile("rice-upload-", suffix);
-            file.transferTo(tempImage);
-
+            // Stream the upload to the worker as a length-prefixed payload
+            // instead of round-tripping it through a temp file.
+            byte[] imageBytes = file.getBytes();
             ObjectNode request = objectMapper.createObjectNode();
-            request.put("image_path", tempImage.toString());
+            request.put("image_length", imageBytes.length);
             request.put("top_k", properties.getTopK());
-
-            workerInput.write(objectMapper.writeValueAsString(request));
-            workerInput.newLine();
-            workerInput.flush();
+            // Let the worker drop the request instead of scoring it once we have stopped waiting.
+            request.put("deadline_ms", System.currentTimeMillis() + REQUEST_TIMEOUT.toMillis());
+            writeWorkerMessage(request, imageBytes);
 
             JsonNode response = readWorkerJson(REQUEST_TIMEOUT);
             if (!response.path("ok").asBoolean(false)) {
@@ -68,13 +63,6 @@ public class PythonInferenceService {
         } catch (IOException e) {
             restartWorkerQuietly();
             throw new IllegalStateException("Failed to run inference.", e);
-        } finally {
-            if (tempImage != null) {
-                try {
-                    Files.deleteIfExists(tempImage);
-                } catch (IOException ignored) {
-                }
-            }
         }
     }
 
@@ -88,9 +76,7 @@ public class PythonInferenceService {
             if (workerInput != null && workerProcess.isAlive()) {
                 ObjectNode request = objectMapper.createObjectNode();
                 request.put("command", "shutdown");
-                workerInput.write(objectMapper.writeValueAsString(request));
-                workerInput.newLine();
-                workerInput.flush();
+                writeWorkerMessage(request, null);
             }
         } catch (IOException ignored) {
         } finally {
@@ -114,7 +100,7 @@ public class PythonInferenceService {
             .directory(properties.getProjectRootPath().toFile());
 
         workerProcess = processBuilder.start();
-        workerInput = new BufferedWriter(new OutputStreamWriter(workerProcess.getOutputStream(), StandardCharsets.UTF_8));
+        workerInput = new BufferedOutputStream(workerProcess.getOutputStream());
         workerOutput = new BufferedReader(new InputStreamReader(workerProcess.getInputStream(), StandardCharsets.UTF_8));
         workerError = new BufferedReader(new InputStreamReader(workerProcess.getErrorStream(), StandardCharsets.UTF_8));
 
@@ -126,6 +112,15 @@ public class PythonInferenceService {
         }
     }
 
+    private void writeWorkerMessage(ObjectNode message, byte[] payload) throws IOException {
+        workerInput.write(objectMapper.writeValueAsBytes(message));
+        workerInput.write('\n');
+        if (payload != null) {
+            workerInput.write(payload);
+        }
+        workerInput.flush();
+    }
+
     private JsonNode readWorkerJson(Duration timeout) throws IOException {
         long deadline = System.nanoTime() + timeout.toNanos();
         StringBuilder stderr = new StringBuilder();
@@ -211,15 +206,4 @@ public class PythonInferenceService {
         } catch (Exception ignored) {
         }
     }
-
-    private String resolveSuffix(String originalName) {
-        if (originalName == null) {
-            return ".jpg";
-        }
-        int idx = originalName.lastIndexOf('.');
-        if (idx < 0 || idx == originalName.length() - 1) {
-            return ".jpg";
-        }
-        return originalName.substring(idx);
-    }
 }
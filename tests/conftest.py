@@ -0,0 +1,32 @@
+import os
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import pytest
+import tensorflow as tf
+
+from benchmarks.fixtures import build_artifacts
+from model import inference
+from model.config import MODEL_PATH
+
+# Random weights give near-uniform probabilities; scaling the output layer
+# spreads them out so tolerance checks compare meaningful differences.
+OUTPUT_SHARPENING = 40.0
+
+
+@pytest.fixture(scope="module")
+def artifacts_dir(tmp_path_factory):
+    """Randomly initialized small model and class names, served as the
+    unversioned artifacts for the duration of the test module."""
+    root = tmp_path_factory.mktemp("artifacts")
+    build_artifacts(root, "small", seed=0)
+    model_path = root / MODEL_PATH.name
+    model = tf.keras.models.load_model(model_path, compile=False)
+    kernel, bias = model.layers[-1].get_weights()
+    model.layers[-1].set_weights([kernel * OUTPUT_SHARPENING, bias])
+    model.save(model_path)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(inference, "ARTIFACTS_DIR", root)
+        mp.setattr(inference, "_backend", "keras")
+        mp.setattr(inference, "_served", None)
+        yield root
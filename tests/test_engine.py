@@ -0,0 +1,28 @@
+"""Bucketed batching must never retrace the forward pass."""
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from model.config import IMAGE_SIZE, MODEL_PATH
+from model.engine import BATCH_BUCKETS, InferenceEngine
+
+
+@pytest.fixture(scope="module")
+def engine(artifacts_dir):
+    return InferenceEngine(tf.keras.models.load_model(artifacts_dir / MODEL_PATH.name, compile=False))
+
+
+def test_predictions_at_any_view_count_reuse_the_single_trace(engine):
+    # The input signature leaves the batch dimension open, so one trace
+    # serves every bucket.
+    engine.warmup()
+    assert engine.trace_count == 1
+
+    rng = np.random.default_rng(0)
+    for views in (1, 2, 5, 12, 18, BATCH_BUCKETS[-1], BATCH_BUCKETS[-1] + 7):
+        batch = rng.uniform(0, 255, (views, IMAGE_SIZE[1], IMAGE_SIZE[0], 3)).astype(np.float32)
+        probs = engine.predict(batch)
+        assert probs.shape == (views, engine.num_classes)
+        np.testing.assert_allclose(probs, engine.model(batch, training=False).numpy(), atol=1e-5)
+    assert engine.trace_count == 1
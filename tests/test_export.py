@@ -0,0 +1,102 @@
+"""The lean SavedModel export must score like the full Keras model."""
+
+import os
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from model.config import IMAGE_SIZE, MODEL_PATH, SERVING_MODEL_DIR, TFLITE_FLOAT16_MODEL_PATH
+from model.engine import InferenceEngine, SavedModelEngine
+from model.export import EQUIVALENCE_TOLERANCE, _fold_batch_norm, export_savedmodel, export_tflite
+from model.inference import _backend_model_path
+
+
+def _randomize_batch_norm(model: tf.keras.Model, rng: np.random.Generator) -> None:
+    """Give every BatchNormalization non-trivial statistics, so folding it
+    into the next Dense actually changes the weights."""
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.BatchNormalization):
+            size = layer.moving_mean.shape[0]
+            layer.set_weights(
+                [
+                    rng.uniform(0.5, 1.5, size).astype(np.float32),  # gamma
+                    rng.normal(0.0, 0.5, size).astype(np.float32),  # beta
+                    rng.normal(0.0, 0.5, size).astype(np.float32),  # moving mean
+                    rng.uniform(0.5, 2.0, size).astype(np.float32),  # moving variance
+                ]
+            )
+
+
+@pytest.fixture(scope="module")
+def keras_model(artifacts_dir):
+    model = tf.keras.models.load_model(artifacts_dir / "rice_disease_model.keras", compile=False)
+    _randomize_batch_norm(model, np.random.default_rng(0))
+    return model
+
+
+def test_fold_batch_norm_matches_dense_after_bn():
+    rng = np.random.default_rng(1)
+    bn = tf.keras.layers.BatchNormalization()
+    dense = tf.keras.layers.Dense(6, activation="softmax")
+    x = rng.normal(0.0, 1.0, (8, 32)).astype(np.float32)
+    dense(bn(x, training=False))
+    bn.set_weights(
+        [
+            rng.uniform(0.5, 1.5, 32).astype(np.float32),
+            rng.normal(0.0, 0.5, 32).astype(np.float32),
+            rng.normal(0.0, 0.5, 32).astype(np.float32),
+            rng.uniform(0.5, 2.0, 32).astype(np.float32),
+        ]
+    )
+
+    folded = _fold_batch_norm(bn, dense)
+    np.testing.assert_allclose(folded(x).numpy(), dense(bn(x, training=False)).numpy(), atol=1e-6)
+
+
+@pytest.fixture(scope="module")
+def serving_dir(artifacts_dir, keras_model, tmp_path_factory):
+    output_dir, max_abs_diff = export_savedmodel(
+        keras_model, tmp_path_factory.mktemp("export") / SERVING_MODEL_DIR.name, artifacts_dir / MODEL_PATH.name
+    )
+    assert max_abs_diff <= EQUIVALENCE_TOLERANCE
+    return output_dir
+
+
+# 5 pads into a bucket, 24 fills the largest one.
+@pytest.mark.parametrize("batch_size", [1, 5, 24])
+def test_savedmodel_engine_matches_inference_engine(keras_model, serving_dir, batch_size):
+    rng = np.random.default_rng(batch_size)
+    batch = rng.uniform(0.0, 255.0, (batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3)).astype(np.float32)
+    expected = InferenceEngine(keras_model).predict(batch)
+    actual = SavedModelEngine(serving_dir).predict(batch)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, atol=EQUIVALENCE_TOLERANCE)
+
+
+def test_stale_export_is_not_served(artifacts_dir, keras_model):
+    keras_path = artifacts_dir / MODEL_PATH.name
+    serving_dir, _ = export_savedmodel(keras_model, artifacts_dir / SERVING_MODEL_DIR.name, keras_path)
+    assert _backend_model_path("keras", artifacts_dir) == serving_dir
+
+    # Copying the same model elsewhere changes the mtime but not the content.
+    os.utime(keras_path, ns=(1, 1))
+    assert _backend_model_path("keras", artifacts_dir) == serving_dir
+
+    # Retraining writes a different model: serve it instead of the old export.
+    keras_model.save(keras_path)
+    assert _backend_model_path("keras", artifacts_dir) == keras_path
+
+
+def test_stale_tflite_export_is_not_served(artifacts_dir, keras_model):
+    keras_path = artifacts_dir / MODEL_PATH.name
+    keras_model.save(keras_path)
+    tflite_path = export_tflite(keras_model, "float16", 0, artifacts_dir / TFLITE_FLOAT16_MODEL_PATH.name, keras_path)
+    assert _backend_model_path("tflite-float16", artifacts_dir) == tflite_path
+
+    retrained = tf.keras.models.load_model(keras_path, compile=False)
+    kernel, bias = retrained.layers[-1].get_weights()
+    retrained.layers[-1].set_weights([kernel, bias + 1.0])
+    retrained.save(keras_path)
+    assert _backend_model_path("tflite-float16", artifacts_dir) == _backend_model_path("keras", artifacts_dir)
+    assert _backend_model_path("tflite-float16", artifacts_dir) != tflite_path
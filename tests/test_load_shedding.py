@@ -0,0 +1,21 @@
+from model.load_shedding import LoadShedder
+
+
+def _slow_shedder() -> LoadShedder:
+    shedder = LoadShedder(queue_depths=(8, 32), latency_ms=(5000.0, 15000.0))
+    for _ in range(5):
+        shedder.record_latency(20_000 * 1_000_000)
+    return shedder
+
+
+def test_latency_alone_does_not_degrade_without_backlog():
+    shedder = _slow_shedder()
+    assert [shedder.update(0) for _ in range(5)] == [0] * 5
+    assert shedder.transitions == 0
+
+
+def test_latency_degrades_under_backlog_and_recovers_when_it_drains():
+    shedder = _slow_shedder()
+    assert shedder.update(1) == 2
+    assert shedder.update(0) == 1
+    assert shedder.update(0) == 0
@@ -0,0 +1,20 @@
+import json
+
+from model.predict_cli import _completed_images
+
+
+def test_resume_retries_failed_images(tmp_path):
+    output = tmp_path / "results.jsonl"
+    records = [
+        {"image": "a.jpg", "ok": True, "result": {}},
+        {"image": "b.jpg", "ok": False, "error": "Invalid image format."},
+        {"image": "c.jpg", "ok": False, "error": "Out of memory"},
+        {"image": "c.jpg", "ok": True, "result": {}},
+    ]
+    with output.open("w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        # A run killed mid-write leaves a partial last line.
+        f.write('{"image": "d.jpg", "ok": tr')
+
+    assert _completed_images(output) == {"a.jpg", "c.jpg"}
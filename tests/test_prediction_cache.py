@@ -0,0 +1,43 @@
+"""Disk tier of the prediction cache: size cap and namespace pruning."""
+
+from model.prediction_cache import PredictionCache
+
+OLD_MODEL = "a" * 64
+NEW_MODEL = "b" * 64
+
+
+def _key(i: int) -> str:
+    return PredictionCache.make_key(str(i).encode(), NEW_MODEL, 3, "full")
+
+
+def test_disk_tier_evicts_least_recently_used_entries(tmp_path):
+    result = {"predicted_class": "healthy", "confidence": 0.9}
+    entry_bytes = len('{"predicted_class": "healthy", "confidence": 0.9}')
+    cache = PredictionCache(max_entries=0, disk_dir=tmp_path, max_disk_bytes=3 * entry_bytes)
+
+    for i in range(3):
+        cache.put(_key(i), NEW_MODEL, result)
+    assert cache.get(_key(0), NEW_MODEL) == result  # 1 is now the oldest
+    cache.put(_key(3), NEW_MODEL, result)
+
+    assert cache.get(_key(1), NEW_MODEL) is None
+    for i in (0, 2, 3):
+        assert cache.get(_key(i), NEW_MODEL) == result
+    assert cache.stats()["disk_bytes"] == 3 * entry_bytes
+
+    # A new process sees the same order through file modification times.
+    reopened = PredictionCache(max_entries=0, disk_dir=tmp_path, max_disk_bytes=3 * entry_bytes)
+    reopened.put(_key(4), NEW_MODEL, result)
+    assert sum(1 for _ in tmp_path.glob("*/*/*.json")) == 3
+
+
+def test_other_models_are_pruned_only_on_request(tmp_path):
+    cache = PredictionCache(max_entries=0, disk_dir=tmp_path)
+    cache.put(_key(0), OLD_MODEL, {"model": "old"})
+    cache.put(_key(0), NEW_MODEL, {"model": "new"})
+    # Requests still running on the old model keep their entries.
+    assert cache.get(_key(0), OLD_MODEL) == {"model": "old"}
+
+    cache.prune(NEW_MODEL)
+    assert cache.get(_key(0), OLD_MODEL) is None
+    assert cache.get(_key(0), NEW_MODEL) == {"model": "new"}
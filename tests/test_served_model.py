@@ -0,0 +1,28 @@
+import json
+import shutil
+
+from model.config import CASCADE_THRESHOLDS_PATH, MODEL_PATH, STUDENT_MODEL_PATH
+from model.inference import ServedModel
+
+
+def test_student_changes_only_the_cascade_fingerprint(artifacts_dir):
+    teacher = ServedModel("keras")
+    assert teacher.student is None
+    assert teacher.cascade_fingerprint == teacher.fingerprint
+
+    # Distilling a student (here: a copy of the model) and tuning thresholds
+    # must not change the model's own identity.
+    shutil.copy(artifacts_dir / MODEL_PATH.name, artifacts_dir / STUDENT_MODEL_PATH.name)
+    with (artifacts_dir / CASCADE_THRESHOLDS_PATH.name).open("w", encoding="utf-8") as f:
+        json.dump({"confidence": 0.9, "margin": 0.3}, f)
+
+    served = ServedModel("keras")
+    assert served.student is not None
+    assert served.fingerprint == teacher.fingerprint
+    assert served.version == teacher.version
+    assert served.cascade_fingerprint != served.fingerprint
+
+    distill_teacher = ServedModel("keras", cascade=False)
+    assert distill_teacher.student is None
+    assert distill_teacher.fingerprint == teacher.fingerprint
+    assert distill_teacher.cascade_fingerprint == teacher.fingerprint
@@ -0,0 +1,44 @@
+"""Tiled results must keep a lesion that only a few tiles see."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.fixtures import synthetic_leaf
+from model import inference
+
+
+def _healthy_probs(class_names: list[str], healthy: int) -> np.ndarray:
+    probs = np.full(len(class_names), 0.02, dtype=np.float32)
+    probs[healthy] = 1.0 - 0.02 * (len(class_names) - 1)
+    return probs
+
+
+def _score(prediction: inference.TiledPrediction, probs_for_tile) -> dict:
+    scored = 0
+    while not prediction.done:
+        count = len(prediction.pending_batch())
+        prediction.submit(np.stack([probs_for_tile(scored + i) for i in range(count)]))
+        scored += count
+    return prediction.result()
+
+
+def test_one_diseased_tile_outweighs_healthy_canopy(artifacts_dir):
+    image = Image.fromarray(synthetic_leaf(1600, 1200, np.random.default_rng(0)))
+    class_names = inference.served_model().class_names
+    healthy = class_names.index(inference.HEALTHY_CLASS)
+    disease = (healthy + 1) % len(class_names)
+    healthy_probs = _healthy_probs(class_names, healthy)
+    diseased_probs = np.roll(healthy_probs, disease - healthy)
+
+    all_healthy = _score(inference.TiledPrediction(image), lambda tile: healthy_probs)
+    assert all_healthy["predicted_class"] == inference.HEALTHY_CLASS
+    assert all_healthy["tiles"]["lesion"] == 0
+    assert all_healthy["tiles"]["scored"] >= 4
+
+    one_lesion = _score(
+        inference.TiledPrediction(image), lambda tile: diseased_probs if tile == 1 else healthy_probs
+    )
+    assert one_lesion["predicted_class"] == class_names[disease]
+    assert one_lesion["tiles"]["lesion"] == 1
+    assert one_lesion["confidence"] == pytest.approx(float(diseased_probs[disease]))
@@ -0,0 +1,146 @@
+"""Batched TTA must give the same answer as scoring each view on its own,
+and full TTA must stay within a stated tolerance of the original per-view
+PIL pipeline."""
+
+import zlib
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from PIL import Image, ImageOps
+
+from benchmarks.fixtures import synthetic_leaf
+from model import inference
+from model.config import IMAGE_SIZE
+
+# Landscape, portrait and square inputs: the spatial crops only differ from
+# the centre fit when the image is not square.
+IMAGE_SIZES = ((400, 300), (300, 520), (260, 260))
+TOLERANCE = 1e-5
+
+
+def _per_view_reference(image: Image.Image, tta_policy: str, model: tf.keras.Model, class_names: list[str]) -> dict:
+    """One forward pass per view, following the same stage rules as
+    ``TTAPrediction``."""
+    pixels = tf.convert_to_tensor(inference._decode_rgb(image)[np.newaxis])
+    height, width = int(pixels.shape[1]), int(pixels.shape[2])
+
+    def score(specs):
+        return np.concatenate(
+            [model(inference._render_views(pixels, [spec]), training=False).numpy() for spec in specs]
+        )
+
+    full_specs = inference._tta_view_specs(width, height)
+    if tta_policy == "full":
+        stage, probs = "full", score(full_specs)
+    else:
+        base_specs = inference._base_view_specs(width, height)
+        stage, probs = "base", score(base_specs)
+        if not inference._is_confident(probs):
+            stage = "full"
+            probs = np.concatenate([probs, score([spec for spec in full_specs if spec not in base_specs])])
+
+    mean = probs.mean(axis=0)
+    return {
+        "predicted_class": class_names[int(np.argmax(mean))],
+        "confidence": float(mean.max()),
+        "probabilities": mean,
+        "tta_stage": stage,
+        "tta_views": len(probs),
+    }
+
+
+@pytest.fixture(scope="module")
+def keras_model(artifacts_dir):
+    return tf.keras.models.load_model(artifacts_dir / "rice_disease_model.keras", compile=False)
+
+
+@pytest.fixture(params=["random", "confident"])
+def exit_rule(request, monkeypatch):
+    """A random-weight model is never confident, so adaptive always escalates;
+    the permissive rule makes it stop after the base stage instead."""
+    if request.param == "confident":
+        monkeypatch.setattr(
+            inference,
+            "DEFAULT_CASCADE_THRESHOLDS",
+            dict(inference.DEFAULT_CASCADE_THRESHOLDS, confidence=0.0, margin=0.0, disagreement=1.0),
+        )
+    return request.param
+
+
+@pytest.mark.parametrize("size", IMAGE_SIZES)
+@pytest.mark.parametrize("tta_policy", ["full", "adaptive"])
+def test_batched_tta_matches_per_view(keras_model, exit_rule, tta_policy, size):
+    rng = np.random.default_rng(sum(size))
+    image = Image.fromarray(synthetic_leaf(*size, rng))
+    class_names = inference.served_model().class_names
+
+    result = inference.predict_image(image, top_k=len(class_names), tta_policy=tta_policy)
+    expected = _per_view_reference(image, tta_policy, keras_model, class_names)
+
+    assert result["tta_stage"] == expected["tta_stage"]
+    assert result["tta_views"] == expected["tta_views"]
+    assert result["predicted_class"] == expected["predicted_class"]
+    assert result["confidence"] == pytest.approx(expected["confidence"], abs=TOLERANCE)
+    for entry in result["top_predictions"]:
+        index = class_names.index(entry["class"])
+        assert entry["confidence"] == pytest.approx(float(expected["probabilities"][index]), abs=TOLERANCE)
+
+
+# ---------------------------------------------------------------------------
+# Baseline: the original per-view PIL pipeline, reproduced independently of
+# model.inference (PIL crops, PIL bilinear resize, content-hash dedup, one
+# forward pass per view).
+# ---------------------------------------------------------------------------
+
+# crop_and_resize does not antialias like PIL's bilinear resize, and the
+# geometric dedup drops the fit view the content-hash dedup kept next to the
+# identical centre square. Both shift averaged probabilities by < 5e-4 here.
+BASELINE_TOLERANCE = 2e-3
+_BILINEAR = Image.Resampling.BILINEAR
+
+
+def _baseline_views(image: Image.Image) -> list[Image.Image]:
+    rgb = image.convert("RGB")
+    width, height = rgb.size
+    side = min(width, height)
+    views = [ImageOps.fit(rgb, IMAGE_SIZE, method=_BILINEAR, centering=(0.5, 0.5))]
+    max_x, max_y = max(0, width - side), max(0, height - side)
+    for left, top in {(0, 0), (max_x, 0), (0, max_y), (max_x, max_y), (max_x // 2, max_y // 2)}:
+        square = rgb.crop((left, top, left + side, top + side))
+        views += [square, square.transpose(Image.Transpose.FLIP_LEFT_RIGHT)]
+        for scale in (0.95, 0.85):
+            crop = max(1, int(side * scale))
+            offset = (side - crop) // 2
+            views.append(square.crop((offset, offset, offset + crop, offset + crop)))
+
+    unique: dict[int, Image.Image] = {}
+    for view in views:
+        thumbnail = np.asarray(view.resize((32, 32), _BILINEAR), dtype=np.uint8)
+        unique[zlib.crc32(thumbnail.tobytes())] = view
+    return list(unique.values())
+
+
+def _baseline_probabilities(image: Image.Image, model: tf.keras.Model) -> np.ndarray:
+    probs = [
+        model(np.asarray(view.resize(IMAGE_SIZE, _BILINEAR), dtype=np.float32)[np.newaxis], training=False).numpy()[0]
+        for view in _baseline_views(image)
+    ]
+    return np.mean(probs, axis=0)
+
+
+# The larger size goes through the reduced-resolution decode as well.
+@pytest.mark.parametrize("size", (*IMAGE_SIZES, (1200, 900)))
+def test_full_tta_matches_baseline_pil_pipeline(keras_model, size):
+    rng = np.random.default_rng(sum(size))
+    image = Image.fromarray(synthetic_leaf(*size, rng))
+    class_names = inference.served_model().class_names
+
+    result = inference.predict_image(image, top_k=len(class_names), tta_policy="full")
+    expected = _baseline_probabilities(image, keras_model)
+
+    assert result["predicted_class"] == class_names[int(np.argmax(expected))]
+    assert result["confidence"] == pytest.approx(float(expected.max()), abs=BASELINE_TOLERANCE)
+    for entry in result["top_predictions"]:
+        index = class_names.index(entry["class"])
+        assert entry["confidence"] == pytest.approx(float(expected[index]), abs=BASELINE_TOLERANCE)